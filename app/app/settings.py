@@ -39,22 +39,35 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'rest_framework',
     'rest_framework.authtoken',
-    'drf_spectacular',
     'core',
     'user',
     'project',
 ]
 
+# Generate the OpenAPI schema on request instead of serving the file written
+# by `manage.py build_schema`. Needed to run build_schema itself.
+SCHEMA_LIVE = os.environ.get('SCHEMA_LIVE', '0') == '1'
+SCHEMA_ROOT = BASE_DIR / 'schema'
+
+if SCHEMA_LIVE:
+    INSTALLED_APPS.append('drf_spectacular')
+
 MIDDLEWARE = [
+    'core.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    'core.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
-    'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
-    'django.contrib.messages.middleware.MessageMiddleware',
+    'core.middleware.CsrfViewMiddleware',
+    'core.middleware.AuthenticationMiddleware',
+    'core.profiling.ProfilingMiddleware',
+    'core.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# Token authenticated paths that skip the session, CSRF, session
+# authentication and message middleware the admin needs.
+LEAN_MIDDLEWARE_PATHS = ['/api/auth/', '/api/project/', '/api/batch/', '/api/health/', '/metrics']
+
 ROOT_URLCONF = 'app.urls'
 
 TEMPLATES = [
@@ -89,6 +102,66 @@ DATABASES = {
     }
 }
 
+# Read replicas, e.g. DB_REPLICA_HOSTS=replica1,replica2. Each replica mirrors
+# the primary in tests, so two local databases are enough to exercise routing.
+DATABASE_REPLICAS = []
+for index, host in enumerate(filter(None, os.environ.get('DB_REPLICA_HOSTS', '').split(','))):
+    alias = f'replica_{index}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'HOST': host.strip(),
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+# Shards holding projects with their tasks, notes, completions and status
+# history, placed by project manager. The primary is always the first shard
+# and keeps users, tokens and the other global tables; DB_SHARD_HOSTS adds
+# more shards, e.g. DB_SHARD_HOSTS=shard1,shard2 or host/name pairs to use
+# several databases on one server.
+DATABASE_SHARDS = ['default']
+for index, spec in enumerate(filter(None, os.environ.get('DB_SHARD_HOSTS', '').split(',')), start=1):
+    host, _, name = spec.strip().partition('/')
+    alias = f'shard_{index}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'NAME': name or DATABASES['default']['NAME'],
+    }
+    DATABASE_SHARDS.append(alias)
+# Ids of sharded tables on the n-th shard start at n * DATABASE_SHARD_ID_SPAN
+# so they stay unique across shards.
+DATABASE_SHARD_ID_SPAN = 10 ** 12
+# Seconds a cached manager placement serves reads. Writes always check the
+# stored placement, and a move waits SHARD_MOVE_GRACE seconds, at least the
+# longest a request can run, between refusing writes and copying rows.
+SHARD_PLACEMENT_CACHE_TIMEOUT = int(os.environ.get('SHARD_PLACEMENT_CACHE_TIMEOUT', 30))
+SHARD_MOVE_GRACE = float(os.environ.get('SHARD_MOVE_GRACE', os.environ.get('GUNICORN_TIMEOUT', 30)))
+
+DATABASE_ROUTERS = ['core.routers.ShardRouter']
+
+# Seconds a user keeps reading from the primary after a write.
+DATABASE_REPLICA_PIN_SECONDS = int(os.environ.get('DB_REPLICA_PIN_SECONDS', 5))
+# Replicas lagging more than this many seconds are skipped.
+DATABASE_REPLICA_MAX_LAG = float(os.environ.get('DB_REPLICA_MAX_LAG', 2))
+# Seconds between replica lag checks in each process.
+DATABASE_REPLICA_CHECK_INTERVAL = float(os.environ.get('DB_REPLICA_CHECK_INTERVAL', 5))
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+if os.environ.get('REDIS_URL'):
+    CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ['REDIS_URL'],
+    }
+
+# Seconds a cached project access set is served for. Invalidation reaches
+# every process only through a shared cache (REDIS_URL); with the local
+# memory cache this bounds how long other processes serve a stale set.
+PROJECT_ACCESS_CACHE_TIMEOUT = int(os.environ.get('PROJECT_ACCESS_CACHE_TIMEOUT', 60))
 
 
 # Password validation
@@ -102,7 +175,7 @@ AUTH_PASSWORD_VALIDATORS = [
         'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator',
     },
     {
-        'NAME': 'django.contrib.auth.password_validation.CommonPasswordValidator',
+        'NAME': 'core.validators.CommonPasswordValidator',
     },
     {
         'NAME': 'django.contrib.auth.password_validation.NumericPasswordValidator',
@@ -135,7 +208,9 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 AUTH_USER_MODEL = 'core.User'
 
 REST_FRAMEWORK = {
-    'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
+    # Proxies in front of the app whose X-Forwarded-For entries are trusted
+    # for client IPs; with none, REMOTE_ADDR is used and the header ignored.
+    'NUM_PROXIES': int(os.environ.get('NUM_PROXIES', 0)),
     # 'DEFAULT_AUTHENTICATION_CLASSES': (
     #         'rest_framework_simplejwt.authentication.JWTAuthentication',
     # ),
@@ -159,6 +234,99 @@ SIMPLE_JWT = {
     "JTI_CLAIM": "jti",
     "TOKEN_USER_CLASS": "rest_framework_simplejwt.models.TokenUser",
 }
+# Build list/retrieve responses of simple serializers from values() rows.
+FAST_READ_SERIALIZERS = os.environ.get('FAST_READ_SERIALIZERS', '0') == '1'
+
+# Activity log entries are buffered per process and written in batches.
+ACTIVITY_FLUSH_SIZE = int(os.environ.get('ACTIVITY_FLUSH_SIZE', 500))
+ACTIVITY_FLUSH_INTERVAL = float(os.environ.get('ACTIVITY_FLUSH_INTERVAL', 5))
+ACTIVITY_BUFFER_SIZE = int(os.environ.get('ACTIVITY_BUFFER_SIZE', 10000))
+# What to do when the buffer is full: 'drop' new entries or 'block' the
+# request until a flush made room.
+ACTIVITY_OVERFLOW = os.environ.get('ACTIVITY_OVERFLOW', 'drop')
+
+# Responses stored for Idempotency-Key retries are kept this many seconds.
+IDEMPOTENCY_KEY_TTL = int(os.environ.get('IDEMPOTENCY_KEY_TTL', 24 * 60 * 60))
+# Seconds a retry waits for the first request with its key to finish.
+IDEMPOTENCY_WAIT = float(os.environ.get('IDEMPOTENCY_WAIT', 10))
+# Seconds after which a key whose request never finished can be taken over.
+IDEMPOTENCY_LOCK_TIMEOUT = float(os.environ.get('IDEMPOTENCY_LOCK_TIMEOUT', 60))
+
+# Limits of /api/batch/: sub-requests per batch, threads running reads
+# concurrently and seconds of work after which the rest is not run.
+BATCH_MAX_REQUESTS = int(os.environ.get('BATCH_MAX_REQUESTS', 25))
+BATCH_MAX_WORKERS = int(os.environ.get('BATCH_MAX_WORKERS', 4))
+BATCH_TIME_BUDGET = float(os.environ.get('BATCH_TIME_BUDGET', 10))
+
+# Attempts per client IP and per email on the endpoints that hash passwords
+# (sign up and log in), counted over a sliding window.
+AUTH_THROTTLE_ENABLED = os.environ.get('AUTH_THROTTLE_ENABLED', '1') == '1'
+AUTH_THROTTLE_RATES = {
+    'password_ip': os.environ.get('AUTH_THROTTLE_IP_RATE', '30/min'),
+    'password_email': os.environ.get('AUTH_THROTTLE_EMAIL_RATE', '10/min'),
+}
+
+# Readiness fails when a database takes longer than this many seconds to
+# answer; each process checks at most once per HEALTH_READY_CACHE_SECONDS.
+HEALTH_MAX_DB_LATENCY = float(os.environ.get('HEALTH_MAX_DB_LATENCY', 0.5))
+HEALTH_READY_CACHE_SECONDS = float(os.environ.get('HEALTH_READY_CACHE_SECONDS', 5))
+
+# /metrics answers scrapes from these addresses, or bearing METRICS_TOKEN as
+# `Authorization: Bearer <token>`; database, cache and email backlog figures
+# are read at most once per METRICS_SERVER_CACHE_SECONDS in each process.
+METRICS_ALLOWED_IPS = [ip for ip in os.environ.get('METRICS_ALLOWED_IPS', '127.0.0.1,::1').split(',') if ip]
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+METRICS_SERVER_CACHE_SECONDS = float(os.environ.get('METRICS_SERVER_CACHE_SECONDS', 15))
+
+# Where profiles of requests made with ?profile= by staff users are written,
+# and the sampling profiler's interval in seconds.
+PROFILING_DIR = os.environ.get('PROFILING_DIR', '/tmp/profiles')
+PROFILING_SAMPLE_INTERVAL = float(os.environ.get('PROFILING_SAMPLE_INTERVAL', 0.001))
+
+# Processes in the password hashing pool a web worker creates on its first
+# bulk onboarding, and the most rows the onboarding endpoint takes in one
+# file. Every gunicorn worker may hold such a pool, so keep it small.
+ONBOARDING_HASH_WORKERS = int(os.environ.get('ONBOARDING_HASH_WORKERS', 2))
+ONBOARDING_MAX_ROWS = int(os.environ.get('ONBOARDING_MAX_ROWS', 5000))
+
+# Build URL patterns, password validators, templates and serializers when the
+# WSGI/ASGI application loads instead of on the first requests.
+WARMUP_ON_STARTUP = os.environ.get('WARMUP_ON_STARTUP', '1') == '1'
+WARMUP_TEMPLATES = ['emails/confirm_account_email.html', 'emails/digest_email.html', 'emails/digest_email.txt']
+
+# Seconds a cached task dependency graph is served for; like the access
+# sets, this bounds staleness in processes that do not share the cache.
+TASK_GRAPH_CACHE_TIMEOUT = int(os.environ.get('TASK_GRAPH_CACHE_TIMEOUT', 60))
+
+# Task ranks longer than this are respread by the rebalance_ranks command,
+# and the most tasks a board column returns per page.
+TASK_RANK_MAX_LENGTH = int(os.environ.get('TASK_RANK_MAX_LENGTH', 24))
+BOARD_MAX_COLUMN_SIZE = int(os.environ.get('BOARD_MAX_COLUMN_SIZE', 100))
+
+# Outbound webhooks: seconds before a POST times out, keep-alive connections
+# per host, deliveries claimed per round, and the exponential backoff
+# (base and cap in seconds) until a delivery fails for good.
+WEBHOOK_TIMEOUT = float(os.environ.get('WEBHOOK_TIMEOUT', 10))
+WEBHOOK_POOL_SIZE = int(os.environ.get('WEBHOOK_POOL_SIZE', 4))
+WEBHOOK_BATCH_SIZE = int(os.environ.get('WEBHOOK_BATCH_SIZE', 200))
+WEBHOOK_RETRY_BASE = float(os.environ.get('WEBHOOK_RETRY_BASE', 30))
+WEBHOOK_RETRY_MAX = float(os.environ.get('WEBHOOK_RETRY_MAX', 6 * 60 * 60))
+WEBHOOK_MAX_ATTEMPTS = int(os.environ.get('WEBHOOK_MAX_ATTEMPTS', 10))
+# Let webhooks reach loopback, link-local and private addresses; only for
+# development, as any manager could then probe the internal network.
+WEBHOOK_ALLOW_PRIVATE_ADDRESSES = os.environ.get('WEBHOOK_ALLOW_PRIVATE_ADDRESSES', '0') == '1'
+
+# Notification digests: seconds a notification waits so later events join
+# the same email, users mailed per SMTP connection, and the sender.
+DIGEST_DELAY = int(os.environ.get('DIGEST_DELAY', 60 * 60))
+DIGEST_BATCH_SIZE = int(os.environ.get('DIGEST_BATCH_SIZE', 100))
+DIGEST_FROM_EMAIL = os.environ.get('DIGEST_FROM_EMAIL', 'no-reply@yourdomain.com')
+# Seconds a run holds the notifications of a batch it is sending; past
+# that, a run that died mid batch is assumed gone and they are sent again.
+DIGEST_CLAIM_TIMEOUT = int(os.environ.get('DIGEST_CLAIM_TIMEOUT', 10 * 60))
+
 SPECTACULAR_SETTINGS = {
     'COMPONENT_SPLIT_REQUEST': True,
-}
\ No newline at end of file
+}
+if SCHEMA_LIVE:
+    REST_FRAMEWORK['DEFAULT_SCHEMA_CLASS'] = 'drf_spectacular.openapi.AutoSchema'
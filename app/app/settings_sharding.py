@@ -0,0 +1,18 @@
+"""
+Settings running the sharding tests on three local SQLite databases:
+
+    python manage.py test core.tests.test_sharding --settings=app.settings_sharding
+"""
+from app.settings import *  # noqa: F401,F403
+from app.settings import BASE_DIR
+
+DATABASE_REPLICAS = []
+DATABASE_SHARDS = ['default', 'shard_1', 'shard_2']
+DATABASES = {
+    alias: {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / f'{alias}.sqlite3',
+    }
+    for alias in DATABASE_SHARDS
+}
+SHARD_MOVE_GRACE = 0
@@ -15,28 +15,47 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 
-from drf_spectacular.views import (
-    SpectacularAPIView,
-    SpectacularSwaggerView,
-)
-
 from django.conf.urls.static import static
 from django.conf import settings
 from django.contrib import admin
 from django.urls import path, include
 
+from core import views as core_views
+from core.metrics import metrics
+
 urlpatterns = [
     path('admin/', admin.site.urls),
-    path('api/schema', SpectacularAPIView.as_view(), name='api-schema'),
-    path(
-        'api/docs/',
-        SpectacularSwaggerView.as_view(url_name='api-schema'), name='api-docs'
-    ),
-
     path('api/auth/', include('user.urls')),
     path('api/project/', include('project.urls')),
+    path('api/batch/', core_views.batch, name='batch'),
+    path('api/health/', core_views.health_check, name='health-check'),
+    path('api/health/ready/', core_views.readiness_check, name='readiness-check'),
+    path('metrics', metrics, name='metrics'),
 ]
 
+if settings.SCHEMA_LIVE:
+    from drf_spectacular.views import (
+        SpectacularAPIView,
+        SpectacularSwaggerView,
+    )
+
+    urlpatterns += [
+        path('api/schema', SpectacularAPIView.as_view(), name='api-schema'),
+        path(
+            'api/docs/',
+            SpectacularSwaggerView.as_view(url_name='api-schema'), name='api-docs'
+        ),
+    ]
+else:
+    urlpatterns += [
+        path('api/schema', core_views.openapi_schema, name='api-schema'),
+        path(
+            'api/schema/<str:version>.yaml',
+            core_views.openapi_schema_version, name='api-schema-version'
+        ),
+        path('api/docs/', core_views.api_docs, name='api-docs'),
+    ]
+
 if settings.DEBUG:
     urlpatterns += static(
         settings.MEDIA_URL,
@@ -0,0 +1,200 @@
+"""
+Buffered activity log.
+
+Recording an event only appends it to an in-process buffer once the
+surrounding transaction commits, so rolled back changes are never logged and
+requests do not pay for an extra INSERT. The buffer is written with one
+bulk_create when it holds ACTIVITY_FLUSH_SIZE entries or ACTIVITY_FLUSH_INTERVAL
+seconds have passed, checked on every record, after every request and by the
+optional flusher thread, and a last time when the process exits. It holds at
+most ACTIVITY_BUFFER_SIZE entries: past that, new entries are dropped and
+counted, or with ACTIVITY_OVERFLOW = 'block' the recording request flushes
+before it goes on. Entries still buffered when a process is killed are lost,
+so listeners that must see every event, like webhooks and digests, use the
+activity_committed signal instead: a request sends it once when it finishes,
+with every event it committed, so their lookups run once per request rather
+than once per event; outside requests it is sent right after each commit.
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.signals import request_finished, request_started
+from django.db import DatabaseError, close_old_connections, transaction
+from django.utils import timezone
+
+from core.models import Activity, Project
+from core.signals import activity_committed
+
+logger = logging.getLogger(__name__)
+
+_actor = ContextVar('activity_actor', default=None)
+_committed = ContextVar('activity_committed', default=None)
+_buffer = deque()
+_lock = threading.Lock()
+_flush_lock = threading.Lock()
+_last_flush = time.monotonic()
+dropped = 0
+
+
+def set_actor(user):
+    """Attribute the events recorded in this context to a user."""
+    return _actor.set(user.pk if user is not None and user.is_authenticated else None)
+
+
+def reset_actor(token):
+    _actor.reset(token)
+
+
+def record_event(action, object_type, object_id, project_ids=None, task_id=None, actor_id=None, using=None):
+    """Queue an event once the transaction on `using` commits; without project ids, the projects of task_id are used."""
+    entry = (
+        actor_id if actor_id is not None else _actor.get(),
+        action,
+        object_type,
+        object_id,
+        tuple(project_ids) if project_ids is not None else None,
+        task_id,
+        timezone.now(),
+    )
+    transaction.on_commit(lambda: committed(entry), using=using)
+
+
+def record(action, instance, project_ids=None):
+    """Queue an event about a project, task, note or task completion."""
+    task_id = None
+    if isinstance(instance, Project):
+        project_ids = (instance.pk,) if project_ids is None else project_ids
+    else:
+        task_id = getattr(instance, 'task_id', instance.pk)
+    record_event(action, instance._meta.model_name, instance.pk, project_ids, task_id, using=instance._state.db)
+
+
+def committed(entry):
+    """Buffer an event whose transaction committed and publish it, at the end of the request in one."""
+    pending = _committed.get()
+    if pending is None:
+        publish([entry])
+    else:
+        pending.append(entry)
+    enqueue(entry)
+
+
+def publish(entries):
+    """Send activity_committed with the Activity rows of committed entries."""
+    try:
+        rows = _build_rows(entries)
+    except DatabaseError:
+        logger.exception('Could not resolve the projects of %d committed events', len(entries))
+        return
+    activity_committed.send(sender=Activity, activities=rows)
+
+
+def start_request(**kwargs):
+    _committed.set([])
+
+
+def finish_request(**kwargs):
+    """Publish the events the request committed."""
+    pending = _committed.get()
+    _committed.set(None)
+    if pending:
+        publish(pending)
+
+
+def enqueue(entry):
+    """Add an entry to the buffer, flushing or dropping as configured."""
+    global dropped
+    with _lock:
+        full = len(_buffer) >= settings.ACTIVITY_BUFFER_SIZE
+        if full and settings.ACTIVITY_OVERFLOW != 'block':
+            dropped += 1
+            logger.warning('Activity buffer full, dropped an entry (%d so far)', dropped)
+        elif not full:
+            _buffer.append(entry)
+    if full and settings.ACTIVITY_OVERFLOW == 'block':
+        flush()
+        with _lock:
+            _buffer.append(entry)
+    if len(_buffer) >= settings.ACTIVITY_FLUSH_SIZE:
+        flush()
+    else:
+        flush_if_due()
+
+
+def _build_rows(entries):
+    """Turn buffered entries into Activity rows, one per affected project."""
+    task_ids = {entry[5] for entry in entries if entry[4] is None and entry[5] is not None}
+    task_projects = {}
+    if task_ids:
+        # Task ids are unique across shards, so each shard only returns its own links.
+        for alias in settings.DATABASE_SHARDS:
+            links = Project.tasks.through.objects.using(alias).filter(task_id__in=task_ids)
+            for task_id, project_id in links.values_list('task_id', 'project_id'):
+                task_projects.setdefault(task_id, []).append(project_id)
+    rows = []
+    for actor_id, action, object_type, object_id, project_ids, task_id, created_at in entries:
+        if project_ids is None:
+            project_ids = task_projects.get(task_id, ())
+        rows.extend(
+            Activity(
+                actor_id=actor_id,
+                action=action,
+                object_type=object_type,
+                object_id=object_id,
+                project_id=project_id,
+                created_at=created_at,
+            )
+            for project_id in project_ids or (None,)
+        )
+    return rows
+
+
+def flush():
+    """Write the buffered entries; return the number of rows written."""
+    global _last_flush
+    with _flush_lock:
+        with _lock:
+            entries = list(_buffer)
+            _buffer.clear()
+            _last_flush = time.monotonic()
+        if not entries:
+            return 0
+        try:
+            rows = Activity.objects.bulk_create(
+                _build_rows(entries),
+                batch_size=settings.ACTIVITY_FLUSH_SIZE,
+            )
+        except DatabaseError:
+            logger.exception('Could not write %d activity entries', len(entries))
+            return 0
+    return len(rows)
+
+
+def flush_if_due(**kwargs):
+    """Flush when the time threshold has passed since the last flush."""
+    if _buffer and time.monotonic() - _last_flush >= settings.ACTIVITY_FLUSH_INTERVAL:
+        flush()
+
+
+def start_flusher():
+    """Flush on the time threshold from a daemon thread, even while idle."""
+    def run():
+        while True:
+            time.sleep(settings.ACTIVITY_FLUSH_INTERVAL)
+            flush_if_due()
+            close_old_connections()
+
+    thread = threading.Thread(target=run, name='activity-flusher', daemon=True)
+    thread.start()
+    return thread
+
+
+request_started.connect(start_request, dispatch_uid='activity-start-request')
+request_finished.connect(finish_request, dispatch_uid='activity-publish-committed')
+request_finished.connect(flush_if_due, dispatch_uid='activity-flush-if-due')
+atexit.register(flush)
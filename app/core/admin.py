@@ -2,17 +2,138 @@
 Django admin customization
 """
 
-from django.contrib import admin
+import json
+
+from django.conf import settings
+from django.contrib import admin, messages
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from django.core.exceptions import ValidationError
+from django.core.paginator import Paginator
+from django.db import connections, transaction
+from django.db.models import F
+from django.utils.functional import cached_property
 from django.utils.translation import gettext_lazy as _
 
 from core import models as core_models
+from core.activity import record_event
+from core.routers import is_sharded, sharding_enabled, use_shard
+from core.sharding import fan_out_counts, locate
+from core.signals import task_statuses_changed
+
+# Below this many rows an exact COUNT(*) is cheap enough.
+ESTIMATE_THRESHOLD = 100_000
+
+
+def estimated_count(queryset, threshold=ESTIMATE_THRESHOLD):
+    """Count rows, using PostgreSQL's estimates for large tables."""
+    connection = connections[queryset.db]
+    if connection.vendor != 'postgresql':
+        return queryset.count()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass',
+            [queryset.model._meta.db_table],
+        )
+        row = cursor.fetchone()
+    table_rows = row[0] if row else -1
+    if table_rows < threshold:
+        return queryset.count()
+    if not queryset.query.where:
+        return table_rows
+    plan = json.loads(queryset.explain(format='json'))
+    return plan[0]['Plan']['Plan Rows']
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator that never runs an exact COUNT(*) over a large table."""
+
+    @cached_property
+    def count(self):
+        return estimated_count(self.object_list)
+
+
+class LargeTableAdminMixin:
+    """Changelist settings for tables with millions of rows"""
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_per_page = 50
+
+
+class ShardListFilter(admin.SimpleListFilter):
+    """Pick the shard a changelist shows, with the estimated rows of each"""
+    title = _('shard')
+    parameter_name = 'shard'
+
+    def lookups(self, request, model_admin):
+        counts = fan_out_counts(model_admin.model._default_manager.all(), estimated_count)
+        return [(alias, f'{alias} ({count})') for alias, count in counts.items()]
 
+    def queryset(self, request, queryset):
+        if self.value() in settings.DATABASE_SHARDS:
+            return queryset.using(self.value())
+        return queryset
 
-class UserAdmin(BaseUserAdmin):
+
+class ShardedAdminMixin:
+    """Admin pages for sharded models
+
+    Changelists show one shard at a time, the first one unless another is
+    picked in the shard filter. Users live on the primary only, so relations
+    to them are prefetched instead of joined. Change and delete pages find
+    their object on whichever shard holds it.
+    """
+
+    def _global_relations(self):
+        return [
+            name for name in self.list_select_related
+            if not is_sharded(self.model._meta.get_field(name).related_model)
+        ]
+
+    def get_list_filter(self, request):
+        list_filter = super().get_list_filter(request)
+        if sharding_enabled():
+            return [ShardListFilter, *list_filter]
+        return list_filter
+
+    def get_list_select_related(self, request):
+        if not sharding_enabled():
+            return super().get_list_select_related(request)
+        return [name for name in self.list_select_related if name not in self._global_relations()]
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        if sharding_enabled():
+            queryset = queryset.prefetch_related(*self._global_relations())
+        return queryset
+
+    def get_object(self, request, object_id, from_field=None):
+        if not sharding_enabled():
+            return super().get_object(request, object_id, from_field)
+        field = self.model._meta.get_field(from_field) if from_field else self.model._meta.pk
+        try:
+            return locate(self.get_queryset(request), **{field.name: field.to_python(object_id)})
+        except ValidationError:
+            return None
+
+    def changeform_view(self, request, object_id=None, form_url='', extra_context=None):
+        if not sharding_enabled() or object_id is None:
+            return super().changeform_view(request, object_id, form_url, extra_context)
+        obj = self.get_object(request, object_id)
+        alias = obj._state.db if obj is not None else settings.DATABASE_SHARDS[0]
+        # Form fields validate and the page renders against the object's shard.
+        with use_shard(alias):
+            response = super().changeform_view(request, object_id, form_url, extra_context)
+            if hasattr(response, 'render'):
+                response.render()
+        return response
+
+
+class UserAdmin(LargeTableAdminMixin, BaseUserAdmin):
     """Define the admin pages for users"""
     ordering = ['id']
     list_display = ['email', 'name']
+    list_filter = ['is_staff', 'is_superuser', 'is_active', 'confirmed']
+    search_fields = ['^email', '^name']
     fieldsets = (
         (None, {'fields': ('email', 'password')}),
         (_('Personal Info'), {'fields': ('name',)}),
@@ -47,6 +168,115 @@ class UserAdmin(BaseUserAdmin):
     )
 
 
+class DeletionJobAdmin(admin.ModelAdmin):
+    """Show the progress of background purges"""
+    list_display = ['kind', 'object_id', 'status', 'deleted_rows', 'created_at', 'updated_at', 'completed_at']
+    list_filter = ['status', 'kind']
+    readonly_fields = ['kind', 'object_id', 'status', 'deleted_rows', 'created_at', 'updated_at', 'completed_at']
+
+
+class ActivityAdmin(LargeTableAdminMixin, admin.ModelAdmin):
+    """Browse the activity log"""
+    list_display = ['created_at', 'action', 'object_type', 'object_id', 'project_id', 'actor_id']
+    list_filter = ['action', 'object_type']
+    readonly_fields = list_display
+    ordering = ['-id']
+
+
+class TaskStatusTransitionAdmin(ShardedAdminMixin, LargeTableAdminMixin, admin.ModelAdmin):
+    """Browse the task status history"""
+    list_display = ['task', 'completion', 'from_status', 'to_status', 'changed_at']
+    list_filter = ['to_status']
+    list_select_related = ['task', 'completion']
+    readonly_fields = list_display
+    ordering = ['-id']
+
+
+def status_action(status):
+    """Build an admin action setting the status of the selected tasks at once."""
+    def action(modeladmin, request, queryset):
+        using = queryset.db
+        with transaction.atomic(using=using):
+            previous = dict(queryset.select_for_update().exclude(status=status).values_list('id', 'status'))
+            ids = list(previous)
+            updated = core_models.Task.objects.using(using).filter(id__in=ids).update(
+                status=status, version=F('version') + 1,
+            )
+            core_models.TaskStatusTransition.objects.using(using).bulk_create(
+                core_models.TaskStatusTransition(task_id=task_id, from_status=from_status, to_status=status)
+                for task_id, from_status in previous.items()
+            )
+        task_statuses_changed.send(sender=core_models.Task, task_ids=ids, using=using)
+        for task_id in ids:
+            record_event(
+                core_models.Activity.Action.UPDATED, 'task', task_id,
+                task_id=task_id, actor_id=request.user.pk, using=using,
+            )
+        modeladmin.message_user(
+            request,
+            _('%(count)d tasks marked as %(status)s.') % {'count': updated, 'status': status.label},
+            messages.SUCCESS,
+        )
+
+    action.__name__ = f'mark_{status.value}'
+    action.short_description = _('Mark selected tasks as %(status)s') % {'status': status.label}
+    return action
+
+
+class ProjectAdmin(ShardedAdminMixin, LargeTableAdminMixin, admin.ModelAdmin):
+    """Define the admin pages for projects"""
+    list_display = ['title', 'client_name', 'manager']
+    list_select_related = ['manager']
+    search_fields = ['^title', '^client_name']
+    autocomplete_fields = ['manager', 'team', 'tasks']
+    ordering = ['-id']
+
+
+class TaskAdmin(ShardedAdminMixin, LargeTableAdminMixin, admin.ModelAdmin):
+    """Define the admin pages for tasks"""
+    list_display = ['title', 'status', 'completed_by']
+    list_filter = ['status']
+    list_select_related = ['completed_by']
+    search_fields = ['^title']
+    autocomplete_fields = ['completed_by']
+    ordering = ['-id']
+    actions = [status_action(status) for status in core_models.TaskStatus]
+
+
+class NoteAdmin(ShardedAdminMixin, LargeTableAdminMixin, admin.ModelAdmin):
+    """Define the admin pages for notes"""
+    list_display = ['__str__', 'created_by', 'task']
+    list_select_related = ['created_by', 'task']
+    autocomplete_fields = ['created_by', 'task']
+    ordering = ['-id']
+
+
+class TaskDependencyAdmin(ShardedAdminMixin, LargeTableAdminMixin, admin.ModelAdmin):
+    """Browse task dependencies, which are added through the API to keep them acyclic"""
+    list_display = ['task', 'blocked_by', 'project', 'created_at']
+    list_select_related = ['task', 'blocked_by', 'project']
+    readonly_fields = list_display
+    ordering = ['-id']
+
+    def has_add_permission(self, request):
+        return False
+
+
+class TaskCompletionAdmin(ShardedAdminMixin, LargeTableAdminMixin, admin.ModelAdmin):
+    """Define the admin pages for task completions"""
+    list_display = ['task', 'user', 'status']
+    list_filter = ['status']
+    list_select_related = ['task', 'user']
+    autocomplete_fields = ['task', 'user']
+    ordering = ['-id']
+
+
 admin.site.register(core_models.User, UserAdmin)
-admin.site.register(core_models.Project)
-admin.site.register(core_models.Task)
+admin.site.register(core_models.Project, ProjectAdmin)
+admin.site.register(core_models.Task, TaskAdmin)
+admin.site.register(core_models.Note, NoteAdmin)
+admin.site.register(core_models.TaskDependency, TaskDependencyAdmin)
+admin.site.register(core_models.TaskCompletion, TaskCompletionAdmin)
+admin.site.register(core_models.DeletionJob, DeletionJobAdmin)
+admin.site.register(core_models.Activity, ActivityAdmin)
+admin.site.register(core_models.TaskStatusTransition, TaskStatusTransitionAdmin)
@@ -1,6 +1,13 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        from core import activity  # noqa: F401
+        from core import sharding
+
+        post_migrate.connect(sharding.reserve_id_ranges, sender=self)
@@ -0,0 +1,144 @@
+"""
+Execution of batched API requests.
+
+Every sub-request is turned into a request of its own and handed straight to
+the view its path resolves to, skipping the middleware: the batch has
+already been authenticated and sub-requests run as its user, through a copy
+of the view whose only authentication is SubRequestAuthentication. Sub-requests
+run in order. With concurrent set, each run of consecutive safe requests is
+spread over a thread pool; unsafe requests act as barriers, so reads listed
+after a write still see it. Once BATCH_TIME_BUDGET seconds have been spent,
+the remaining sub-requests are not run: each one checks the deadline before
+it starts, and the batch waits for those already started, so nothing runs
+after the batch has answered and the answer lists what was not run.
+"""
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.handlers.exception import convert_exception_to_response
+from django.db import connections
+from django.test.client import RequestFactory
+from django.urls import Resolver404, resolve
+from rest_framework import status
+from rest_framework.authentication import BaseAuthentication
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.views import APIView
+
+# Outer request META copied to sub-requests so host checks and client
+# details, including the address throttles key on, stay the same.
+INHERITED_META = (
+    'HTTP_HOST', 'SERVER_NAME', 'SERVER_PORT', 'REMOTE_ADDR', 'HTTP_X_FORWARDED_FOR',
+    'HTTP_USER_AGENT', 'HTTP_ACCEPT_LANGUAGE', 'wsgi.url_scheme',
+)
+
+NOT_RUN = {'status': status.HTTP_503_SERVICE_UNAVAILABLE, 'body': {'detail': 'Batch time budget exhausted.'}}
+
+
+class SubRequestAuthentication(BaseAuthentication):
+    """Authenticate a sub-request as the user and token of its batch."""
+
+    def authenticate(self, request):
+        return getattr(request._request, 'batch_auth', None)
+
+
+@lru_cache(maxsize=None)
+def sub_request_view(view):
+    """Return a copy of a DRF view authenticating with SubRequestAuthentication only."""
+    cls = getattr(view, 'cls', None)
+    if cls is None or not issubclass(cls, APIView):
+        return view
+    initkwargs = {**view.initkwargs, 'authentication_classes': [SubRequestAuthentication]}
+    if getattr(view, 'actions', None) is not None:
+        return cls.as_view(view.actions, **initkwargs)
+    return cls.as_view(**initkwargs)
+
+
+def build_request(request, sub):
+    """Build the HttpRequest of a sub-request, authenticated as the batch's user."""
+    meta = {name: request.META[name] for name in INHERITED_META if name in request.META}
+    for name, value in sub['headers'].items():
+        meta[f"HTTP_{name.upper().replace('-', '_')}"] = value
+    path, _, query = sub['path'].partition('?')
+    meta['QUERY_STRING'] = query
+    data = json.dumps(sub['body']) if sub['body'] is not None else ''
+    sub_request = RequestFactory().generic(sub['method'], path, data, 'application/json', **meta)
+    sub_request.user = request.user
+    sub_request.batch_auth = (request.user, request.auth)
+    return sub_request
+
+
+def encode_response(response):
+    """Return the status, headers and decoded body of a sub-response."""
+    if hasattr(response, 'render') and not response.is_rendered:
+        response.render()
+    content_type = response.get('Content-Type', '')
+    body = response.content.decode(response.charset or 'utf-8')
+    if body and content_type.startswith('application/json'):
+        body = json.loads(body)
+    headers = {name: response[name] for name in ('Content-Type', 'Location') if response.has_header(name)}
+    return {'status': response.status_code, 'headers': headers, 'body': body}
+
+
+def execute(request, sub):
+    """Run one sub-request through its view."""
+    sub_request = build_request(request, sub)
+    try:
+        match = resolve(sub_request.path_info)
+    except Resolver404:
+        return {'status': status.HTTP_404_NOT_FOUND, 'body': {'detail': 'Not found.'}}
+    view = convert_exception_to_response(sub_request_view(match.func))
+    return encode_response(view(sub_request, *match.args, **match.kwargs))
+
+
+def _execute_in_thread(request, sub, deadline):
+    if time.monotonic() >= deadline:
+        return NOT_RUN
+    try:
+        return execute(request, sub)
+    finally:
+        connections.close_all()
+
+
+def segments(subs, concurrent):
+    """Split sub-requests into (concurrent, [(index, sub)]) runs."""
+    runs = []
+    for index, sub in enumerate(subs):
+        parallel = concurrent and sub['method'] in SAFE_METHODS
+        if runs and parallel and runs[-1][0]:
+            runs[-1][1].append((index, sub))
+        else:
+            runs.append((parallel, [(index, sub)]))
+    return runs
+
+
+def run_batch(request, subs, concurrent=False):
+    """Run the sub-requests of a batch and return their responses in order."""
+    deadline = time.monotonic() + settings.BATCH_TIME_BUDGET
+    responses = [NOT_RUN] * len(subs)
+    for parallel, run in segments(subs, concurrent):
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        if not parallel or len(run) == 1:
+            for index, sub in run:
+                if time.monotonic() >= deadline:
+                    break
+                responses[index] = execute(request, sub)
+            continue
+        pool = ThreadPoolExecutor(min(settings.BATCH_MAX_WORKERS, len(run)))
+        futures = {pool.submit(_execute_in_thread, request, sub, deadline): index for index, sub in run}
+        wait(futures, timeout=remaining)
+        # Drop the queued sub-requests and let the started ones finish.
+        pool.shutdown(wait=True, cancel_futures=True)
+        for future, index in futures.items():
+            if not future.cancelled():
+                responses[index] = future.result()
+    return responses
+
+
+def not_run(responses):
+    """Return the indexes of the sub-requests the time budget left out."""
+    return [index for index, response in enumerate(responses) if response is NOT_RUN]
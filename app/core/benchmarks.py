@@ -0,0 +1,95 @@
+"""
+Helpers shared by the benchmark management commands.
+"""
+import statistics
+import time
+from contextlib import contextmanager
+
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+
+from core.models import Project, Task
+
+
+@contextmanager
+def rolled_back():
+    """Run the block in a transaction that is always rolled back."""
+    with transaction.atomic():
+        yield
+        transaction.set_rollback(True)
+
+
+def timed(func, repeat=5):
+    """Call func repeat times and return (median, best) in milliseconds."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), min(samples)
+
+
+def explain(queryset):
+    """Return the query plan of a queryset, analysed where supported."""
+    if connection.vendor == 'postgresql':
+        return queryset.explain(analyze=True)
+    return queryset.explain()
+
+
+def seed_users(count, prefix='bench'):
+    """Create users without hashing a password for each one."""
+    User = get_user_model()
+    users = [
+        User(email=f'{prefix}{i}@example.com', name=f'{prefix} {i}', password='!')
+        for i in range(count)
+    ]
+    User.objects.bulk_create(users, batch_size=1000)
+    return list(User.objects.filter(email__startswith=prefix).order_by('id'))
+
+
+def seed_projects(manager, count, tasks_per_project=0, team=()):
+    """Create projects for a manager with tasks and team members attached."""
+    Project.objects.bulk_create(
+        [
+            Project(
+                manager=manager,
+                title=f'Project {i}',
+                client_name=f'Client {i}',
+                description=f'Description {i}',
+            )
+            for i in range(count)
+        ],
+        batch_size=1000,
+    )
+    projects = list(Project.objects.filter(manager=manager).order_by('id'))
+    Task.objects.bulk_create(
+        [
+            Task(
+                title=f'Task {i}',
+                description=f'Description {i}',
+                completed_by=manager,
+            )
+            for i in range(count * tasks_per_project)
+        ],
+        batch_size=1000,
+    )
+    tasks = list(Task.objects.filter(completed_by=manager).order_by('id'))
+    TaskLink = Project.tasks.through
+    TaskLink.objects.bulk_create(
+        [
+            TaskLink(project_id=project.id, task_id=tasks[i * tasks_per_project + j].id)
+            for i, project in enumerate(projects)
+            for j in range(tasks_per_project)
+        ],
+        batch_size=1000,
+    )
+    TeamLink = Project.team.through
+    TeamLink.objects.bulk_create(
+        [
+            TeamLink(project_id=project.id, user_id=member.id)
+            for project in projects
+            for member in team
+        ],
+        batch_size=1000,
+    )
+    return projects, tasks
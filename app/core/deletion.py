@@ -0,0 +1,180 @@
+"""
+Soft deletion and background purging of projects and users.
+
+Deleting a project or a user through the API only marks it deleted, which
+hides it from the default managers at once. The purge_deleted command then
+removes the dependent rows in small batches, each in its own transaction, so
+no single statement holds locks for long. A purge keeps no cursor of its
+own: every batch re-selects what is left, so a crashed purge resumes where it
+stopped.
+"""
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import F
+from django.utils import timezone
+from rest_framework.authtoken.models import Token as AuthToken
+
+from core.activity import record_event
+from core.models import (
+    Activity,
+    DeletionJob,
+    Note,
+    Notification,
+    Project,
+    Task,
+    TaskCompletion,
+    TaskDependency,
+    TaskStatusTransition,
+    Token,
+    Webhook,
+    WebhookDelivery,
+)
+from core.routers import current_shard, use_shard
+from core.sharding import locate, shard_for_manager
+from core.signals import projects_soft_deleted
+
+
+def schedule_project_deletion(project):
+    """Hide a project and queue the purge of its rows."""
+    alias = project._state.db or current_shard()
+    with transaction.atomic():
+        Project.all_objects.using(alias).filter(pk=project.pk).update(deleted_at=timezone.now())
+        job, _ = DeletionJob.objects.get_or_create(
+            kind=DeletionJob.Kind.PROJECT,
+            object_id=project.pk,
+        )
+        record_event(Activity.Action.DELETED, 'project', project.pk, [project.pk])
+    with use_shard(alias):
+        projects_soft_deleted.send(sender=Project, project_ids=[project.pk])
+    return job
+
+
+def schedule_user_deletion(user):
+    """Hide a user with their projects and queue the purge of their rows."""
+    User = get_user_model()
+    now = timezone.now()
+    alias = shard_for_manager(user.pk)
+    with transaction.atomic():
+        # Free the address straight away so it can sign up again.
+        User.all_objects.filter(pk=user.pk).update(
+            deleted_at=now,
+            is_active=False,
+            email=f'{user.pk}@deleted.invalid',
+        )
+        project_ids = list(
+            Project.objects.using(alias).filter(manager_id=user.pk).values_list('id', flat=True)
+        )
+        Project.all_objects.using(alias).filter(id__in=project_ids).update(deleted_at=now)
+        job, _ = DeletionJob.objects.get_or_create(
+            kind=DeletionJob.Kind.USER,
+            object_id=user.pk,
+        )
+        for project_id in project_ids:
+            record_event(Activity.Action.DELETED, 'project', project_id, [project_id])
+    with use_shard(alias):
+        projects_soft_deleted.send(sender=Project, project_ids=project_ids)
+    return job
+
+
+def project_purge_steps(project_id, alias=DEFAULT_DB_ALIAS):
+    """Return the (label, queryset) pairs deleting a project on its shard, leaves first."""
+    return [
+        ('task dependencies', TaskDependency.objects.using(alias).filter(project_id=project_id)),
+        ('project tasks', Project.tasks.through.objects.using(alias).filter(project_id=project_id)),
+        ('project team', Project.team.through.objects.using(alias).filter(project_id=project_id)),
+        ('projects', Project.all_objects.using(alias).filter(pk=project_id)),
+    ]
+
+
+def user_purge_steps(user_id):
+    """Return the (label, queryset) pairs deleting a user, leaves first.
+
+    The user may have written notes or completions on any shard, so the
+    sharded steps are repeated on each of them.
+    """
+    User = get_user_model()
+    steps = []
+    for alias in settings.DATABASE_SHARDS:
+        links = Project.tasks.through.objects.using(alias)
+        team = Project.team.through.objects.using(alias)
+        dependencies = TaskDependency.objects.using(alias)
+        steps += [
+            ('task dependencies', dependencies.filter(project__manager_id=user_id)),
+            ('project tasks', links.filter(project__manager_id=user_id)),
+            ('project team', team.filter(project__manager_id=user_id)),
+            ('team memberships', team.filter(user_id=user_id)),
+            ('projects', Project.all_objects.using(alias).filter(manager_id=user_id)),
+            ('notes', Note.objects.using(alias).filter(task__completed_by_id=user_id)),
+            ('notes', Note.objects.using(alias).filter(created_by_id=user_id)),
+            ('status transitions', TaskStatusTransition.objects.using(alias).filter(task__completed_by_id=user_id)),
+            ('status transitions', TaskStatusTransition.objects.using(alias).filter(completion__user_id=user_id)),
+            ('task completions', TaskCompletion.objects.using(alias).filter(task__completed_by_id=user_id)),
+            ('task completions', TaskCompletion.objects.using(alias).filter(user_id=user_id)),
+            ('task dependencies', dependencies.filter(task__completed_by_id=user_id)),
+            ('task dependencies', dependencies.filter(blocked_by__completed_by_id=user_id)),
+            ('task links', links.filter(task__completed_by_id=user_id)),
+            ('tasks', Task.objects.using(alias).filter(completed_by_id=user_id)),
+        ]
+    return steps + [
+        ('notifications', Notification.objects.filter(recipient_id=user_id)),
+        ('webhook deliveries', WebhookDelivery.objects.filter(webhook__manager_id=user_id)),
+        ('webhooks', Webhook.objects.filter(manager_id=user_id)),
+        ('confirmation tokens', Token.objects.filter(user_id=user_id)),
+        ('auth tokens', AuthToken.objects.filter(user_id=user_id)),
+        ('users', User.all_objects.filter(pk=user_id)),
+    ]
+
+
+def purge_steps(job):
+    """Return the purge steps of a deletion job."""
+    if job.kind == DeletionJob.Kind.PROJECT:
+        project = locate(Project.all_objects, pk=job.object_id)
+        if project is None:
+            return []
+        return project_purge_steps(job.object_id, project._state.db)
+    return user_purge_steps(job.object_id)
+
+
+def delete_in_batches(queryset, batch_size):
+    """Delete the rows of a queryset one batch per transaction, yielding counts."""
+    model = queryset.model
+    using = queryset.db
+    while True:
+        with transaction.atomic(using=using):
+            ids = list(queryset.values_list('pk', flat=True)[:batch_size])
+            if not ids:
+                return
+            deleted, _ = model._base_manager.using(using).filter(pk__in=ids).delete()
+        yield deleted
+
+
+def purge(job, batch_size=500, pause=0.1, progress=None):
+    """Purge everything a deletion job covers in bounded batches."""
+    DeletionJob.objects.filter(pk=job.pk).update(status=DeletionJob.Status.RUNNING)
+    for label, queryset in purge_steps(job):
+        for deleted in delete_in_batches(queryset, batch_size):
+            DeletionJob.objects.filter(pk=job.pk).update(
+                deleted_rows=F('deleted_rows') + deleted,
+                updated_at=timezone.now(),
+            )
+            job.deleted_rows += deleted
+            if progress is not None:
+                progress(job, label, deleted)
+            if pause:
+                time.sleep(pause)
+    now = timezone.now()
+    DeletionJob.objects.filter(pk=job.pk).update(
+        status=DeletionJob.Status.DONE,
+        completed_at=now,
+        updated_at=now,
+    )
+    job.status = DeletionJob.Status.DONE
+    return job
+
+
+def pending_jobs():
+    """Return the jobs still to purge, including ones interrupted mid-run."""
+    return DeletionJob.objects.exclude(status=DeletionJob.Status.DONE).order_by('created_at')
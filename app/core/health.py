@@ -0,0 +1,57 @@
+"""
+Liveness and readiness checks.
+
+Readiness pings every shard database, treating the errors wait_for_db waits
+on as down. The result is cached in each process for
+HEALTH_READY_CACHE_SECONDS so frequent probes from several load balancers
+cost at most one round of queries per interval.
+"""
+import threading
+import time
+
+from psycopg2 import OperationalError as Psycopg2Error
+
+from django.conf import settings
+from django.db import connections
+from django.db.utils import OperationalError
+
+# Errors meaning the database is not reachable (yet).
+DB_ERRORS = (Psycopg2Error, OperationalError)
+
+_lock = threading.Lock()
+_cached = None
+
+
+def database_latency(alias):
+    """Return the seconds a trivial query takes on a database."""
+    start = time.perf_counter()
+    with connections[alias].cursor() as cursor:
+        cursor.execute('SELECT 1')
+        cursor.fetchone()
+    return time.perf_counter() - start
+
+
+def check_databases():
+    """Ping every shard; return (ready, {alias: details})."""
+    ready, databases = True, {}
+    for alias in settings.DATABASE_SHARDS:
+        try:
+            latency = database_latency(alias)
+        except DB_ERRORS as exc:
+            ready = False
+            databases[alias] = {'ok': False, 'error': exc.__class__.__name__}
+            continue
+        ok = latency <= settings.HEALTH_MAX_DB_LATENCY
+        ready = ready and ok
+        databases[alias] = {'ok': ok, 'latency_ms': round(latency * 1000, 2)}
+    return ready, databases
+
+
+def readiness():
+    """Return the cached (ready, details) of this process, checking again when stale."""
+    global _cached
+    with _lock:
+        now = time.monotonic()
+        if _cached is None or now - _cached[0] >= settings.HEALTH_READY_CACHE_SECONDS:
+            _cached = (now, check_databases())
+        return _cached[1]
@@ -0,0 +1,156 @@
+"""
+Idempotency-Key support for mutating API requests.
+
+The first unsafe request with a given key claims it by inserting a row, runs
+normally and stores its response on the row. Retries with the same key and
+the same method, path and body get the stored response back without running
+the view again; a retry arriving while the first request is still running
+polls the row until the response is stored. Keys are scoped per user, or
+per client IP for anonymous requests, and expire after IDEMPOTENCY_KEY_TTL
+seconds. Server errors release the key so the request can be retried.
+
+Bodies may hold passwords, so the stored fingerprint is an HMAC keyed with
+SECRET_KEY rather than a plain hash that could be brute forced offline.
+"""
+import hashlib
+import hmac
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.throttling import BaseThrottle
+
+from core.models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+STORED_HEADERS = ('Content-Type', 'Location')
+POLL_INTERVAL = 0.1
+
+
+class IdempotencyKeyMismatch(APIException):
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    default_detail = _('This Idempotency-Key was already used for a different request.')
+    default_code = 'idempotency_key_mismatch'
+
+
+class IdempotencyKeyInProgress(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = _('A request with this Idempotency-Key is still being processed.')
+    default_code = 'idempotency_key_in_progress'
+
+
+class Replay(Exception):
+    """Carries the stored response of an already completed request."""
+
+    def __init__(self, response):
+        super().__init__()
+        self.response = response
+
+
+def request_scope(request):
+    user = request.user
+    if user is not None and user.is_authenticated:
+        return f'user:{user.pk}'
+    # Same client IP as the throttles, trusting NUM_PROXIES proxies.
+    return f'anonymous:{BaseThrottle().get_ident(request)}'
+
+
+def request_fingerprint(request):
+    """Hash what makes two requests the same: method, path and body."""
+    digest = hmac.new(settings.SECRET_KEY.encode(), digestmod=hashlib.sha256)
+    for part in (request.method.encode(), request.path.encode(), request.body):
+        digest.update(part)
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def replay_response(record):
+    response = HttpResponse(record.response_body, status=record.response_status)
+    for name, value in record.response_headers.items():
+        response[name] = value
+    response[REPLAYED_HEADER] = 'true'
+    return response
+
+
+def _insert(scope, key, fingerprint, now):
+    """Insert the row claiming a key; return None when it already exists."""
+    try:
+        with transaction.atomic():
+            return IdempotencyKey.objects.create(
+                scope=scope,
+                key=key,
+                fingerprint=fingerprint,
+                locked_at=now,
+                expires_at=now + timedelta(seconds=settings.IDEMPOTENCY_KEY_TTL),
+            )
+    except IntegrityError:
+        return None
+
+
+def _take_over(record, fingerprint, now):
+    """Check an existing row; return it if its request died and it is now ours."""
+    if record.fingerprint != fingerprint:
+        raise IdempotencyKeyMismatch()
+    if record.response_status is not None:
+        raise Replay(replay_response(record))
+    if record.locked_at > now - timedelta(seconds=settings.IDEMPOTENCY_LOCK_TIMEOUT):
+        return None
+    taken = IdempotencyKey.objects.filter(
+        pk=record.pk,
+        locked_at=record.locked_at,
+        response_status__isnull=True,
+    ).update(locked_at=now)
+    return record if taken else None
+
+
+def claim(request, key):
+    """Claim a key for this request, or raise Replay with the stored response."""
+    if len(key) > IdempotencyKey._meta.get_field('key').max_length:
+        raise ValidationError({HEADER: _('Keys can be at most 255 characters long.')})
+    scope = request_scope(request)
+    fingerprint = request_fingerprint(request._request)
+    deadline = time.monotonic() + settings.IDEMPOTENCY_WAIT
+    while True:
+        now = timezone.now()
+        IdempotencyKey.objects.filter(scope=scope, key=key, expires_at__lte=now).delete()
+        record = _insert(scope, key, fingerprint, now)
+        if record is not None:
+            return record
+        record = IdempotencyKey.objects.filter(scope=scope, key=key).first()
+        if record is None:
+            continue
+        if _take_over(record, fingerprint, now):
+            return record
+        if time.monotonic() >= deadline:
+            raise IdempotencyKeyInProgress()
+        time.sleep(POLL_INTERVAL)
+
+
+def store(record, response):
+    """Keep the response of a claimed key, or release the key after a server error."""
+    if response.status_code >= 500:
+        release(record)
+        return
+    if not getattr(response, 'is_rendered', True):
+        response.render()
+    IdempotencyKey.objects.filter(pk=record.pk).update(
+        response_status=response.status_code,
+        response_body=bytes(response.content),
+        response_headers={name: response[name] for name in STORED_HEADERS if response.has_header(name)},
+    )
+
+
+def release(record):
+    """Forget a claimed key so the request can be retried."""
+    IdempotencyKey.objects.filter(pk=record.pk).delete()
+
+
+def expired_keys():
+    return IdempotencyKey.objects.filter(expires_at__lte=timezone.now())
@@ -0,0 +1,120 @@
+"""
+    Django command measuring project latency during a login flood
+"""
+import json
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from rest_framework.authtoken.models import Token
+
+from core.benchmarks import seed_projects, seed_users
+from core.management.commands.bench_server import wait_until_up
+
+
+def _read(url, deadline, token):
+    """GET a URL until the deadline; return latencies in ms."""
+    samples = []
+    request = Request(url, headers={'Authorization': f'Token {token}'})
+    while time.time() < deadline:
+        start = time.perf_counter()
+        try:
+            urlopen(request, timeout=30).read()
+        except (URLError, OSError):
+            continue
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def _flood(url, deadline, worker):
+    """POST wrong credentials for ever new emails until the deadline; return (sent, throttled)."""
+    sent = throttled = 0
+    while time.time() < deadline:
+        body = json.dumps({'email': f'flood{worker}-{sent}@example.com', 'password': 'wrong'}).encode()
+        request = Request(url, data=body, headers={'Content-Type': 'application/json'})
+        sent += 1
+        try:
+            urlopen(request, timeout=30).read()
+        except HTTPError as exc:
+            throttled += exc.code == 429
+        except (URLError, OSError):
+            pass
+    return sent, throttled
+
+
+class Command(BaseCommand):
+    """ Django command to benchmark the password throttles """
+
+    help = 'Serve with gunicorn and time the project list alone and during a login flood, with and without throttling.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=4)
+        parser.add_argument('--flooders', type=int, default=16)
+        parser.add_argument('--duration', type=float, default=10)
+        parser.add_argument('--port', type=int, default=8766)
+
+    def serve(self, port, throttled):
+        """Start gunicorn with the throttles on or off."""
+        env = {**os.environ, 'AUTH_THROTTLE_ENABLED': '1' if throttled else '0'}
+        return subprocess.Popen(
+            [
+                sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py',
+                '--bind', f'127.0.0.1:{port}', '--pid', f'/tmp/bench-auth-{port}.pid',
+                'app.wsgi:application',
+            ],
+            cwd=settings.BASE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+
+    def measure(self, base, token, flooders, duration):
+        """Return (project latencies, flood requests sent, flood requests throttled)."""
+        deadline = time.time() + duration
+        clients = self.options['clients']
+        with ProcessPoolExecutor(clients + flooders) as pool:
+            reads = [pool.submit(_read, f'{base}/api/project/project/', deadline, token) for _ in range(clients)]
+            floods = [
+                pool.submit(_flood, f'{base}/api/auth/create-token/', deadline, worker)
+                for worker in range(flooders)
+            ]
+            latencies = sorted(sample for future in reads for sample in future.result())
+            sent, throttled = map(sum, zip((0, 0), *(future.result() for future in floods)))
+        return latencies, sent, throttled
+
+    def handle(self, *args, **options):
+        """ Entrypoint for command """
+        self.options = options
+        user, = seed_users(1, prefix='bench-auth')
+        try:
+            seed_projects(user, 20, tasks_per_project=5)
+            token = Token.objects.create(user=user).key
+            base = f"http://127.0.0.1:{options['port']}"
+            for throttled in (False, True):
+                process = self.serve(options['port'], throttled)
+                try:
+                    wait_until_up(f'{base}/api/health/')
+                    for flooders in (0, options['flooders']):
+                        self.report(throttled, flooders, *self.measure(base, token, flooders, options['duration']))
+                finally:
+                    process.send_signal(signal.SIGTERM)
+                    process.wait()
+        finally:
+            user.delete()
+
+    def report(self, throttled, flooders, latencies, sent, rejected):
+        """Write the latency of the project list and the flood rate of one run."""
+        label = f"throttles {'on ' if throttled else 'off'} {flooders:>3} flooders"
+        if not latencies:
+            self.stdout.write(self.style.ERROR(f'{label}: no project requests succeeded'))
+            return
+        self.stdout.write(
+            f'{label}: projects p50 {statistics.median(latencies):7.1f}ms  '
+            f'p99 {latencies[int(len(latencies) * 0.99) - 1]:7.1f}ms  '
+            f"logins {sent / self.options['duration']:7.1f}/s ({rejected} throttled)"
+        )
@@ -0,0 +1,81 @@
+"""
+    Django command measuring the per request cost of the middleware stack
+"""
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory, override_settings
+from rest_framework.authtoken.models import Token
+
+from core.benchmarks import seed_projects, seed_users, timed
+
+# The Django middleware the browser-only classes in core.middleware replace.
+FULL_STACK = {
+    'core.middleware.SessionMiddleware': 'django.contrib.sessions.middleware.SessionMiddleware',
+    'core.middleware.CsrfViewMiddleware': 'django.middleware.csrf.CsrfViewMiddleware',
+    'core.middleware.AuthenticationMiddleware': 'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'core.middleware.MessageMiddleware': 'django.contrib.messages.middleware.MessageMiddleware',
+}
+
+
+def _start_response(status, headers):
+    pass
+
+
+class Command(BaseCommand):
+    """ Django command to benchmark the middleware stacks """
+
+    help = 'Time API requests through the WSGI handler with the full and the path-aware middleware stack.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handler(self, middleware):
+        """Return a WSGI handler loaded with a middleware list."""
+        with override_settings(MIDDLEWARE=middleware):
+            return WSGIHandler()
+
+    def requests(self, token):
+        """Return the WSGI environs to time, by label."""
+        factory = RequestFactory()
+        # Browsers calling the API send their session and CSRF cookies along.
+        factory.cookies.load({settings.SESSION_COOKIE_NAME: 'x' * 32, settings.CSRF_COOKIE_NAME: 'y' * 32})
+        auth = {'HTTP_AUTHORIZATION': f'Token {token}'}
+        return {
+            'health': factory.get('/api/health/').environ,
+            'projects': factory.get('/api/project/project/', **auth).environ,
+        }
+
+    def per_request(self, handler, environ):
+        """Return the median and best microseconds per request."""
+        count = self.options['requests']
+
+        def run():
+            for _ in range(count):
+                b''.join(handler(dict(environ), _start_response))
+
+        run()
+        median, best = timed(run, repeat=self.options['repeat'])
+        return median * 1000 / count, best * 1000 / count
+
+    def handle(self, *args, **options):
+        """ Entrypoint for command """
+        self.options = options
+        stacks = {
+            'full': self.handler([FULL_STACK.get(path, path) for path in settings.MIDDLEWARE]),
+            'lean': self.handler(settings.MIDDLEWARE),
+        }
+        user, = seed_users(1, prefix='bench-middleware')
+        try:
+            seed_projects(user, 5, tasks_per_project=2)
+            token = Token.objects.create(user=user).key
+            with override_settings(ALLOWED_HOSTS=['testserver'], AUTH_THROTTLE_ENABLED=False):
+                for label, environ in self.requests(token).items():
+                    results = {name: self.per_request(handler, environ) for name, handler in stacks.items()}
+                    (full, _), (lean, _) = results['full'], results['lean']
+                    self.stdout.write(
+                        f'{label:<12} full {full:8.1f}us  lean {lean:8.1f}us  saved {full - lean:7.1f}us/request'
+                    )
+        finally:
+            user.delete()
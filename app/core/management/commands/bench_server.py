@@ -0,0 +1,94 @@
+"""
+    Django command comparing runserver with the gunicorn configuration
+"""
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from urllib.error import URLError
+from urllib.request import urlopen
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+def wait_until_up(url, timeout=30):
+    """Poll a URL until the server answers."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urlopen(url, timeout=1).read()
+            return
+        except (URLError, OSError):
+            time.sleep(0.2)
+    raise RuntimeError(f'{url} did not come up')
+
+
+def _client(url, deadline):
+    """Request a URL until the deadline; return latencies in ms."""
+    samples = []
+    while time.time() < deadline:
+        start = time.perf_counter()
+        try:
+            urlopen(url, timeout=10).read()
+        except (URLError, OSError):
+            continue
+        samples.append((time.perf_counter() - start) * 1000)
+    return samples
+
+
+def hammer(url, concurrency, duration):
+    """Request a URL from several client processes; return all latencies."""
+    deadline = time.time() + duration
+    with ProcessPoolExecutor(concurrency) as pool:
+        futures = [pool.submit(_client, url, deadline) for _ in range(concurrency)]
+        return [sample for future in futures for sample in future.result()]
+
+
+class Command(BaseCommand):
+    """ Django command to benchmark the serving setups """
+
+    help = 'Start runserver and gunicorn in turn and load them with concurrent requests.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/admin/login/')
+        parser.add_argument('--concurrency', type=int, default=16)
+        parser.add_argument('--duration', type=float, default=10)
+        parser.add_argument('--port', type=int, default=8765)
+
+    def servers(self, port):
+        """Return (name, argv) of each serving setup."""
+        return [
+            ('runserver', [sys.executable, 'manage.py', 'runserver', '--noreload', f'127.0.0.1:{port}']),
+            ('gunicorn', [
+                sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py',
+                '--bind', f'127.0.0.1:{port}', '--pid', f'/tmp/bench-gunicorn-{port}.pid',
+                'app.wsgi:application',
+            ]),
+        ]
+
+    def handle(self, *args, **options):
+        """ Entrypoint for command """
+        url = f"http://127.0.0.1:{options['port']}{options['path']}"
+        for name, argv in self.servers(options['port']):
+            process = subprocess.Popen(
+                argv, cwd=settings.BASE_DIR, env=os.environ.copy(),
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            )
+            try:
+                wait_until_up(url)
+                latencies = sorted(hammer(url, options['concurrency'], options['duration']))
+            finally:
+                process.send_signal(signal.SIGTERM)
+                process.wait()
+            if not latencies:
+                self.stdout.write(self.style.ERROR(f'{name}: no successful requests'))
+                continue
+            self.stdout.write(
+                f"{name:>10}: {len(latencies) / options['duration']:8.1f} req/s  "
+                f'p50 {statistics.median(latencies):7.1f}ms  '
+                f'p99 {latencies[int(len(latencies) * 0.99) - 1]:7.1f}ms'
+            )
@@ -0,0 +1,63 @@
+"""
+    Django command to measure worker boot time with and without live schema
+"""
+import os
+import subprocess
+import sys
+import time
+
+from django.core.management.base import BaseCommand
+
+BOOT = 'import django; django.setup(); import app.urls; import app.wsgi'
+
+
+def import_times(output):
+    """Return {module: self microseconds} parsed from -X importtime output."""
+    times = {}
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        own, _, module = line[len('import time:'):].split('|')
+        times[module.strip()] = int(own)
+    return times
+
+
+class Command(BaseCommand):
+    """ Django command to measure worker startup """
+
+    help = 'Boot the app in fresh interpreters with SCHEMA_LIVE on and off and compare import time.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def boot(self, live):
+        """Boot a fresh interpreter and return (wall ms, import times)."""
+        env = {**os.environ, 'SCHEMA_LIVE': '1' if live else '0'}
+        start = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', BOOT],
+            env=env, capture_output=True, text=True, check=True,
+        )
+        return (time.perf_counter() - start) * 1000, import_times(result.stderr)
+
+    def handle(self, *args, **options):
+        """ Entrypoint for command """
+        results = {}
+        for live in (True, False):
+            runs = [self.boot(live) for _ in range(options['repeat'])]
+            results[live] = min(wall for wall, _ in runs), runs[-1][1]
+            wall, times = results[live]
+            self.stdout.write(
+                f"SCHEMA_LIVE={int(live)}: boot {wall:.0f}ms (best of {len(runs)}), "
+                f'{len(times)} modules, {sum(times.values()) / 1000:.1f}ms importing'
+            )
+
+        live_times, lazy_times = results[True][1], results[False][1]
+        skipped = {module: us for module, us in live_times.items() if module not in lazy_times}
+        heaviest = sorted(skipped.items(), key=lambda item: item[1], reverse=True)[:10]
+        self.stdout.write(
+            f'Lazy loading skips {len(skipped)} modules worth {sum(skipped.values()) / 1000:.1f}ms '
+            f'and saves {results[True][0] - results[False][0]:.0f}ms of boot time'
+        )
+        for module, us in heaviest:
+            self.stdout.write(f'  {us / 1000:7.1f}ms  {module}')
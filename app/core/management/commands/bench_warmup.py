@@ -0,0 +1,108 @@
+"""
+    Django command measuring first request latency with and without warm-up
+"""
+import json
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from rest_framework.authtoken.models import Token
+
+from core.benchmarks import seed_projects, seed_users
+
+
+def wait_for_port(port, timeout=30):
+    """Wait until something listens on a port, without sending a request."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f'nothing listens on port {port}')
+
+
+def timed_request(request):
+    """Send a request and return its latency in ms, whatever the status."""
+    start = time.perf_counter()
+    try:
+        urlopen(request, timeout=30).read()
+    except HTTPError as exc:
+        exc.read()
+    return (time.perf_counter() - start) * 1000
+
+
+class Command(BaseCommand):
+    """ Django command to benchmark the startup warm-up """
+
+    help = 'Boot gunicorn with WARMUP_ON_STARTUP on and off and compare first and steady state request latency.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--boots', type=int, default=3)
+        parser.add_argument('--requests', type=int, default=20)
+        parser.add_argument('--port', type=int, default=8767)
+
+    def requests(self, base, token):
+        """Return the requests to time, by label."""
+        # A valid sign up with a common password: validated, then rejected before any email is sent.
+        signup = json.dumps({
+            'email': 'warmup@example.com', 'name': 'Warm Up',
+            'password': 'password123', 'password_confirmation': 'password123',
+        }).encode()
+        return {
+            'sign up': lambda: Request(
+                f'{base}/api/auth/create-account/', data=signup, headers={'Content-Type': 'application/json'},
+            ),
+            'projects': lambda: Request(f'{base}/api/project/project/', headers={'Authorization': f'Token {token}'}),
+            'health': lambda: Request(f'{base}/api/health/'),
+        }
+
+    def boot(self, warmup, token):
+        """Start a one worker gunicorn and return {label: [latencies]}, the first request first."""
+        port = self.options['port']
+        env = {**os.environ, 'WARMUP_ON_STARTUP': '1' if warmup else '0', 'GUNICORN_WORKERS': '1',
+               'AUTH_THROTTLE_ENABLED': '0'}
+        process = subprocess.Popen(
+            [
+                sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py',
+                '--bind', f'127.0.0.1:{port}', '--pid', f'/tmp/bench-warmup-{port}.pid',
+                'app.wsgi:application',
+            ],
+            cwd=settings.BASE_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        try:
+            wait_for_port(port)
+            requests = self.requests(f'http://127.0.0.1:{port}', token)
+            return {
+                label: [timed_request(make()) for _ in range(self.options['requests'])]
+                for label, make in requests.items()
+            }
+        finally:
+            process.send_signal(signal.SIGTERM)
+            process.wait()
+
+    def handle(self, *args, **options):
+        """ Entrypoint for command """
+        self.options = options
+        user, = seed_users(1, prefix='bench-warmup')
+        try:
+            seed_projects(user, 20, tasks_per_project=5)
+            token = Token.objects.create(user=user).key
+            for warmup in (False, True):
+                boots = [self.boot(warmup, token) for _ in range(options['boots'])]
+                self.stdout.write(f"WARMUP_ON_STARTUP={int(warmup)} (median of {options['boots']} boots)")
+                for label in boots[0]:
+                    first = statistics.median(run[label][0] for run in boots)
+                    steady = statistics.median(sample for run in boots for sample in run[label][1:])
+                    self.stdout.write(f'  {label:<10} first {first:7.1f}ms  steady {steady:7.1f}ms')
+        finally:
+            user.delete()
@@ -0,0 +1,33 @@
+"""
+    Django command to precompute the OpenAPI schema
+"""
+from pathlib import Path
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.schema import write_schema
+
+
+class Command(BaseCommand):
+    """ Django command to write the OpenAPI schema to disk """
+
+    help = 'Generate the OpenAPI schema once and write it, gzipped and versioned, to SCHEMA_ROOT.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', default=None, help='Directory to write to.')
+
+    def handle(self, *args, **options):
+        """ Entrypoint for command """
+        if not settings.SCHEMA_LIVE:
+            raise CommandError('Run with SCHEMA_LIVE=1 so the views carry their schema annotations.')
+
+        from drf_spectacular.generators import SchemaGenerator
+        from drf_spectacular.renderers import OpenApiYamlRenderer
+
+        schema = SchemaGenerator().get_schema(request=None, public=True)
+        content = OpenApiYamlRenderer().render(schema, renderer_context={})
+        directory = Path(options['output'] or settings.SCHEMA_ROOT)
+        manifest = write_schema(content, directory)
+
+        self.stdout.write(self.style.SUCCESS(f"Wrote {directory / manifest['file']}"))
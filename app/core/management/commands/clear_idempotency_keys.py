@@ -0,0 +1,21 @@
+"""
+    Django command to delete expired idempotency keys
+"""
+from django.core.management.base import BaseCommand
+
+from core.deletion import delete_in_batches
+from core.idempotency import expired_keys
+
+
+class Command(BaseCommand):
+    """ Django command to delete expired idempotency keys """
+
+    help = 'Delete stored Idempotency-Key responses past their expiry in bounded batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        """ Entrypoint for command """
+        deleted = sum(delete_in_batches(expired_keys(), options['batch_size']))
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} expired idempotency keys'))
@@ -0,0 +1,38 @@
+"""
+    Django command to move a manager's projects to another shard
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from core.sharding import ShardMoveError, move_manager, shard_for_manager
+
+
+class Command(BaseCommand):
+    """ Django command to rebalance managers between shards """
+
+    help = "Copy a manager's projects, tasks and their rows to another shard and delete the originals."
+
+    def add_arguments(self, parser):
+        parser.add_argument('manager_ids', nargs='+', type=int)
+        parser.add_argument('--to', required=True, choices=settings.DATABASE_SHARDS)
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def report(self, label, count):
+        """Write the progress of a move."""
+        self.stdout.write(f'  copied {count} {label}')
+
+    def handle(self, *args, **options):
+        """ Entrypoint for command """
+        for manager_id in options['manager_ids']:
+            source = shard_for_manager(manager_id)
+            self.stdout.write(f"Moving manager {manager_id} from {source} to {options['to']}")
+            try:
+                copied = move_manager(
+                    manager_id,
+                    options['to'],
+                    batch_size=options['batch_size'],
+                    progress=self.report,
+                )
+            except ShardMoveError as exc:
+                raise CommandError(str(exc))
+            self.stdout.write(self.style.SUCCESS(f'Moved manager {manager_id}: {copied} rows'))
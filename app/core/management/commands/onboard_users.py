@@ -0,0 +1,45 @@
+"""
+    Django command to create users in bulk from a CSV file
+"""
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import Project
+from core.onboarding import OnboardingError, onboard, read_rows
+from core.sharding import locate
+
+
+class Command(BaseCommand):
+    """ Django command to onboard a team of users """
+
+    help = 'Create the users of a CSV file (email, name, password), hashing passwords on every core.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_path')
+        parser.add_argument('--project', type=int, help='Add the users to the team of this project.')
+        parser.add_argument('--workers', type=int, help='Processes hashing passwords, one per core by default.')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        """ Entrypoint for command """
+        project = None
+        if options['project'] is not None:
+            project = locate(Project.objects.all(), pk=options['project'])
+            if project is None:
+                raise CommandError(f"Project {options['project']} does not exist.")
+        with open(options['csv_path'], newline='', encoding='utf-8-sig') as file:
+            try:
+                rows, errors = read_rows(file.read())
+            except OnboardingError as exc:
+                raise CommandError(str(exc))
+        for error in errors:
+            self.stderr.write(f"line {error['line']} ({error['email']}): {' '.join(error['errors'])}")
+        report = onboard(rows, project=project, workers=options['workers'] or os.cpu_count(), batch_size=options['batch_size'])
+        for email in report['skipped']:
+            self.stdout.write(f'  {email} already has an account')
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {report['created']} users in {report['seconds']:.2f}s "
+            f"({report['hash_seconds']:.2f}s hashing, {report['users_per_second']:.1f} users/s), "
+            f"{len(errors)} invalid rows"
+        ))
@@ -0,0 +1,49 @@
+"""
+    Django command to purge soft deleted projects and users in batches
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.deletion import pending_jobs, purge
+
+
+class Command(BaseCommand):
+    """ Django command to purge soft deleted rows """
+
+    help = 'Delete the rows of soft deleted projects and users in bounded batches.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument(
+            '--pause', type=float, default=0.1,
+            help='Seconds to sleep between batches.',
+        )
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Keep polling for new deletion jobs.',
+        )
+        parser.add_argument(
+            '--interval', type=float, default=10,
+            help='Seconds between polls with --loop.',
+        )
+
+    def report(self, job, label, deleted):
+        """Write the progress of a job."""
+        self.stdout.write(f'{job}: deleted {deleted} {label}, {job.deleted_rows} rows so far')
+
+    def handle(self, *args, **options):
+        """ Entrypoint for command """
+        while True:
+            for job in pending_jobs():
+                self.stdout.write(f'Purging {job}')
+                purge(
+                    job,
+                    batch_size=options['batch_size'],
+                    pause=options['pause'],
+                    progress=self.report,
+                )
+                self.stdout.write(self.style.SUCCESS(f'Purged {job}: {job.deleted_rows} rows'))
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,43 @@
+"""
+    Django command delivering queued webhook events
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.webhooks import Dispatcher
+
+
+class Command(BaseCommand):
+    """ Django command to send webhook deliveries """
+
+    help = 'Send due webhook deliveries, batched per webhook, retrying failures with exponential backoff.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=None,
+            help='Deliveries claimed per round, WEBHOOK_BATCH_SIZE by default.',
+        )
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Keep polling for due deliveries.',
+        )
+        parser.add_argument(
+            '--interval', type=float, default=1,
+            help='Seconds to wait with --loop when nothing was due.',
+        )
+
+    def handle(self, *args, **options):
+        """ Entrypoint for command """
+        dispatcher = Dispatcher()
+        try:
+            while True:
+                counts = dispatcher.run_once(options['batch_size'])
+                if counts:
+                    self.stdout.write(', '.join(f'{count} {status}' for status, count in sorted(counts.items())))
+                if not options['loop']:
+                    break
+                if not counts:
+                    time.sleep(options['interval'])
+        finally:
+            dispatcher.close()
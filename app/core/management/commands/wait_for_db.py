@@ -3,11 +3,10 @@
 """
 import time
 
-from psycopg2 import OperationalError as Psycopg2Error
-
-from django.db.utils import OperationalError
 from django.core.management.base import BaseCommand
 
+from core.health import DB_ERRORS
+
 
 class Command(BaseCommand):
     """ Django command to wait for database """
@@ -20,7 +19,7 @@ class Command(BaseCommand):
             try:
                 self.check(databases=['default'])
                 db_up = True
-            except (Psycopg2Error, OperationalError):
+            except DB_ERRORS:
                 self.stdout.write('Database unavailable, waiting 1 second...')
                 time.sleep(1)
 
@@ -0,0 +1,206 @@
+"""
+Prometheus metrics.
+
+Every request is timed and counted per view, method and status, along with
+the queries it ran. With several worker processes, prometheus_client keeps
+the values in files under PROMETHEUS_MULTIPROC_DIR (set up by
+gunicorn.conf.py) and the metrics view merges them, so any worker can answer
+a scrape. Database and cache server statistics and the email backlog, the
+notifications waiting for their digest, are read at scrape time and reused
+for METRICS_SERVER_CACHE_SECONDS, like readiness, so scrapes cost at most one
+round of queries per interval. Only METRICS_ALLOWED_IPS and requests bearing
+METRICS_TOKEN may scrape.
+"""
+import hmac
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from prometheus_client.core import GaugeMetricFamily
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.http import HttpResponse, HttpResponseForbidden
+
+from core.health import DB_ERRORS
+from core.models import Notification
+from core.profiling import SqlTimer
+
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds', 'Request latency.', ['view', 'method'],
+)
+REQUESTS = Counter(
+    'http_requests', 'Requests handled.', ['view', 'method', 'status'],
+)
+DB_QUERIES = Histogram(
+    'http_request_db_queries', 'Database queries run by a request.', ['view'],
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100, 200),
+)
+DB_SECONDS = Histogram(
+    'http_request_db_seconds', 'Time a request spent in database queries.', ['view'],
+)
+DB_CONNECTIONS = Gauge(
+    'db_connections_open', 'Database connections held by the worker processes.', ['alias'],
+    multiprocess_mode='livesum',
+)
+EMAILS = Counter('emails_sent', 'Emails handed to the mail backend.', ['result'])
+EMAILS_IN_FLIGHT = Gauge(
+    'emails_in_flight', 'Emails being sent right now.',
+    multiprocess_mode='livesum',
+)
+
+
+def view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match is not None else '<unresolved>'
+
+
+class MetricsMiddleware:
+    """Time, count and measure the queries of every request."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        start = time.perf_counter()
+        with SqlTimer().installed() as sql:
+            response = self.get_response(request)
+        view = view_name(request)
+        REQUEST_LATENCY.labels(view, request.method).observe(time.perf_counter() - start)
+        REQUESTS.labels(view, request.method, str(response.status_code)).inc()
+        DB_QUERIES.labels(view).observe(sql.count)
+        DB_SECONDS.labels(view).observe(sql.seconds)
+        for connection in connections.all():
+            DB_CONNECTIONS.labels(connection.alias).set(int(connection.connection is not None))
+        return response
+
+
+@contextmanager
+def track_email():
+    """Count an email send and whether it failed."""
+    EMAILS_IN_FLIGHT.inc()
+    try:
+        yield
+    except Exception:
+        EMAILS.labels('error').inc()
+        raise
+    else:
+        EMAILS.labels('ok').inc()
+    finally:
+        EMAILS_IN_FLIGHT.dec()
+
+
+class ServerCollector:
+    """Statistics of the database and cache servers, read at most once per METRICS_SERVER_CACHE_SECONDS."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._cached = None
+
+    def collect(self):
+        connection_counts, backlog, stats = self.server_stats()
+        connections_metric = GaugeMetricFamily(
+            'db_server_connections', 'Connections open on the database server.', labels=['alias'],
+        )
+        for alias, count in connection_counts.items():
+            connections_metric.add_metric([alias], count)
+        yield connections_metric
+
+        if backlog is not None:
+            yield GaugeMetricFamily('email_backlog', 'Notifications waiting for their digest email.', value=backlog)
+
+        if stats:
+            for name in ('keyspace_hits', 'keyspace_misses', 'connected_clients', 'used_memory'):
+                yield GaugeMetricFamily(f'cache_{name}', f'Redis {name} of the default cache.', value=stats.get(name, 0))
+
+    def server_stats(self):
+        """Return the cached (connections per alias, email backlog, cache stats), reading them again when stale."""
+        with self._lock:
+            now = time.monotonic()
+            if self._cached is None or now - self._cached[0] >= settings.METRICS_SERVER_CACHE_SECONDS:
+                self._cached = (now, (self.connection_counts(), self.email_backlog(), self.cache_stats()))
+            return self._cached[1]
+
+    @staticmethod
+    def connection_counts():
+        """Return {alias: connections open on the server} of the PostgreSQL shards."""
+        counts = {}
+        for alias in settings.DATABASE_SHARDS:
+            connection = connections[alias]
+            if connection.vendor != 'postgresql':
+                continue
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute('SELECT count(*) FROM pg_stat_activity WHERE datname = current_database()')
+                    counts[alias] = cursor.fetchone()[0]
+            except DB_ERRORS:
+                continue
+        return counts
+
+    @staticmethod
+    def email_backlog():
+        """Return the number of notifications not mailed yet, or None when the database is down."""
+        try:
+            return Notification.objects.using(DEFAULT_DB_ALIAS).filter(sent_at__isnull=True).count()
+        except DB_ERRORS:
+            return None
+
+    @staticmethod
+    def cache_stats():
+        """Return INFO of the Redis default cache, or {} for other backends."""
+        client = getattr(cache, '_cache', None)
+        if client is None or not hasattr(client, 'get_client'):
+            return {}
+        from redis.exceptions import RedisError
+
+        try:
+            return client.get_client().info()
+        except (RedisError, OSError):
+            return {}
+
+
+def registry():
+    """Return the registry to expose, merging the worker files in multiprocess mode."""
+    if 'PROMETHEUS_MULTIPROC_DIR' not in os.environ:
+        return REGISTRY
+    merged = CollectorRegistry()
+    multiprocess.MultiProcessCollector(merged)
+    return merged
+
+
+# Kept apart from the process registry, which multiprocess mode replaces.
+SERVER_REGISTRY = CollectorRegistry(auto_describe=False)
+SERVER_COLLECTOR = ServerCollector()
+SERVER_REGISTRY.register(SERVER_COLLECTOR)
+
+
+def may_scrape(request):
+    """Return True for requests from METRICS_ALLOWED_IPS or bearing METRICS_TOKEN."""
+    if request.META.get('REMOTE_ADDR') in settings.METRICS_ALLOWED_IPS:
+        return True
+    scheme, _, token = request.headers.get('Authorization', '').partition(' ')
+    return bool(settings.METRICS_TOKEN) and scheme.lower() == 'bearer' and hmac.compare_digest(
+        token.encode(), settings.METRICS_TOKEN.encode(),
+    )
+
+
+def metrics(request):
+    """Expose the metrics in the Prometheus text format."""
+    if not may_scrape(request):
+        return HttpResponseForbidden()
+    return HttpResponse(
+        generate_latest(registry()) + generate_latest(SERVER_REGISTRY),
+        content_type=CONTENT_TYPE_LATEST,
+    )
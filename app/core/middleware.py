@@ -0,0 +1,54 @@
+"""
+Middleware only run for the browser-facing parts of the site.
+
+Sessions, CSRF protection, session authentication and messages serve the
+admin. The API authenticates every request with a token, yet Django runs
+these on each of its requests too: the CSRF cookie is parsed, a lazy user
+and message storage are attached and responses are checked for session and
+message changes. Requests to paths starting with one of
+LEAN_MIDDLEWARE_PATHS skip them; every other path, the admin included,
+keeps the full stack.
+
+Each class subclasses the Django middleware it replaces, so the admin's
+system checks still find them in MIDDLEWARE.
+"""
+from django.conf import settings
+from django.contrib.auth import middleware as auth
+from django.contrib.messages import middleware as messages
+from django.contrib.sessions import middleware as sessions
+from django.middleware import csrf
+
+
+def is_lean(request):
+    """Return True if a request goes to a path that skips the browser middleware."""
+    return request.path_info.startswith(tuple(settings.LEAN_MIDDLEWARE_PATHS))
+
+
+class BrowserOnlyMixin:
+    """Pass requests to lean paths straight to the next middleware."""
+
+    def __call__(self, request):
+        if is_lean(request):
+            return self.get_response(request)
+        return super().__call__(request)
+
+
+class SessionMiddleware(BrowserOnlyMixin, sessions.SessionMiddleware):
+    """Sessions outside the lean paths."""
+
+
+class CsrfViewMiddleware(BrowserOnlyMixin, csrf.CsrfViewMiddleware):
+    """CSRF protection outside the lean paths."""
+
+    def process_view(self, request, callback, callback_args, callback_kwargs):
+        if is_lean(request):
+            return None
+        return super().process_view(request, callback, callback_args, callback_kwargs)
+
+
+class AuthenticationMiddleware(BrowserOnlyMixin, auth.AuthenticationMiddleware):
+    """Session authentication outside the lean paths."""
+
+
+class MessageMiddleware(BrowserOnlyMixin, messages.MessageMiddleware):
+    """Messages outside the lean paths."""
@@ -0,0 +1,46 @@
+from django.db import migrations, models
+
+# Admin searches use istartswith ('^field'), which PostgreSQL runs as
+# UPPER(column) LIKE 'X%'. These indexes serve that predicate; other
+# backends keep scanning.
+SEARCH_INDEXES = [
+    ('core_user_email_upper_like', 'core_user', 'email'),
+    ('core_user_name_upper_like', 'core_user', 'name'),
+    ('core_project_title_upper_like', 'core_project', 'title'),
+    ('core_project_client_upper_like', 'core_project', 'client_name'),
+    ('core_task_title_upper_like', 'core_task', 'title'),
+]
+
+
+def create_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, table, column in SEARCH_INDEXES:
+        schema_editor.execute(
+            f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} '
+            f'ON {table} (UPPER({column}) text_pattern_ops)'
+        )
+
+
+def drop_search_indexes(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name, _, _ in SEARCH_INDEXES:
+        schema_editor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+    # CREATE INDEX CONCURRENTLY cannot run inside a transaction.
+    atomic = False
+
+    dependencies = [
+        ('core', '0006_soft_delete'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['status'], name='core_task_status_e18e62_idx'),
+        ),
+        migrations.RunPython(create_search_indexes, drop_search_indexes),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.1.15 on 2026-10-19 06:10
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_admin_search_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Activity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('actor_id', models.BigIntegerField(blank=True, null=True)),
+                ('action', models.CharField(choices=[('created', 'Created'), ('updated', 'Updated'), ('deleted', 'Deleted')], max_length=20)),
+                ('object_type', models.CharField(max_length=30)),
+                ('object_id', models.BigIntegerField()),
+                ('project_id', models.BigIntegerField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['project_id', 'created_at'], name='core_activi_project_6552ba_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.1.15 on 2026-10-19 06:11
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0008_activity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskStatusTransition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('from_status', models.CharField(blank=True, choices=[('pending', 'Pending'), ('onHold', 'On Hold'), ('inProgress', 'In Progress'), ('underReview', 'Under Review'), ('completed', 'Completed')], max_length=20, null=True)),
+                ('to_status', models.CharField(choices=[('pending', 'Pending'), ('onHold', 'On Hold'), ('inProgress', 'In Progress'), ('underReview', 'Under Review'), ('completed', 'Completed')], max_length=20)),
+                ('changed_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('completion', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='transitions', to='core.taskcompletion')),
+                ('task', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='transitions', to='core.task')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['task', 'changed_at'], name='core_taskst_task_id_48a63f_idx')],
+            },
+        ),
+    ]
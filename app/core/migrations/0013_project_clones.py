@@ -0,0 +1,29 @@
+# Generated by Django 5.1.15 on 2026-10-19 07:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_versions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='project',
+            name='cloned_from',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='clones', to='core.project'),
+        ),
+        migrations.AddField(
+            model_name='project',
+            name='is_template',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='cloned_from',
+            field=models.ForeignKey(blank=True, db_constraint=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='clones', to='core.task'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.1.15 on 2026-10-19 07:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0014_task_dependencies'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='task',
+            name='rank',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['completed_by', 'status', 'rank'], name='core_task_complet_07f8a6_idx'),
+        ),
+    ]
@@ -0,0 +1,211 @@
+"""
+Reusable mixins for API views.
+"""
+from django.db import transaction
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.response import Response
+
+from core import idempotency
+from core.activity import reset_actor, set_actor
+from core.models import StaleVersionError
+from core.routers import _replica_reads, _shard, is_pinned_to_primary, pin_to_primary, sharding_enabled, use_shard
+from core.sharding import moving_from, placement
+
+
+class ReplicaReadMixin:
+    """Serve safe requests from a replica unless the user wrote recently."""
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        if request.method in SAFE_METHODS and not is_pinned_to_primary(request.user):
+            self._replica_token = _replica_reads.set(True)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, '_replica_token', None)
+        if token is not None:
+            _replica_reads.reset(token)
+            self._replica_token = None
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            pin_to_primary(getattr(request, 'user', None))
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+class ActivityActorMixin:
+    """Attribute the activity recorded while handling a request to its user."""
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self._actor_token = set_actor(request.user)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, '_actor_token', None)
+        if token is not None:
+            reset_actor(token)
+            self._actor_token = None
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+class IdempotencyMixin:
+    """Replay the stored response of unsafe requests retried with an Idempotency-Key."""
+
+    def initial(self, request, *args, **kwargs):
+        self._idempotency_record = None
+        key = request.headers.get(idempotency.HEADER)
+        if key and request.method not in SAFE_METHODS:
+            # Keep the raw body for the fingerprint: throttles may parse it first.
+            request._request.body
+        super().initial(request, *args, **kwargs)
+        if key and request.method not in SAFE_METHODS:
+            self._idempotency_record = idempotency.claim(request, key)
+
+    def handle_exception(self, exc):
+        if isinstance(exc, idempotency.Replay):
+            return exc.response
+        try:
+            return super().handle_exception(exc)
+        except Exception:
+            self._release_idempotency_key()
+            raise
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        record = getattr(self, '_idempotency_record', None)
+        if record is not None:
+            self._idempotency_record = None
+            idempotency.store(record, response)
+        return response
+
+    def _release_idempotency_key(self):
+        record = getattr(self, '_idempotency_record', None)
+        if record is not None:
+            self._idempotency_record = None
+            idempotency.release(record)
+
+
+class ShardMoving(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Projects are being moved to another database, try again in a moment.'
+    default_code = 'shard_moving'
+
+
+class ShardMixin:
+    """Run requests on the shards holding the rows they touch.
+
+    Detail requests run on the shard of their object, lists on every shard
+    from request_shards(), merged by fan_out_ordering. Writes read the
+    placement from the primary and are refused while the user, or any
+    manager of the shard they go to, is moved to another shard.
+    """
+    fan_out_ordering = '-id'
+
+    def request_shards(self):
+        """Return the shards a list may have rows on, the user's own first."""
+        return [placement(self.request.user.pk)[0]]
+
+    def object_shard(self, pk):
+        """Return the shard of the object a detail request is about, or None."""
+        queryset = self.get_queryset()
+        for alias in self.request_shards():
+            if queryset.using(alias).filter(pk=pk).exists():
+                return alias
+        return None
+
+    def initial(self, request, *args, **kwargs):
+        self._shard_token = None
+        super().initial(request, *args, **kwargs)
+        if not sharding_enabled():
+            return
+        unsafe = request.method not in SAFE_METHODS
+        shard, moving = placement(request.user.pk, fresh=unsafe)
+        if moving and unsafe:
+            raise ShardMoving()
+        pk = self.kwargs.get(self.lookup_url_kwarg or self.lookup_field)
+        if pk is not None and str(pk).isdigit():
+            shard = self.object_shard(int(pk)) or shard
+        if unsafe and moving_from(shard):
+            raise ShardMoving()
+        self._shard_token = _shard.set(shard)
+
+    def list(self, request, *args, **kwargs):
+        shards = self.request_shards() if sharding_enabled() else []
+        if len(shards) < 2:
+            return super().list(request, *args, **kwargs)
+        rows = []
+        for alias in shards:
+            with use_shard(alias):
+                rows.extend(super().list(request, *args, **kwargs).data)
+        field = self.fan_out_ordering.lstrip('-')
+        rows.sort(key=lambda row: row[field], reverse=self.fan_out_ordering.startswith('-'))
+        return Response(rows)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, '_shard_token', None)
+        if token is not None:
+            _shard.reset(token)
+            self._shard_token = None
+        return super().finalize_response(request, response, *args, **kwargs)
+
+
+class PreconditionFailed(APIException):
+    status_code = status.HTTP_412_PRECONDITION_FAILED
+    default_detail = 'The object was changed since you read it. Fetch it again and retry.'
+    default_code = 'precondition_failed'
+
+
+def parse_etag(value):
+    """Return the version in an If-Match header, or None for '*'."""
+    value = value.strip()
+    if value == '*':
+        return None
+    value = value.removeprefix('W/').strip('"')
+    if not value.isdigit():
+        raise PreconditionFailed()
+    return int(value)
+
+
+class ConditionalUpdateMixin:
+    """Update versioned objects only if they are still at the version the client read.
+
+    The expected version comes from an If-Match header holding the ETag of
+    a previous response, or from a version field in the body. Without
+    either, updates still fail if the row changes while the request runs.
+    """
+
+    def expected_version(self):
+        header = self.request.headers.get('If-Match')
+        if header:
+            return parse_etag(header)
+        version = self.request.data.get('version') if hasattr(self.request.data, 'get') else None
+        if version is None or version == '':
+            return None
+        try:
+            return int(version)
+        except (TypeError, ValueError):
+            raise PreconditionFailed()
+
+    def get_object(self):
+        obj = super().get_object()
+        if self.request.method in ('PUT', 'PATCH'):
+            expected = self.expected_version()
+            if expected is not None:
+                obj.version = expected
+        return obj
+
+    def perform_update(self, serializer):
+        # A conflict then only rolls back this update, not an enclosing transaction.
+        with transaction.atomic(using=serializer.instance._state.db):
+            super().perform_update(serializer)
+
+    def handle_exception(self, exc):
+        if isinstance(exc, StaleVersionError):
+            exc = PreconditionFailed()
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        data = getattr(response, 'data', None)
+        if response.status_code < 300 and isinstance(data, dict) and 'version' in data:
+            response['ETag'] = f'"{data["version"]}"'
+        return response
@@ -1,8 +1,10 @@
 """
 Database models
 """
+import secrets
 import uuid
 from django.db import models
+from django.db.models import F
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 from django.conf import settings
 from django.utils import timezone
@@ -27,6 +29,10 @@ class UserManager(BaseUserManager):
 
         return user
 
+    def get_queryset(self):
+        """Hide users scheduled for deletion."""
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
     def create_superuser(self, email, password):
         """ Create and return a new superuser """
         user = self.create_user(email, password)
@@ -45,14 +51,17 @@ class User(AbstractBaseUser, PermissionsMixin):
     is_active = models.BooleanField(default=True)
     is_staff = models.BooleanField(default=False)
     confirmed = models.BooleanField(default=False)
+    deleted_at = models.DateTimeField(null=True, blank=True)
 
     objects = UserManager()
+    all_objects = models.Manager()
 
     USERNAME_FIELD = 'email'
 
 
 class Token(models.Model):
     """Token for confirm account"""
+    lifetime = timedelta(minutes=10)
 
     token = models.CharField(max_length=255, unique=True, null=False)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
@@ -65,7 +74,7 @@ class Token(models.Model):
         if not self.created_at:
             self.created_at = timezone.now()
         if not self.expires_at or self.created_at != self.__original_created_at:
-            self.expires_at = self.created_at + timedelta(minutes=10)
+            self.expires_at = self.created_at + self.lifetime
         super().save(*args, **kwargs)
 
     def is_expired(self):
@@ -81,12 +90,72 @@ class Token(models.Model):
         self.__original_created_at = self.created_at
 
 
-class Project(models.Model):
+class ProjectManager(models.Manager):
+    """ Manager for projects """
+
+    def get_queryset(self):
+        """Hide projects scheduled for deletion."""
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
+class ShardedByOwner(models.Model):
+    """ Base for rows placed on the shard of the user in owner_field
+
+    Relations from sharded rows to users cross databases once sharding is
+    enabled, so they are declared without database constraints.
+    """
+    owner_field = None
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        if self._state.adding and len(settings.DATABASE_SHARDS) > 1:
+            from core.sharding import shard_for_manager
+            kwargs['using'] = shard_for_manager(getattr(self, self.owner_field))
+        super().save(*args, **kwargs)
+
+
+class StaleVersionError(Exception):
+    """A versioned row was changed by someone else since it was read."""
+
+
+class VersionedModel(models.Model):
+    """ Base for rows updated with optimistic concurrency control
+
+    Saving an existing row runs a single UPDATE ... WHERE id = %s AND
+    version = %s that also increments the version, and raises
+    StaleVersionError when no row matched because another update won. Inside
+    a transaction, save in a savepoint so a conflict leaves it usable.
+    """
+    version = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        abstract = True
+
+    def _do_update(self, base_qs, using, pk_val, values, update_fields, forced_update):
+        if self._state.adding:
+            # A new row saved with an explicit id: keep Django's update-or-insert.
+            return super()._do_update(base_qs, using, pk_val, values, update_fields, forced_update)
+        field = self._meta.get_field('version')
+        values = [value for value in values if value[0] is not field]
+        values.append((field, None, F('version') + 1))
+        if not super()._do_update(
+            base_qs.filter(version=self.version), using, pk_val, values, update_fields, forced_update,
+        ):
+            raise StaleVersionError(f'{self._meta.object_name} {pk_val} is not at version {self.version}.')
+        self.version += 1
+        return True
+
+
+class Project(ShardedByOwner, VersionedModel):
     """ Project model """
+    owner_field = 'manager_id'
 
     manager = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
+        db_constraint=False,
     )
     title = models.CharField(max_length=255)
     client_name = models.CharField(max_length=255)
@@ -95,12 +164,31 @@ class Project(models.Model):
     team = models.ManyToManyField(
         settings.AUTH_USER_MODEL,
         related_name='team_projects',
-        blank=True
+        blank=True,
+        db_constraint=False,
+    )
+    is_template = models.BooleanField(default=False)
+    # Without a constraint: a clone may live on another shard than its source.
+    cloned_from = models.ForeignKey(
+        'self',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='clones',
+        db_constraint=False,
     )
+    deleted_at = models.DateTimeField(null=True, blank=True)
+
+    objects = ProjectManager()
+    all_objects = models.Manager()
 
     def __str__(self):
         return self.title
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._original_manager_id = self.manager_id
+
 
 class TaskStatus(models.TextChoices):
     PENDING = 'pending', 'Pending'
@@ -110,8 +198,15 @@ class TaskStatus(models.TextChoices):
     COMPLETED = 'completed', 'Completed'
 
 
-class Task(models.Model):
-    """ Task model """
+class Task(VersionedModel):
+    """ Task model
+
+    Tasks live on the shard of the project they belong to, next to its
+    project_tasks links, whoever they are assigned to: create them through
+    project.tasks or on project._state.db. Linking a task to a project on
+    another shard raises ValueError.
+    """
+
     title = models.CharField(max_length=255, blank=False, null=False)
     description = models.TextField(blank=False, null=False)
     status = models.CharField(
@@ -122,21 +217,58 @@ class Task(models.Model):
     completed_by = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
+        db_constraint=False,
     )
+    cloned_from = models.ForeignKey(
+        'self',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='clones',
+        db_constraint=False,
+    )
+    # Position within its status column, compared as a string; see project.board.
+    rank = models.CharField(max_length=255, blank=True, default='')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status']),
+            models.Index(fields=['completed_by', 'status', 'rank']),
+        ]
 
     def __str__(self):
         return self.title
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._original_status = self.__dict__.get('status')
+
+
+class TaskDependency(models.Model):
+    """ Task of a project that cannot start before another one is completed """
+    project = models.ForeignKey(Project, on_delete=models.CASCADE, related_name='dependencies')
+    task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='blocked_by_links')
+    blocked_by = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='blocking_links')
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('project', 'task', 'blocked_by')
+
+    def __str__(self):
+        return f'{self.task_id} blocked by {self.blocked_by_id}'
+
 
 class Note(models.Model):
     """Note model """
     content = models.TextField()
+    # Declared before created_by so a new note takes the shard of its task.
+    task = models.ForeignKey('Task', on_delete=models.CASCADE, related_name='note_task')
     created_by = models.ForeignKey(
         settings.AUTH_USER_MODEL,
         on_delete=models.CASCADE,
-        related_name='notes'
+        related_name='notes',
+        db_constraint=False,
     )
-    task = models.ForeignKey('Task', on_delete=models.CASCADE, related_name='note_task')
 
     def __str__(self):
         return f'Note by {self.created_by} on {self.task}: {self.content}'
@@ -145,7 +277,7 @@ class Note(models.Model):
 class TaskCompletion(models.Model):
     """ TaskCompletion model """
     task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='completions')
-    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, db_constraint=False)
     status = models.CharField(
         max_length=20,
         choices=TaskStatus.choices,
@@ -154,3 +286,209 @@ class TaskCompletion(models.Model):
 
     class Meta:
         unique_together = ('task', 'user')
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._original_status = self.__dict__.get('status')
+
+
+class TaskStatusTransition(models.Model):
+    """ Append-only history of task and task completion status changes
+
+    Rows with a completion track that user's status of the task, rows
+    without one track Task.status. The first row of each has no
+    from_status and marks its creation.
+    """
+    task = models.ForeignKey(Task, on_delete=models.CASCADE, related_name='transitions')
+    completion = models.ForeignKey(
+        TaskCompletion,
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        related_name='transitions',
+    )
+    from_status = models.CharField(max_length=20, choices=TaskStatus.choices, null=True, blank=True)
+    to_status = models.CharField(max_length=20, choices=TaskStatus.choices)
+    changed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['task', 'changed_at']),
+        ]
+
+    def __str__(self):
+        return f'{self.task_id}: {self.from_status} -> {self.to_status}'
+
+
+class DeletionJob(models.Model):
+    """ Background purge of a soft deleted project or user """
+
+    class Kind(models.TextChoices):
+        PROJECT = 'project', 'Project'
+        USER = 'user', 'User'
+
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'Pending'
+        RUNNING = 'running', 'Running'
+        DONE = 'done', 'Done'
+
+    kind = models.CharField(max_length=20, choices=Kind.choices)
+    object_id = models.BigIntegerField()
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.PENDING)
+    deleted_rows = models.PositiveBigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        unique_together = ('kind', 'object_id')
+        indexes = [
+            models.Index(fields=['status', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f'{self.get_kind_display()} {self.object_id} ({self.get_status_display()})'
+
+
+class Activity(models.Model):
+    """ Audit entry of a change, written in batches by core.activity
+
+    Ids are plain integers rather than foreign keys so the trail outlives
+    the rows it describes and inserts never wait on referenced rows.
+    """
+
+    class Action(models.TextChoices):
+        CREATED = 'created', 'Created'
+        UPDATED = 'updated', 'Updated'
+        DELETED = 'deleted', 'Deleted'
+
+    actor_id = models.BigIntegerField(null=True, blank=True)
+    action = models.CharField(max_length=20, choices=Action.choices)
+    object_type = models.CharField(max_length=30)
+    object_id = models.BigIntegerField()
+    project_id = models.BigIntegerField(null=True, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['project_id', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f'{self.object_type} {self.object_id} {self.action}'
+
+
+class IdempotencyKey(models.Model):
+    """ Response of a request made with an Idempotency-Key header
+
+    A row without response_status is a request still being processed.
+    """
+    scope = models.CharField(max_length=64)
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)
+    response_status = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.BinaryField(default=bytes)
+    response_headers = models.JSONField(default=dict)
+    locked_at = models.DateTimeField(default=timezone.now)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('scope', 'key')
+        indexes = [
+            models.Index(fields=['expires_at']),
+        ]
+
+    def __str__(self):
+        return f'{self.scope} {self.key}'
+
+
+class ShardAssignment(models.Model):
+    """ Shard holding the projects of a manager
+
+    Managers without an assignment live on the first shard, which is where
+    all data was before sharding.
+    """
+    manager_id = models.BigIntegerField(unique=True)
+    shard = models.CharField(max_length=64)
+    moving = models.BooleanField(default=False)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f'{self.manager_id} on {self.shard}'
+
+
+def webhook_secret():
+    return secrets.token_hex(32)
+
+
+class Webhook(models.Model):
+    """ Subscription of a manager to the events of their projects
+
+    An empty events list subscribes to every event.
+    """
+    manager = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='webhooks')
+    url = models.URLField(max_length=500)
+    events = models.JSONField(default=list, blank=True)
+    secret = models.CharField(max_length=64, default=webhook_secret)
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f'{self.manager_id} -> {self.url}'
+
+
+class WebhookDelivery(models.Model):
+    """ Events queued for a webhook, sent and retried by core.webhooks """
+
+    class Status(models.TextChoices):
+        PENDING = 'pending', 'Pending'
+        DELIVERED = 'delivered', 'Delivered'
+        FAILED = 'failed', 'Failed'
+
+    webhook = models.ForeignKey(Webhook, on_delete=models.CASCADE, related_name='deliveries')
+    events = models.JSONField(default=list)
+    status = models.CharField(max_length=20, choices=Status.choices, default=Status.PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    response_status = models.PositiveSmallIntegerField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    delivered_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at']),
+        ]
+
+    def __str__(self):
+        return f'Delivery {self.pk} to webhook {self.webhook_id} ({self.get_status_display()})'
+
+
+class Notification(models.Model):
+    """ Event waiting for the next digest email of a user
+
+    Ids are plain integers, like in Activity, so a digest can still mention
+    rows deleted since.
+    """
+
+    class Kind(models.TextChoices):
+        TASK_ASSIGNED = 'task_assigned', 'Assigned to you'
+        TASK_UPDATED = 'task_updated', 'Updated'
+        NOTE_ADDED = 'note_added', 'New note'
+
+    recipient = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='notifications')
+    kind = models.CharField(max_length=20, choices=Kind.choices)
+    task_id = models.BigIntegerField()
+    project_id = models.BigIntegerField(null=True, blank=True)
+    actor_id = models.BigIntegerField(null=True, blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    claimed_until = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['sent_at', 'recipient', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f'{self.get_kind_display()} task {self.task_id} for {self.recipient_id}'
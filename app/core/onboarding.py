@@ -0,0 +1,183 @@
+"""
+Bulk onboarding of users from a CSV file.
+
+Creating users one by one hashes each password inside its own request or
+save, and PBKDF2 makes that most of the cost. Here the passwords of a whole
+file are hashed in a process pool, then the users,
+their confirmation tokens and an optional team membership are each written
+with bulk inserts.
+
+The pool is long lived and its processes are spawned, not forked: a forked
+child of a process running threads, like a gunicorn worker with its
+activity flusher, can deadlock on a lock held by another thread at the time
+of the fork. Each process creates the pool on its first onboarding and
+keeps it for later ones. In gunicorn that is every worker that onboards, so
+the pool has ONBOARDING_HASH_WORKERS processes, a few by default; the
+onboard_users command runs alone and uses one per core.
+
+The CSV needs a header row with email and password columns, and may have a
+name column. Rows are validated like a sign up; emails that already have an
+account are skipped but still join the team.
+"""
+import csv
+import io
+import multiprocessing
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.password_validation import validate_password
+from django.core.exceptions import ValidationError
+from django.core.validators import validate_email
+from django.db import transaction
+from django.utils import timezone
+
+from core.models import Project, Token
+from core.sharding import assign_new_users
+from core.signals import users_onboarded
+
+REQUIRED_COLUMNS = {'email', 'password'}
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+class OnboardingError(Exception):
+    """The CSV file cannot be onboarded."""
+
+
+def _row_errors(email, name, password, seen):
+    errors = []
+    try:
+        validate_email(email)
+    except ValidationError as exc:
+        errors.extend(exc.messages)
+    if email in seen:
+        errors.append('Duplicate email in the file.')
+    try:
+        validate_password(password, get_user_model()(email=email, name=name))
+    except ValidationError as exc:
+        errors.extend(exc.messages)
+    return errors
+
+
+def read_rows(text):
+    """Parse CSV text into (rows, errors), one error entry per invalid line."""
+    reader = csv.DictReader(io.StringIO(text))
+    missing = REQUIRED_COLUMNS - set(reader.fieldnames or ())
+    if missing:
+        raise OnboardingError(f'Missing CSV columns: {", ".join(sorted(missing))}.')
+    normalize_email = get_user_model().objects.normalize_email
+    rows, errors, seen = [], [], set()
+    for line, record in enumerate(reader, start=2):
+        email = normalize_email((record['email'] or '').strip())
+        name = (record.get('name') or '').strip()
+        password = record['password'] or ''
+        problems = _row_errors(email, name, password, seen)
+        seen.add(email)
+        if problems:
+            errors.append({'line': line, 'email': email, 'errors': problems})
+        else:
+            rows.append({'email': email, 'name': name, 'password': password})
+    return rows, errors
+
+
+def pool_size(workers=None):
+    return workers or settings.ONBOARDING_HASH_WORKERS or 1
+
+
+def hash_pool(workers=None):
+    """Return the process pool hashing passwords, creating it on the first call."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(
+                pool_size(workers),
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=django.setup,
+            )
+        return _pool
+
+
+def _drop_pool(pool):
+    global _pool
+    with _pool_lock:
+        if _pool is pool:
+            _pool = None
+
+
+def hash_passwords(passwords, workers=None):
+    """Hash passwords with the default hasher, spread over the hashing pool."""
+    workers = pool_size(workers)
+    if min(workers, len(passwords)) <= 1:
+        return [make_password(password) for password in passwords]
+    chunksize = max(1, len(passwords) // (workers * 4))
+    pool = hash_pool(workers)
+    try:
+        return list(pool.map(make_password, passwords, chunksize=chunksize))
+    except BrokenProcessPool:
+        # A pool process died; the next call starts a new pool.
+        _drop_pool(pool)
+        raise
+
+
+def onboard(rows, project=None, workers=None, batch_size=1000):
+    """Create the users of validated rows and add them, and existing ones, to a project team.
+
+    Return a report with the counts, the emails skipped and the users per
+    second, hashing included.
+    """
+    start = time.perf_counter()
+    User = get_user_model()
+    emails = [row['email'] for row in rows]
+    existing = set(User.all_objects.filter(email__in=emails).values_list('email', flat=True))
+    new_rows = [row for row in rows if row['email'] not in existing]
+    hashes = hash_passwords([row['password'] for row in new_rows], workers)
+    hash_seconds = time.perf_counter() - start
+
+    using = project._state.db if project is not None else None
+    with transaction.atomic(), transaction.atomic(using=using):
+        users = User.objects.bulk_create(
+            [User(email=row['email'], name=row['name'], password=password) for row, password in zip(new_rows, hashes)],
+            batch_size=batch_size,
+        )
+        now = timezone.now()
+        Token.objects.bulk_create(
+            [
+                Token(
+                    token=str(uuid.uuid5(uuid.NAMESPACE_DNS, str(user.id))),
+                    user=user,
+                    created_at=now,
+                    expires_at=now + Token.lifetime,
+                )
+                for user in users
+            ],
+            batch_size=batch_size,
+        )
+        new_ids = [user.pk for user in users]
+        assign_new_users(new_ids)
+        member_ids = new_ids + list(User.objects.filter(email__in=existing).values_list('id', flat=True))
+        if project is not None:
+            TeamLink = Project.team.through
+            TeamLink.objects.using(using).bulk_create(
+                [TeamLink(project_id=project.pk, user_id=user_id) for user_id in member_ids],
+                batch_size=batch_size,
+                ignore_conflicts=True,
+            )
+        users_onboarded.send(sender=User, user_ids=member_ids, project=project)
+
+    seconds = time.perf_counter() - start
+    return {
+        'created': len(users),
+        'skipped': sorted(existing),
+        'team_members': len(member_ids) if project is not None else 0,
+        'seconds': round(seconds, 3),
+        'hash_seconds': round(hash_seconds, 3),
+        'users_per_second': round(len(users) / seconds, 1) if seconds else 0.0,
+    }
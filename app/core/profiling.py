@@ -0,0 +1,208 @@
+"""
+On-demand profiling of single requests for staff users.
+
+A staff user adds `?profile=cprofile` (or `sample`) to a URL, or sends the
+same value in an X-Profile header, and the request runs under cProfile or
+a sampling profiler. The profile is written to PROFILING_DIR:
+
+- cProfile writes a pstats file, readable with snakeviz or flameprof.
+- The sampler writes folded stacks, which flamegraph.pl and speedscope
+  read directly.
+
+The response carries the profile id in X-Profile-Id. A Server-Timing header
+breaks the request down into phases: authentication, queryset evaluation,
+serialization, rendering and SQL. Phases are inclusive: serializing a list
+evaluates its queryset, so serialization time contains that query time.
+Requests without the flag only pay for a dictionary lookup, and other users
+are never profiled.
+"""
+import cProfile
+import os
+import pstats
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+
+HEADER = 'HTTP_X_PROFILE'
+PARAM = 'profile'
+MODES = ('cprofile', 'sample')
+
+# Phase -> functions whose inclusive time makes it up, as (path suffix, name).
+PHASES = {
+    'auth': [('rest_framework/views.py', 'perform_authentication')],
+    'queryset': [('django/db/models/query.py', '_fetch_all')],
+    'serialize': [('rest_framework/serializers.py', 'data'), ('project/fast_serializers.py', 'read')],
+    'render': [('rest_framework/response.py', 'rendered_content')],
+}
+
+# cProfile allows one active profiler per process.
+_profiler_lock = threading.Lock()
+
+
+def requested_mode(request):
+    """Return the profiler asked for by a request, or None."""
+    value = request.META.get(HEADER)
+    if value is None and PARAM + '=' in request.META.get('QUERY_STRING', ''):
+        value = request.GET.get(PARAM)
+    if value is None:
+        return None
+    return value if value in MODES else MODES[0]
+
+
+def is_staff(request):
+    """Return True if the session or API token belongs to a staff user."""
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        try:
+            result = TokenAuthentication().authenticate(request)
+        except AuthenticationFailed:
+            return False
+        user = result[0] if result else None
+    return user is not None and user.is_staff
+
+
+def _matches(filename, name, functions):
+    return any(name == func and filename.replace(os.sep, '/').endswith(path) for path, func in functions)
+
+
+class SqlTimer:
+    """Count and time the queries run on every database connection."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - start
+
+    @contextmanager
+    def installed(self):
+        wrapped = connections.all()
+        for connection in wrapped:
+            connection.execute_wrappers.append(self)
+        try:
+            yield self
+        finally:
+            for connection in wrapped:
+                connection.execute_wrappers.remove(self)
+
+
+class Sampler:
+    """Record the stack of one thread at a fixed interval."""
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='request-sampler', daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append((frame.f_code.co_filename, frame.f_code.co_name))
+                frame = frame.f_back
+            self.stacks[tuple(reversed(stack))] += 1
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+    def phases(self):
+        """Return {phase: seconds} estimated from the share of samples in each phase."""
+        return {
+            phase: self.interval * sum(
+                count for stack, count in self.stacks.items()
+                if any(_matches(filename, name, functions) for filename, name in stack)
+            )
+            for phase, functions in PHASES.items()
+        }
+
+    def dump(self, path):
+        """Write the samples as folded stacks."""
+        with open(path, 'w') as out:
+            for stack, count in self.stacks.most_common():
+                frames = ';'.join(f'{Path(filename).stem}:{name}' for filename, name in stack)
+                out.write(f'{frames} {count}\n')
+
+
+def cprofile_phases(profiler):
+    """Return {phase: seconds} from the inclusive times of a finished cProfile run."""
+    stats = pstats.Stats(profiler).stats
+    return {
+        phase: max(
+            (cumulative for (filename, _, name), (_, _, _, cumulative, _) in stats.items()
+             if _matches(filename, name, functions)),
+            default=0.0,
+        )
+        for phase, functions in PHASES.items()
+    }
+
+
+def server_timing(phases, sql, total):
+    """Format phase timings as a Server-Timing header value."""
+    entries = [f'{phase};dur={seconds * 1000:.1f}' for phase, seconds in phases.items()]
+    entries.append(f'sql;dur={sql.seconds * 1000:.1f};desc="{sql.count} queries"')
+    entries.append(f'total;dur={total * 1000:.1f}')
+    return ', '.join(entries)
+
+
+class ProfilingMiddleware:
+    """Profile requests of staff users who ask for it."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        mode = requested_mode(request)
+        if mode is None or not is_staff(request):
+            return self.get_response(request)
+        if not _profiler_lock.acquire(blocking=False):
+            response = self.get_response(request)
+            response['X-Profile-Id'] = 'busy'
+            return response
+        try:
+            return self.profile(request, mode)
+        finally:
+            _profiler_lock.release()
+
+    def profile(self, request, mode):
+        """Run the request under a profiler and store the result."""
+        profile_id = uuid.uuid4().hex
+        directory = Path(settings.PROFILING_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        start = time.perf_counter()
+        with SqlTimer().installed() as sql:
+            if mode == 'sample':
+                with Sampler(threading.get_ident(), settings.PROFILING_SAMPLE_INTERVAL) as sampler:
+                    response = self.get_response(request)
+                sampler.dump(directory / f'{profile_id}.folded')
+                phases = sampler.phases()
+            else:
+                profiler = cProfile.Profile()
+                response = profiler.runcall(self.get_response, request)
+                profiler.dump_stats(directory / f'{profile_id}.prof')
+                phases = cprofile_phases(profiler)
+        response['Server-Timing'] = server_timing(phases, sql, time.perf_counter() - start)
+        response['X-Profile-Id'] = f'{profile_id}.{"folded" if mode == "sample" else "prof"}'
+        return response
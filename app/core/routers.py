@@ -0,0 +1,184 @@
+"""
+Database routers for the app.
+"""
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from psycopg2 import OperationalError as Psycopg2Error
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.utils import OperationalError
+
+_replica_reads = ContextVar('replica_reads', default=False)
+_shard = ContextVar('shard', default=None)
+
+# Core models living on the shard of their project manager. Many-to-many
+# tables follow the model declaring the field.
+SHARDED_MODELS = {'project', 'task', 'taskdependency', 'note', 'taskcompletion', 'taskstatustransition'}
+
+# Last known health of every replica alias in this process:
+# alias -> (checked_at, healthy).
+_replica_health = {}
+
+LAG_QUERY = """
+    SELECT CASE
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(
+            EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0
+        )
+    END
+"""
+
+
+def _pin_key(user_id):
+    return f'db-primary-pin:{user_id}'
+
+
+def pin_to_primary(user):
+    """Send reads for the user to the primary for a short window."""
+    if user is not None and user.is_authenticated:
+        cache.set(_pin_key(user.pk), True, settings.DATABASE_REPLICA_PIN_SECONDS)
+
+
+def is_pinned_to_primary(user):
+    """Return True if the user wrote recently and must read the primary."""
+    if user is None or not user.is_authenticated:
+        return False
+    return cache.get(_pin_key(user.pk), False)
+
+
+@contextmanager
+def replica_reads(enabled=True):
+    """Allow reads inside the block to be served by a replica."""
+    token = _replica_reads.set(enabled)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def replica_lag(alias):
+    """Return the replication lag of a replica in seconds."""
+    connection = connections[alias]
+    if connection.vendor != 'postgresql':
+        return 0.0
+    with connection.cursor() as cursor:
+        cursor.execute(LAG_QUERY)
+        return float(cursor.fetchone()[0])
+
+
+def is_replica_healthy(alias):
+    """Check the replica lag, caching the result for a short interval."""
+    now = time.monotonic()
+    checked_at, healthy = _replica_health.get(alias, (None, False))
+    if checked_at is not None and now - checked_at < settings.DATABASE_REPLICA_CHECK_INTERVAL:
+        return healthy
+    try:
+        healthy = replica_lag(alias) <= settings.DATABASE_REPLICA_MAX_LAG
+    except (Psycopg2Error, OperationalError):
+        healthy = False
+    _replica_health[alias] = (now, healthy)
+    return healthy
+
+
+def choose_replica():
+    """Return a healthy replica alias, or None to fall back to the primary."""
+    healthy = [
+        alias for alias in settings.DATABASE_REPLICAS
+        if is_replica_healthy(alias)
+    ]
+    if not healthy:
+        return None
+    return random.choice(healthy)
+
+
+class PrimaryReplicaRouter:
+    """Route safe reads to replicas and everything else to the primary."""
+
+    def db_for_read(self, model, **hints):
+        if not _replica_reads.get():
+            return None
+        return choose_replica() or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.DATABASE_REPLICAS:
+            return False
+        return None
+
+
+def sharding_enabled():
+    return len(settings.DATABASE_SHARDS) > 1
+
+
+def is_sharded(model):
+    """Return True if rows of the model live on the shards."""
+    opts = model._meta
+    if opts.auto_created:
+        opts = opts.auto_created._meta
+    return opts.app_label == 'core' and opts.model_name in SHARDED_MODELS
+
+
+def current_shard():
+    """Return the shard queries of sharded models go to in this context."""
+    return _shard.get() or settings.DATABASE_SHARDS[0]
+
+
+@contextmanager
+def use_shard(alias):
+    """Send queries of sharded models inside the block to a shard."""
+    token = _shard.set(alias)
+    try:
+        yield alias
+    finally:
+        _shard.reset(token)
+
+
+class ShardRouter(PrimaryReplicaRouter):
+    """Route sharded models to the current shard and the rest like the primary/replica router.
+
+    Rows already loaded stay on their database, so related lookups and saves
+    follow the instance. Global models are always pinned to the primary or a
+    replica, never to the database of a sharded instance they relate to.
+    Every shard is migrated with the full schema; global tables simply stay
+    empty there.
+    """
+
+    def _db_for_sharded(self, hints):
+        instance = hints.get('instance')
+        if instance is not None and is_sharded(type(instance)) and instance._state.db:
+            return instance._state.db
+        return current_shard()
+
+    def db_for_read(self, model, **hints):
+        if not sharding_enabled():
+            return super().db_for_read(model, **hints)
+        if is_sharded(model):
+            return self._db_for_sharded(hints)
+        return super().db_for_read(model, **hints) or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        if sharding_enabled() and is_sharded(model):
+            return self._db_for_sharded(hints)
+        return super().db_for_write(model, **hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if sharding_enabled():
+            sharded1, sharded2 = is_sharded(type(obj1)), is_sharded(type(obj2))
+            if sharded1 and sharded2:
+                return obj1._state.db == obj2._state.db
+            if sharded1 or sharded2:
+                return True
+        return super().allow_relation(obj1, obj2, **hints)
@@ -0,0 +1,74 @@
+"""
+OpenAPI schema annotations and the precomputed schema files.
+
+Importing drf-spectacular pulls in its schema generator, YAML and the
+annotation machinery on every worker. Views import the annotation helpers
+from here instead: with SCHEMA_LIVE enabled they are drf-spectacular's own,
+otherwise they are no-ops and the schema is served from the files written by
+the build_schema command.
+"""
+import gzip
+import hashlib
+import json
+
+from django.conf import settings
+
+MANIFEST_NAME = 'manifest.json'
+
+_loaded = {}
+
+if settings.SCHEMA_LIVE:
+    from drf_spectacular.utils import (  # noqa: F401
+        extend_schema,
+        extend_schema_view,
+        OpenApiParameter,
+        OpenApiTypes,
+    )
+else:
+    def extend_schema(*args, **kwargs):
+        """Leave the view untouched."""
+        return lambda view: view
+
+    def extend_schema_view(**kwargs):
+        """Leave the view untouched."""
+        return lambda view: view
+
+    class OpenApiParameter:
+        """Placeholder accepting drf-spectacular's parameter arguments."""
+
+        def __init__(self, *args, **kwargs):
+            pass
+
+    class _OpenApiTypes:
+        """Placeholder resolving any drf-spectacular type name."""
+
+        def __getattr__(self, name):
+            return name
+
+    OpenApiTypes = _OpenApiTypes()
+
+
+def write_schema(content, directory):
+    """Write a schema, its gzip copy and a manifest; return the manifest."""
+    version = hashlib.sha256(content).hexdigest()[:16]
+    name = f'openapi-{version}.yaml'
+    directory.mkdir(parents=True, exist_ok=True)
+    (directory / name).write_bytes(content)
+    (directory / f'{name}.gz').write_bytes(gzip.compress(content, compresslevel=9, mtime=0))
+    manifest = {'version': version, 'file': name}
+    (directory / MANIFEST_NAME).write_text(json.dumps(manifest))
+    return manifest
+
+
+def load_schema(directory):
+    """Return (version, content, gzipped content) of the built schema, or None."""
+    if directory in _loaded:
+        return _loaded[directory]
+    try:
+        manifest = json.loads((directory / MANIFEST_NAME).read_text())
+        content = (directory / manifest['file']).read_bytes()
+        compressed = (directory / f"{manifest['file']}.gz").read_bytes()
+    except (OSError, KeyError, ValueError):
+        return None
+    _loaded[directory] = manifest['version'], content, compressed
+    return _loaded[directory]
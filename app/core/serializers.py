@@ -0,0 +1,46 @@
+"""
+Serializers for the core API.
+"""
+from django.conf import settings
+from rest_framework import serializers
+
+BATCH_METHODS = ['GET', 'HEAD', 'OPTIONS', 'POST', 'PUT', 'PATCH', 'DELETE']
+# Sub-requests always run as the batch's user from the batch's client, so
+# only headers describing the request itself are accepted: no credentials,
+# and nothing that changes the host or the client address throttles see.
+ALLOWED_HEADERS = {
+    'accept', 'accept-language', 'content-type', 'idempotency-key',
+    'if-match', 'if-none-match', 'if-modified-since', 'if-unmodified-since',
+}
+
+
+class SubRequestSerializer(serializers.Serializer):
+    """One request of a batch"""
+    method = serializers.ChoiceField(choices=BATCH_METHODS, default='GET')
+    path = serializers.CharField()
+    headers = serializers.DictField(child=serializers.CharField(), required=False, default=dict)
+    body = serializers.JSONField(required=False, default=None)
+
+    def validate_path(self, value):
+        if not value.startswith('/api/') or value.startswith('/api/batch/'):
+            raise serializers.ValidationError('Only API routes other than the batch endpoint can be batched.')
+        return value
+
+    def validate_headers(self, value):
+        forbidden = sorted(name for name in value if name.lower() not in ALLOWED_HEADERS)
+        if forbidden:
+            raise serializers.ValidationError(f'Headers not allowed: {", ".join(forbidden)}.')
+        return value
+
+
+class BatchSerializer(serializers.Serializer):
+    """Batch of API requests"""
+    requests = serializers.ListField(child=SubRequestSerializer(), allow_empty=False)
+    concurrent = serializers.BooleanField(default=False)
+
+    def validate_requests(self, value):
+        if len(value) > settings.BATCH_MAX_REQUESTS:
+            raise serializers.ValidationError(
+                f'A batch can hold at most {settings.BATCH_MAX_REQUESTS} requests.'
+            )
+        return value
@@ -0,0 +1,234 @@
+"""
+Placement of managers on shards, cross-shard queries and rebalancing.
+
+Each manager's projects, with their tasks, notes, completions and status
+history, live on one shard recorded by a ShardAssignment on the primary. New
+users are assigned a shard when they sign up; users without an assignment
+live on the first shard. Ids of sharded tables are kept unique across shards
+by starting each shard's sequences at its own DATABASE_SHARD_ID_SPAN range,
+so rows keep their ids when a manager is moved to another shard.
+
+Placements are cached for SHARD_PLACEMENT_CACHE_TIMEOUT seconds, which is
+only good enough for reads: when the cache is not shared, other processes
+do not see a move start or end. Writes read the placement from the
+ShardAssignment rows instead and are refused on a shard a manager is being
+moved off, and a move waits SHARD_MOVE_GRACE seconds after marking the
+manager before it copies, so writes that started earlier are done by then.
+"""
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import Q
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from core.models import Note, Project, ShardAssignment, Task, TaskCompletion, TaskDependency, TaskStatusTransition
+from core.routers import is_sharded, sharding_enabled
+from core.signals import manager_moved
+
+
+def _cache_key(manager_id):
+    return f'shard-placement:{manager_id}'
+
+
+def placement(manager_id, fresh=False):
+    """Return (shard, moving) of a manager; with fresh, read it from the primary and recache it."""
+    if not sharding_enabled() or manager_id is None:
+        return settings.DATABASE_SHARDS[0], False
+    key = _cache_key(manager_id)
+    cached = None if fresh else cache.get(key)
+    if cached is None:
+        assignment = ShardAssignment.objects.using(DEFAULT_DB_ALIAS).filter(manager_id=manager_id).first()
+        cached = (assignment.shard, assignment.moving) if assignment else (settings.DATABASE_SHARDS[0], False)
+        cache.set(key, cached, settings.SHARD_PLACEMENT_CACHE_TIMEOUT)
+    return tuple(cached)
+
+
+def moving_from(shard):
+    """Return True if a manager is being moved off a shard, reading the primary."""
+    return ShardAssignment.objects.using(DEFAULT_DB_ALIAS).filter(shard=shard, moving=True).exists()
+
+
+def shard_for_manager(manager_id):
+    """Return the shard holding a manager's projects."""
+    return placement(manager_id)[0]
+
+
+def assign(manager_id, shard, moving=False):
+    """Record the shard of a manager."""
+    ShardAssignment.objects.using(DEFAULT_DB_ALIAS).update_or_create(
+        manager_id=manager_id,
+        defaults={'shard': shard, 'moving': moving},
+    )
+    cache.delete(_cache_key(manager_id))
+
+
+def initial_shard(user_id):
+    """Return the shard a new user is placed on."""
+    shards = settings.DATABASE_SHARDS
+    return shards[user_id % len(shards)]
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def assign_new_user(sender, instance, created, raw=False, **kwargs):
+    """Spread new users over the shards."""
+    if created and not raw and sharding_enabled():
+        assign(instance.pk, initial_shard(instance.pk))
+
+
+def assign_new_users(user_ids):
+    """Place users created with bulk_create, which sends no post_save."""
+    if not sharding_enabled():
+        return
+    ShardAssignment.objects.using(DEFAULT_DB_ALIAS).bulk_create(
+        [ShardAssignment(manager_id=user_id, shard=initial_shard(user_id)) for user_id in user_ids],
+        ignore_conflicts=True,
+    )
+    cache.delete_many([_cache_key(user_id) for user_id in user_ids])
+
+
+def sharded_models():
+    return [model for model in apps.get_models(include_auto_created=True) if is_sharded(model)]
+
+
+def _reserve_postgresql(cursor, table, start):
+    cursor.execute('SELECT pg_get_serial_sequence(%s, %s)', [table, 'id'])
+    sequence = cursor.fetchone()[0]
+    cursor.execute(
+        f'SELECT setval(%s, GREATEST(%s, (SELECT last_value FROM {sequence}), '
+        f'(SELECT COALESCE(MAX(id), 0) FROM {table})))',
+        [sequence, start],
+    )
+
+
+def _reserve_sqlite(cursor, table, start):
+    cursor.execute('SELECT seq FROM sqlite_sequence WHERE name = %s', [table])
+    row = cursor.fetchone()
+    if row is None:
+        cursor.execute('INSERT INTO sqlite_sequence (name, seq) VALUES (%s, %s)', [table, start])
+    elif row[0] < start:
+        cursor.execute('UPDATE sqlite_sequence SET seq = %s WHERE name = %s', [start, table])
+
+
+def reserve_id_ranges(using=DEFAULT_DB_ALIAS, **kwargs):
+    """Move the id sequences of sharded tables on a shard to its range; never backwards."""
+    if using not in settings.DATABASE_SHARDS[1:]:
+        return
+    start = settings.DATABASE_SHARDS.index(using) * settings.DATABASE_SHARD_ID_SPAN
+    connection = connections[using]
+    reserve = {'postgresql': _reserve_postgresql, 'sqlite': _reserve_sqlite}.get(connection.vendor)
+    if reserve is None:
+        return
+    with connection.cursor() as cursor:
+        for model in sharded_models():
+            reserve(cursor, model._meta.db_table, start)
+
+
+def fan_out(queryset, shards=None):
+    """Evaluate a queryset on every shard and return all rows."""
+    return [obj for alias in shards or settings.DATABASE_SHARDS for obj in queryset.using(alias)]
+
+
+def fan_out_counts(queryset, count=None):
+    """Return {shard: count} of a queryset, counted with count() by default."""
+    count = count or (lambda qs: qs.count())
+    return {alias: count(queryset.using(alias)) for alias in settings.DATABASE_SHARDS}
+
+
+def locate(queryset, **lookups):
+    """Return the first row matching lookups on any shard, or None."""
+    for alias in settings.DATABASE_SHARDS:
+        obj = queryset.using(alias).filter(**lookups).first()
+        if obj is not None:
+            return obj
+    return None
+
+
+def manager_rows(manager_id, alias):
+    """Return (label, queryset) pairs of a manager's rows on a shard, parents first."""
+    project_tasks = Project.tasks.through.objects.using(alias).filter(project__manager_id=manager_id)
+    # Resolve the tasks up front: deleting the links would otherwise hide them.
+    task_ids = list(
+        Task.objects.using(alias).filter(
+            Q(id__in=project_tasks.values('task_id')) | Q(completed_by_id=manager_id)
+        ).values_list('id', flat=True)
+    )
+    return [
+        ('projects', Project.all_objects.using(alias).filter(manager_id=manager_id)),
+        ('tasks', Task.objects.using(alias).filter(id__in=task_ids)),
+        ('project tasks', project_tasks),
+        ('project team', Project.team.through.objects.using(alias).filter(project__manager_id=manager_id)),
+        ('task dependencies', TaskDependency.objects.using(alias).filter(project__manager_id=manager_id)),
+        ('notes', Note.objects.using(alias).filter(task_id__in=task_ids)),
+        ('task completions', TaskCompletion.objects.using(alias).filter(task_id__in=task_ids)),
+        ('status transitions', TaskStatusTransition.objects.using(alias).filter(task_id__in=task_ids)),
+    ]
+
+
+class ShardMoveError(Exception):
+    """A manager's rows cannot be moved as a unit."""
+
+
+def copy_rows(queryset, target, batch_size):
+    """Insert the rows of a queryset into the target shard with their ids; return the count."""
+    manager = queryset.model._base_manager.using(target)
+    copied, batch = 0, []
+    for obj in queryset.iterator(chunk_size=batch_size):
+        batch.append(obj)
+        if len(batch) == batch_size:
+            manager.bulk_create(batch)
+            copied, batch = copied + len(batch), []
+    if batch:
+        manager.bulk_create(batch)
+    return copied + len(batch)
+
+
+def move_manager(manager_id, target, batch_size=1000, progress=None):
+    """Copy a manager's rows to another shard, switch the assignment, then delete the originals.
+
+    The manager is marked as moving first so API writes to the source shard
+    are refused until the assignment points at the target, then the move
+    waits SHARD_MOVE_GRACE seconds for writes already past that check.
+    Re-running after a failure is safe:
+    leftovers of an interrupted copy are removed from the target first.
+    Returns the number of rows copied.
+    """
+    from core.deletion import delete_in_batches
+
+    source = placement(manager_id, fresh=True)[0]
+    if source == target:
+        return 0
+    rows = manager_rows(manager_id, source)
+    tasks = rows[1][1]
+    shared = Project.tasks.through.objects.using(source).filter(
+        task_id__in=tasks.values('id'),
+    ).exclude(project__manager_id=manager_id)
+    if shared.exists():
+        raise ShardMoveError(f"Tasks of manager {manager_id} are linked to other managers' projects.")
+
+    assign(manager_id, source, moving=True)
+    time.sleep(settings.SHARD_MOVE_GRACE)
+    try:
+        with transaction.atomic(using=target):
+            for label, queryset in reversed(manager_rows(manager_id, target)):
+                queryset.delete()
+            copied = 0
+            for label, queryset in rows:
+                count = copy_rows(queryset, target, batch_size)
+                copied += count
+                if progress is not None:
+                    progress(label, count)
+    except Exception:
+        assign(manager_id, source)
+        raise
+    project_ids = list(rows[0][1].values_list('id', flat=True))
+    assign(manager_id, target)
+    manager_moved.send(sender=ShardAssignment, manager_id=manager_id, project_ids=project_ids, shard=target)
+
+    for label, queryset in reversed(rows):
+        for _ in delete_in_batches(queryset, batch_size):
+            pass
+    return copied
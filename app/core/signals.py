@@ -0,0 +1,25 @@
+"""
+Custom signals sent by the core app.
+"""
+from django.dispatch import Signal
+
+# Sent with ``project_ids`` after projects are hidden by a soft delete.
+projects_soft_deleted = Signal()
+
+# Sent with ``activities``, unsaved Activity rows of committed events: once
+# by each request that recorded some, when it finishes, or right after the
+# commit outside requests. Unlike the activity log, it never skips events the
+# buffer drops or loses.
+activity_committed = Signal()
+
+# Sent with ``manager_id``, ``project_ids`` and the new ``shard`` once a
+# manager's rows were copied to another shard.
+manager_moved = Signal()
+
+# Sent with ``user_ids`` and the ``project`` they joined, or None, after
+# users were created in bulk without post_save or m2m_changed.
+users_onboarded = Signal()
+
+# Sent with ``task_ids`` and the database alias ``using`` after task statuses
+# were changed in bulk without post_save.
+task_statuses_changed = Signal()
@@ -0,0 +1,201 @@
+"""
+Tests for the buffered activity log.
+"""
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import activity
+from core.models import Activity, Note, Project, Task
+from core.signals import activity_committed
+
+PROJECT_URL = reverse('project:project-list')
+
+
+def activity_url(project_id):
+    """Return the activity URL of a project."""
+    return reverse('project:project-activity', args=[project_id])
+
+
+def create_user(email='user@example.com', password='test1234'):
+    """Create and return a test user."""
+    return get_user_model().objects.create_user(email, password)
+
+
+def create_project(manager, **params):
+    """Create and return a sample project."""
+    defaults = {
+        'title': 'Sample project',
+        'description': 'Sample description',
+        'client_name': 'Client name',
+    }
+    defaults.update(params)
+    return Project.objects.create(manager=manager, **defaults)
+
+
+@override_settings(ACTIVITY_FLUSH_SIZE=100, ACTIVITY_FLUSH_INTERVAL=3600, ACTIVITY_BUFFER_SIZE=100)
+class ActivityTests(TestCase):
+    """Test recording and flushing activity."""
+
+    def setUp(self):
+        activity._buffer.clear()
+        self.user = create_user()
+
+    def tearDown(self):
+        activity._buffer.clear()
+
+    def publish_request(self, tasks):
+        """Commit a project and some tasks within a request; return (events published, queries when it finished)."""
+        sent = []
+
+        def receiver(sender, activities, **kwargs):
+            sent.append(activities)
+
+        activity_committed.connect(receiver)
+        self.addCleanup(activity_committed.disconnect, receiver)
+        activity.start_request()
+        with self.captureOnCommitCallbacks(execute=True):
+            project = create_project(self.user)
+            for index in range(tasks):
+                project.tasks.add(Task.objects.create(title=f'Task {index}', description='D', completed_by=self.user))
+        with CaptureQueriesContext(connection) as queries:
+            activity.finish_request()
+        self.assertEqual(len(sent), 1)
+        return len(sent[0]), len(queries)
+
+    def test_request_publishes_its_events_once(self):
+        """Test a request hands all its committed events to listeners at once, in a constant number of queries."""
+        few, many = self.publish_request(tasks=2), self.publish_request(tasks=20)
+
+        self.assertEqual((few[0], many[0]), (3, 21))
+        self.assertEqual(few[1], many[1])
+
+    def test_changes_are_buffered_until_flush(self):
+        """Test saves are logged in one batch when the buffer is flushed."""
+        with self.captureOnCommitCallbacks(execute=True):
+            project = create_project(self.user)
+            project.title = 'Renamed'
+            project.save()
+
+        self.assertFalse(Activity.objects.exists())
+        self.assertEqual(activity.flush(), 2)
+
+        actions = list(Activity.objects.order_by('id').values_list('action', 'object_type', 'project_id'))
+        self.assertEqual(actions, [
+            ('created', 'project', project.id),
+            ('updated', 'project', project.id),
+        ])
+
+    def test_rolled_back_changes_are_not_logged(self):
+        """Test nothing is buffered for a transaction that never commits."""
+        with self.captureOnCommitCallbacks(execute=False):
+            create_project(self.user)
+
+        self.assertEqual(len(activity._buffer), 0)
+
+    def test_task_events_are_logged_per_project(self):
+        """Test task and note events are attributed to the task's projects."""
+        first = create_project(self.user)
+        second = create_project(self.user)
+        task = Task.objects.create(title='Task', description='Task', completed_by=self.user)
+        first.tasks.add(task)
+        second.tasks.add(task)
+        with self.captureOnCommitCallbacks(execute=True):
+            Note.objects.create(content='Note', created_by=self.user, task=task)
+
+        activity.flush()
+
+        rows = Activity.objects.filter(object_type='note')
+        self.assertEqual(sorted(rows.values_list('project_id', flat=True)), [first.id, second.id])
+
+    def test_flush_on_size_threshold(self):
+        """Test the buffer is written once it holds ACTIVITY_FLUSH_SIZE entries."""
+        with self.settings(ACTIVITY_FLUSH_SIZE=3):
+            with self.captureOnCommitCallbacks(execute=True):
+                for i in range(3):
+                    create_project(self.user, title=f'Project {i}')
+
+        self.assertEqual(Activity.objects.count(), 3)
+        self.assertEqual(len(activity._buffer), 0)
+
+    def test_full_buffer_drops_entries(self):
+        """Test the drop policy keeps the buffer bounded."""
+        dropped = activity.dropped
+        with self.settings(ACTIVITY_BUFFER_SIZE=2, ACTIVITY_OVERFLOW='drop'):
+            with self.captureOnCommitCallbacks(execute=True):
+                for i in range(3):
+                    create_project(self.user, title=f'Project {i}')
+
+        self.assertEqual(len(activity._buffer), 2)
+        self.assertEqual(activity.dropped, dropped + 1)
+
+    def test_full_buffer_blocks_until_flushed(self):
+        """Test the block policy flushes instead of dropping entries."""
+        with self.settings(ACTIVITY_BUFFER_SIZE=2, ACTIVITY_OVERFLOW='block'):
+            with self.captureOnCommitCallbacks(execute=True):
+                for i in range(3):
+                    create_project(self.user, title=f'Project {i}')
+
+        self.assertEqual(Activity.objects.count(), 2)
+        self.assertEqual(len(activity._buffer), 1)
+
+
+@override_settings(ACTIVITY_FLUSH_SIZE=100, ACTIVITY_FLUSH_INTERVAL=3600)
+class ActivityApiTests(TestCase):
+    """Test the project activity endpoint."""
+
+    def setUp(self):
+        activity._buffer.clear()
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def tearDown(self):
+        activity._buffer.clear()
+
+    def test_activity_records_actor(self):
+        """Test API changes are attributed to the requesting user."""
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self.client.post(PROJECT_URL, {
+                'title': 'Project',
+                'description': 'Description',
+                'client_name': 'Client',
+            })
+        activity.flush()
+
+        res = self.client.get(activity_url(res.data['id']))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data['results']), 1)
+        self.assertEqual(res.data['results'][0]['action'], 'created')
+        self.assertEqual(res.data['results'][0]['actor_id'], self.user.id)
+
+    def test_activity_is_paginated_newest_first(self):
+        """Test activity pages are ordered by creation time."""
+        project = create_project(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(55):
+                project.title = f'Title {i}'
+                project.save()
+        activity.flush()
+
+        res = self.client.get(activity_url(project.id))
+
+        self.assertEqual(len(res.data['results']), 50)
+        times = [item['created_at'] for item in res.data['results']]
+        self.assertEqual(times, sorted(times, reverse=True))
+        res = self.client.get(res.data['next'])
+        self.assertEqual(len(res.data['results']), 5)
+
+    def test_activity_of_other_users_project_not_found(self):
+        """Test activity is only visible to users with access to the project."""
+        project = create_project(create_user(email='other@example.com'))
+
+        res = self.client.get(activity_url(project.id))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
@@ -5,6 +5,9 @@ from django.contrib.auth import get_user_model
 from django.urls import reverse
 from django.test import Client
 
+from core.admin import estimated_count
+from core.models import Note, Project, Task, TaskStatus
+
 
 class AdminSiteTests(TestCase):
     """ Test for django admin """
@@ -48,3 +51,71 @@ class AdminSiteTests(TestCase):
         res = self.client.get(url)
 
         self.assertEqual(res.status_code, 200)
+
+    def create_task(self, **params):
+        """ Create a task completed by the test user """
+        defaults = {'title': 'Sample task', 'description': 'Task description'}
+        defaults.update(params)
+        return Task.objects.create(completed_by=self.user, **defaults)
+
+    def test_changelists_load_related_rows_in_one_query(self):
+        """ Test changelist queries do not grow with the number of rows """
+        for i in range(5):
+            task = self.create_task(title=f'Task {i}')
+            Note.objects.create(content='Note', created_by=self.user, task=task)
+            project = Project.objects.create(
+                manager=self.user, title=f'Project {i}', client_name='Client', description='d',
+            )
+            project.tasks.add(task)
+
+        for name in ['project', 'task', 'note']:
+            url = reverse(f'admin:core_{name}_changelist')
+            with self.assertNumQueries(4):
+                res = self.client.get(url)
+            self.assertEqual(res.status_code, 200)
+
+    def test_search_by_prefix(self):
+        """ Test admin search matches field prefixes """
+        self.create_task(title='Deploy release')
+        self.create_task(title='Write docs')
+
+        url = reverse('admin:core_task_changelist')
+        res = self.client.get(url, {'q': 'depl'})
+
+        self.assertContains(res, 'Deploy release')
+        self.assertNotContains(res, 'Write docs')
+
+    def test_user_autocomplete(self):
+        """ Test users can be looked up through the autocomplete view """
+        url = reverse('admin:autocomplete')
+        res = self.client.get(url, {
+            'term': 'user@',
+            'app_label': 'core',
+            'model_name': 'project',
+            'field_name': 'manager',
+        })
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual([item['id'] for item in res.json()['results']], [str(self.user.id)])
+
+    def test_bulk_status_action(self):
+        """ Test the status actions update all selected tasks with one query """
+        tasks = [self.create_task(title=f'Task {i}') for i in range(3)]
+
+        url = reverse('admin:core_task_changelist')
+        res = self.client.post(url, {
+            'action': 'mark_completed',
+            '_selected_action': [task.id for task in tasks[:2]],
+        })
+
+        self.assertEqual(res.status_code, 302)
+        statuses = dict(Task.objects.values_list('id', 'status'))
+        self.assertEqual(statuses[tasks[0].id], TaskStatus.COMPLETED)
+        self.assertEqual(statuses[tasks[1].id], TaskStatus.COMPLETED)
+        self.assertEqual(statuses[tasks[2].id], TaskStatus.PENDING)
+
+    def test_estimated_count_exact_for_small_tables(self):
+        """ Test small tables fall back to an exact count """
+        self.create_task()
+
+        self.assertEqual(estimated_count(Task.objects.all()), 1)
@@ -0,0 +1,207 @@
+"""
+Tests for the batch endpoint.
+"""
+import time
+from unittest.mock import patch
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework.throttling import BaseThrottle
+
+from core import batch
+from core.batch import segments
+from core.models import Project
+
+BATCH_URL = reverse('batch')
+PROJECT_URL = reverse('project:project-list')
+PROFILE_URL = reverse('user:profile')
+
+
+def create_user(email='user@example.com', password='test1234'):
+    """Create and return a test user."""
+    return get_user_model().objects.create_user(email, password, name='Test User')
+
+
+def create_project(manager, **params):
+    """Create and return a sample project."""
+    defaults = {
+        'title': 'Sample project',
+        'description': 'Sample description',
+        'client_name': 'Client name',
+    }
+    defaults.update(params)
+    return Project.objects.create(manager=manager, **defaults)
+
+
+class PublicBatchApiTests(TestCase):
+    """Test unauthenticated batch requests."""
+
+    def test_auth_required(self):
+        """Test the batch itself must be authenticated."""
+        res = APIClient().post(BATCH_URL, {'requests': [{'path': PROFILE_URL}]}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class PrivateBatchApiTests(TestCase):
+    """Test authenticated batch requests."""
+
+    def setUp(self):
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def batch(self, requests, **params):
+        return self.client.post(BATCH_URL, {'requests': requests, **params}, format='json')
+
+    def test_batch_returns_responses_in_order(self):
+        """Test sub-requests run as the batch user and answer in order."""
+        create_project(self.user, title='Mine')
+        create_project(create_user(email='other@example.com'), title='Theirs')
+
+        res = self.batch([
+            {'path': PROFILE_URL},
+            {'path': PROJECT_URL},
+            {'path': '/api/project/missing/'},
+        ])
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        profile, projects, missing = res.data['responses']
+        self.assertEqual(profile['status'], status.HTTP_200_OK)
+        self.assertEqual(profile['body']['email'], self.user.email)
+        self.assertEqual([project['title'] for project in projects['body']], ['Mine'])
+        self.assertEqual(missing['status'], status.HTTP_404_NOT_FOUND)
+
+    def test_writes_are_seen_by_later_reads(self):
+        """Test sub-requests run in order, including writes."""
+        res = self.batch([
+            {
+                'method': 'POST',
+                'path': PROJECT_URL,
+                'body': {'title': 'New', 'description': 'Description', 'client_name': 'Client'},
+            },
+            {'path': PROJECT_URL},
+        ])
+
+        created, listed = res.data['responses']
+        self.assertEqual(created['status'], status.HTTP_201_CREATED)
+        self.assertEqual([project['title'] for project in listed['body']], ['New'])
+
+    def test_query_strings_are_passed(self):
+        """Test filters in sub-request paths are applied."""
+        project = create_project(self.user)
+        create_project(self.user)
+        task = project.tasks.create(title='Task', description='Task', completed_by=self.user)
+
+        res = self.batch([{'path': f'{PROJECT_URL}?tasks={task.id}'}])
+
+        self.assertEqual([p['id'] for p in res.data['responses'][0]['body']], [project.id])
+
+    @override_settings(BATCH_MAX_REQUESTS=2)
+    def test_batch_size_limit(self):
+        """Test batches above the size limit are rejected."""
+        res = self.batch([{'path': PROFILE_URL}] * 3)
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_nested_batches_and_other_paths_rejected(self):
+        """Test only API routes other than the batch endpoint are accepted."""
+        for path in [BATCH_URL, '/admin/']:
+            res = self.batch([{'path': path}])
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_authorization_header_rejected(self):
+        """Test sub-requests cannot switch users."""
+        res = self.batch([{'path': PROFILE_URL, 'headers': {'Authorization': 'Token abc'}}])
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_client_address_headers_rejected(self):
+        """Test sub-requests cannot change the host or the client address throttles see."""
+        for header in ['Host', 'X-Forwarded-For', 'X-Forwarded-Host', 'X-Real-IP', 'Forwarded', 'X-Profile']:
+            res = self.batch([{'path': PROFILE_URL, 'headers': {header: '10.0.0.1'}}])
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST, header)
+
+    def test_request_headers_allowed(self):
+        """Test headers describing the request itself are passed on."""
+        res = self.batch([{'path': PROFILE_URL, 'headers': {'Accept': 'application/json', 'If-None-Match': '"1"'}}])
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['responses'][0]['status'], status.HTTP_200_OK)
+
+    @override_settings(REST_FRAMEWORK={**settings.REST_FRAMEWORK, 'NUM_PROXIES': 1})
+    def test_sub_requests_keep_the_batch_client_address(self):
+        """Test throttles identify sub-requests by the batch's forwarded address."""
+        outer = APIRequestFactory().post(BATCH_URL, HTTP_X_FORWARDED_FOR='203.0.113.7, 198.51.100.1')
+        outer.user, outer.auth = self.user, None
+
+        sub_request = batch.build_request(outer, {'method': 'GET', 'path': PROFILE_URL, 'headers': {}, 'body': None})
+
+        self.assertEqual(BaseThrottle().get_ident(Request(sub_request)), '198.51.100.1')
+        self.assertEqual(sub_request.batch_auth, (self.user, None))
+
+    @override_settings(BATCH_TIME_BUDGET=0)
+    def test_time_budget(self):
+        """Test sub-requests past the time budget are not run."""
+        res = self.batch([{'method': 'POST', 'path': PROJECT_URL, 'body': {}}])
+
+        self.assertEqual(res.data['responses'][0]['status'], status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(res.data['not_run'], [0])
+        self.assertFalse(Project.objects.exists())
+
+    def test_segments_split_on_writes(self):
+        """Test unsafe requests are barriers between concurrent reads."""
+        subs = [{'method': method} for method in ['GET', 'GET', 'POST', 'GET']]
+
+        runs = [(parallel, [index for index, _ in run]) for parallel, run in segments(subs, True)]
+
+        self.assertEqual(runs, [(True, [0, 1]), (False, [2]), (True, [3])])
+
+
+class ConcurrentBatchApiTests(TransactionTestCase):
+    """Test reads running on the thread pool."""
+
+    def test_concurrent_reads(self):
+        """Test concurrent reads answer like sequential ones."""
+        user = create_user()
+        create_project(user, title='Mine')
+        client = APIClient()
+        client.force_authenticate(user)
+        requests = [{'path': PROFILE_URL}, {'path': PROJECT_URL}] * 3
+
+        res = client.post(BATCH_URL, {'requests': requests, 'concurrent': True}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        for profile, projects in zip(*[iter(res.data['responses'])] * 2):
+            self.assertEqual(profile['body']['email'], user.email)
+            self.assertEqual([project['title'] for project in projects['body']], ['Mine'])
+
+    @override_settings(BATCH_TIME_BUDGET=0.2, BATCH_MAX_WORKERS=1)
+    def test_nothing_runs_after_the_budget(self):
+        """Test started sub-requests finish before the answer and queued ones never start."""
+        user = create_user()
+        client = APIClient()
+        client.force_authenticate(user)
+        started = []
+        execute = batch.execute
+
+        def slow_execute(request, sub):
+            started.append(sub['path'])
+            time.sleep(0.3)
+            return execute(request, sub)
+
+        with patch('core.batch.execute', slow_execute):
+            res = client.post(BATCH_URL, {'requests': [{'path': PROFILE_URL}] * 3, 'concurrent': True}, format='json')
+            time.sleep(0.4)
+
+        self.assertEqual(res.data['responses'][0]['status'], status.HTTP_200_OK)
+        self.assertEqual(res.data['not_run'], [1, 2])
+        self.assertEqual(len(started), 1)
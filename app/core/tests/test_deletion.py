@@ -0,0 +1,136 @@
+"""
+Tests for soft deletion and batched purging.
+"""
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.deletion import purge, schedule_project_deletion, schedule_user_deletion
+from core.models import DeletionJob, Note, Project, Task, TaskCompletion, Token
+
+PROFILE_URL = reverse('user:profile')
+
+
+def create_user(email='user@example.com', password='test1234'):
+    """Create and return a test user."""
+    return get_user_model().objects.create_user(email, password)
+
+
+def create_project(manager, **params):
+    """Create and return a sample project."""
+    defaults = {
+        'title': 'Sample project',
+        'description': 'Sample description',
+        'client_name': 'Client name',
+    }
+    defaults.update(params)
+    return Project.objects.create(manager=manager, **defaults)
+
+
+def create_task(user, title='Task'):
+    """Create and return a sample task."""
+    return Task.objects.create(title=title, description=title, completed_by=user)
+
+
+class DeletionTests(TestCase):
+    """Test soft deletion and purging."""
+
+    def setUp(self):
+        self.user = create_user()
+        self.member = create_user(email='member@example.com')
+        self.project = create_project(self.user)
+        self.tasks = [create_task(self.user, f'Task {i}') for i in range(5)]
+        self.project.tasks.add(*self.tasks)
+        self.project.team.add(self.member)
+
+    def test_soft_deleted_project_is_hidden(self):
+        """Test a project scheduled for deletion is hidden at once."""
+        job = schedule_project_deletion(self.project)
+
+        self.assertFalse(Project.objects.filter(pk=self.project.pk).exists())
+        self.assertTrue(Project.all_objects.filter(pk=self.project.pk).exists())
+        self.assertEqual(job.status, DeletionJob.Status.PENDING)
+
+    def test_purge_project(self):
+        """Test purging removes the project and its links in batches."""
+        job = schedule_project_deletion(self.project)
+        batches = []
+
+        purge(job, batch_size=2, pause=0, progress=lambda job, label, n: batches.append(n))
+
+        self.assertFalse(Project.all_objects.filter(pk=self.project.pk).exists())
+        self.assertFalse(Project.tasks.through.objects.exists())
+        self.assertFalse(Project.team.through.objects.exists())
+        self.assertEqual(Task.objects.count(), 5)
+        self.assertTrue(all(n <= 2 for n in batches))
+        job.refresh_from_db()
+        self.assertEqual(job.status, DeletionJob.Status.DONE)
+        self.assertEqual(job.deleted_rows, sum(batches))
+        self.assertIsNotNone(job.completed_at)
+
+    def test_purge_resumes_after_crash(self):
+        """Test an interrupted purge finishes on the next run."""
+        job = schedule_project_deletion(self.project)
+
+        def crash(job, label, deleted):
+            raise RuntimeError('worker died')
+
+        with self.assertRaises(RuntimeError):
+            purge(job, batch_size=2, pause=0, progress=crash)
+        job.refresh_from_db()
+        self.assertEqual(job.status, DeletionJob.Status.RUNNING)
+        self.assertEqual(Project.tasks.through.objects.count(), 3)
+
+        call_command('purge_deleted', batch_size=2, pause=0, stdout=StringIO())
+
+        job.refresh_from_db()
+        self.assertEqual(job.status, DeletionJob.Status.DONE)
+        self.assertFalse(Project.all_objects.filter(pk=self.project.pk).exists())
+
+    def test_soft_deleted_user_is_hidden(self):
+        """Test a user scheduled for deletion is hidden with their projects."""
+        schedule_user_deletion(self.user)
+
+        self.assertFalse(get_user_model().objects.filter(pk=self.user.pk).exists())
+        user = get_user_model().all_objects.get(pk=self.user.pk)
+        self.assertFalse(user.is_active)
+        self.assertFalse(Project.objects.filter(manager=self.user).exists())
+
+    def test_purge_user(self):
+        """Test purging a user removes everything they own."""
+        Note.objects.create(content='Note', created_by=self.member, task=self.tasks[0])
+        TaskCompletion.objects.create(task=self.tasks[0], user=self.member)
+        Token.objects.create(user=self.user)
+        other_project = create_project(self.member)
+        other_project.team.add(self.user)
+        job = schedule_user_deletion(self.user)
+
+        purge(job, batch_size=2, pause=0)
+
+        self.assertFalse(get_user_model().all_objects.filter(pk=self.user.pk).exists())
+        self.assertFalse(Project.all_objects.filter(manager_id=self.user.pk).exists())
+        self.assertFalse(Task.objects.exists())
+        self.assertFalse(Note.objects.exists())
+        self.assertFalse(TaskCompletion.objects.exists())
+        self.assertFalse(Token.objects.exists())
+        self.assertFalse(other_project.team.exists())
+        self.assertTrue(get_user_model().objects.filter(pk=self.member.pk).exists())
+
+    def test_delete_account_api(self):
+        """Test deleting the profile schedules a user deletion."""
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        res = client.delete(PROFILE_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(get_user_model().objects.filter(pk=self.user.pk).exists())
+        self.assertTrue(
+            DeletionJob.objects.filter(kind=DeletionJob.Kind.USER, object_id=self.user.pk).exists()
+        )
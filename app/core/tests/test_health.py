@@ -0,0 +1,118 @@
+"""
+Tests for the health checks and the metrics endpoint.
+"""
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.db.utils import OperationalError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import health, metrics
+from core.models import Notification
+
+HEALTH_URL = reverse('health-check')
+READY_URL = reverse('readiness-check')
+METRICS_URL = reverse('metrics')
+
+
+class HealthTests(TestCase):
+    """Test liveness and readiness."""
+
+    def setUp(self):
+        health._cached = None
+        self.client = APIClient()
+
+    def test_liveness(self):
+        """Test liveness answers without a database query."""
+        with self.assertNumQueries(0):
+            res = self.client.get(HEALTH_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_ready(self):
+        """Test readiness reports the latency of each database."""
+        res = self.client.get(READY_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertTrue(res.data['databases']['default']['ok'])
+        self.assertIn('latency_ms', res.data['databases']['default'])
+
+    def test_readiness_is_cached(self):
+        """Test repeated probes reuse the last check."""
+        self.client.get(READY_URL)
+
+        with self.assertNumQueries(0):
+            self.client.get(READY_URL)
+
+    @override_settings(HEALTH_READY_CACHE_SECONDS=0)
+    @patch('core.health.database_latency', side_effect=OperationalError)
+    def test_not_ready_when_database_down(self, patched_latency):
+        """Test readiness fails while a database is unreachable."""
+        res = self.client.get(READY_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(res.data['databases']['default'], {'ok': False, 'error': 'OperationalError'})
+
+    @override_settings(HEALTH_READY_CACHE_SECONDS=0, HEALTH_MAX_DB_LATENCY=0.1)
+    @patch('core.health.database_latency', return_value=0.2)
+    def test_not_ready_when_database_slow(self, patched_latency):
+        """Test readiness fails while a database answers too slowly."""
+        res = self.client.get(READY_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+
+
+class MetricsTests(TestCase):
+    """Test the metrics endpoint."""
+
+    def setUp(self):
+        metrics.SERVER_COLLECTOR._cached = None
+        self.addCleanup(setattr, metrics.SERVER_COLLECTOR, '_cached', None)
+
+    def test_requests_are_counted(self):
+        """Test requests show up per view with their status and queries."""
+        client = APIClient()
+        client.get(HEALTH_URL)
+
+        res = client.get(METRICS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        body = res.content.decode()
+        self.assertIn('http_requests_total{method="GET",status="200",view="health-check"}', body)
+        self.assertIn('http_request_db_queries_bucket', body)
+        self.assertIn('http_request_duration_seconds_bucket', body)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_scrapes_need_an_allowed_address_or_the_token(self):
+        """Test other clients are refused unless they bear the token."""
+        client = APIClient(REMOTE_ADDR='203.0.113.7')
+
+        self.assertEqual(client.get(METRICS_URL).status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(
+            client.get(METRICS_URL, HTTP_AUTHORIZATION='Bearer wrong').status_code, status.HTTP_403_FORBIDDEN,
+        )
+        self.assertEqual(client.get(METRICS_URL, HTTP_AUTHORIZATION='Bearer secret').status_code, status.HTTP_200_OK)
+
+    def test_no_token_configured_refuses_everyone_else(self):
+        """Test an empty METRICS_TOKEN never matches."""
+        res = APIClient(REMOTE_ADDR='203.0.113.7').get(METRICS_URL, HTTP_AUTHORIZATION='Bearer ')
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_email_backlog_is_pending_notifications_read_once_per_interval(self):
+        """Test the backlog counts unsent notifications and server figures are cached."""
+        user = get_user_model().objects.create_user(email='user@example.com', password='test123')
+        Notification.objects.create(recipient=user, kind=Notification.Kind.TASK_UPDATED, task_id=1)
+        client = APIClient()
+
+        res = client.get(METRICS_URL)
+        Notification.objects.create(recipient=user, kind=Notification.Kind.NOTE_ADDED, task_id=1)
+        with self.assertNumQueries(0):
+            cached = client.get(METRICS_URL)
+
+        self.assertIn('email_backlog 1.0', res.content.decode())
+        self.assertIn('email_backlog 1.0', cached.content.decode())
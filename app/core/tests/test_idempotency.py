@@ -0,0 +1,182 @@
+"""
+Tests for Idempotency-Key handling.
+"""
+import hashlib
+from datetime import timedelta
+from io import StringIO
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import IdempotencyKey, Project
+
+PROJECT_URL = reverse('project:project-list')
+CREATE_USER_URL = reverse('user:create-account')
+
+PROJECT_PAYLOAD = {
+    'title': 'Project',
+    'description': 'Description',
+    'client_name': 'Client',
+}
+
+
+class IdempotencyTests(TestCase):
+    """Test retried requests are not executed twice."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user('user@example.com', 'test1234')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def post_project(self, key, payload=PROJECT_PAYLOAD):
+        return self.client.post(PROJECT_URL, payload, format='json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_retry_returns_stored_response(self):
+        """Test a retry replays the first response without creating again."""
+        first = self.post_project('key-1')
+        second = self.post_project('key-1')
+
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(second.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(Project.objects.count(), 1)
+
+    def test_keys_are_scoped_per_user(self):
+        """Test two users can use the same key independently."""
+        self.post_project('key-1')
+        other = get_user_model().objects.create_user('other@example.com', 'test1234')
+        self.client.force_authenticate(other)
+
+        res = self.post_project('key-1')
+
+        self.assertNotIn('Idempotent-Replayed', res)
+        self.assertEqual(Project.objects.count(), 2)
+
+    def test_key_reused_for_different_request(self):
+        """Test reusing a key with another body is rejected."""
+        self.post_project('key-1')
+
+        res = self.post_project('key-1', {**PROJECT_PAYLOAD, 'title': 'Other'})
+
+        self.assertEqual(res.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(Project.objects.count(), 1)
+
+    def test_requests_without_key_are_not_stored(self):
+        """Test the header is optional."""
+        self.client.post(PROJECT_URL, PROJECT_PAYLOAD, format='json')
+        self.client.post(PROJECT_URL, PROJECT_PAYLOAD, format='json')
+
+        self.assertEqual(Project.objects.count(), 2)
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+    @override_settings(IDEMPOTENCY_WAIT=0)
+    def test_concurrent_duplicate_gives_up_after_wait(self):
+        """Test a retry of a request still running is answered with a conflict."""
+        self.post_project('key-1')
+        IdempotencyKey.objects.update(response_status=None)
+
+        res = self.post_project('key-1')
+
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(Project.objects.count(), 1)
+
+    def test_concurrent_duplicate_waits_for_first(self):
+        """Test a retry of a request still running replays it once stored."""
+        self.post_project('key-1')
+        stored = IdempotencyKey.objects.get()
+        IdempotencyKey.objects.update(response_status=None)
+
+        def finish_first(seconds):
+            IdempotencyKey.objects.update(response_status=stored.response_status)
+
+        with patch('core.idempotency.time.sleep', side_effect=finish_first) as patched_sleep:
+            res = self.post_project('key-1')
+
+        patched_sleep.assert_called_once()
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res['Idempotent-Replayed'], 'true')
+        self.assertEqual(Project.objects.count(), 1)
+
+    def test_abandoned_key_is_taken_over(self):
+        """Test a key whose request died runs again after the lock timeout."""
+        self.post_project('key-1')
+        IdempotencyKey.objects.update(
+            response_status=None,
+            locked_at=timezone.now() - timedelta(hours=1),
+        )
+
+        res = self.post_project('key-1')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Project.objects.count(), 2)
+        self.assertIsNotNone(IdempotencyKey.objects.get().response_status)
+
+    def test_expired_key_runs_again(self):
+        """Test keys can be reused once they expired."""
+        self.post_project('key-1')
+        IdempotencyKey.objects.update(expires_at=timezone.now())
+
+        self.post_project('key-1')
+
+        self.assertEqual(Project.objects.count(), 2)
+
+    def test_create_account_retry_sends_one_email(self):
+        """Test retrying sign up neither duplicates the user nor the email."""
+        client = APIClient()
+        payload = {
+            'email': 'new@example.com',
+            'password': 'test-pass123',
+            'password_confirmation': 'test-pass123',
+            'name': 'New User',
+        }
+
+        first = client.post(CREATE_USER_URL, payload, HTTP_IDEMPOTENCY_KEY='signup')
+        second = client.post(CREATE_USER_URL, payload, HTTP_IDEMPOTENCY_KEY='signup')
+
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(second.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_anonymous_keys_are_scoped_per_client(self):
+        """Test anonymous clients sending the same key do not collide."""
+        client = APIClient()
+        payloads = [
+            {'email': f'new{index}@example.com', 'password': 'test-pass123',
+             'password_confirmation': 'test-pass123', 'name': 'New User'}
+            for index in range(2)
+        ]
+
+        first = client.post(CREATE_USER_URL, payloads[0], HTTP_IDEMPOTENCY_KEY='signup', REMOTE_ADDR='10.0.0.1')
+        second = client.post(CREATE_USER_URL, payloads[1], HTTP_IDEMPOTENCY_KEY='signup', REMOTE_ADDR='10.0.0.2')
+
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(second.status_code, status.HTTP_201_CREATED)
+        self.assertNotIn('Idempotent-Replayed', second)
+        self.assertEqual(get_user_model().objects.filter(email__startswith='new').count(), 2)
+
+    def test_fingerprint_is_keyed(self):
+        """Test the stored fingerprint is not a plain hash of the request body."""
+        body = b'{"title":"Project","description":"Description","client_name":"Client"}'
+        self.client.post(PROJECT_URL, body, content_type='application/json', HTTP_IDEMPOTENCY_KEY='key-1')
+
+        plain = hashlib.sha256(b'POST\0' + PROJECT_URL.encode() + b'\0' + body + b'\0').hexdigest()
+        self.assertNotEqual(IdempotencyKey.objects.get().fingerprint, plain)
+
+    def test_clear_expired_keys(self):
+        """Test the cleanup command only deletes expired keys."""
+        self.post_project('key-1')
+        self.post_project('key-2')
+        IdempotencyKey.objects.filter(key='key-1').update(expires_at=timezone.now())
+
+        call_command('clear_idempotency_keys', stdout=StringIO())
+
+        self.assertEqual(list(IdempotencyKey.objects.values_list('key', flat=True)), ['key-2'])
@@ -0,0 +1,61 @@
+"""
+Tests for the path-aware middleware stack.
+"""
+from django.contrib.auth import get_user_model
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, SimpleTestCase, TestCase
+
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.middleware import AuthenticationMiddleware, MessageMiddleware, SessionMiddleware
+
+
+class BrowserOnlyMiddlewareTests(SimpleTestCase):
+    """Test the browser middleware skips the lean paths."""
+
+    def run_stack(self, path):
+        request = RequestFactory().get(path)
+        stack = SessionMiddleware(AuthenticationMiddleware(MessageMiddleware(lambda request: HttpResponse())))
+        stack(request)
+        return request
+
+    def test_api_paths_skip_middleware(self):
+        """Test API requests get no session, lazy user or messages."""
+        request = self.run_stack('/api/project/project/')
+
+        for attribute in ('session', 'user', '_messages'):
+            self.assertFalse(hasattr(request, attribute), attribute)
+
+    def test_admin_keeps_middleware(self):
+        """Test other paths still run the full stack."""
+        request = self.run_stack('/admin/')
+
+        for attribute in ('session', 'user', '_messages'):
+            self.assertTrue(hasattr(request, attribute), attribute)
+
+
+class MiddlewareStackTests(TestCase):
+    """Test requests through the configured middleware."""
+
+    def test_admin_still_enforces_csrf(self):
+        """Test the admin login rejects posts without a CSRF token and works with a session."""
+        client = Client(enforce_csrf_checks=True)
+
+        res = client.post('/admin/login/', {'username': 'a', 'password': 'b'})
+
+        self.assertEqual(res.status_code, 403)
+        admin = get_user_model().objects.create_superuser(email='admin@example.com', password='test123')
+        client.force_login(admin)
+        self.assertEqual(client.get('/admin/').status_code, 200)
+
+    def test_api_ignores_session_and_csrf(self):
+        """Test token requests work without a CSRF token and set no cookies."""
+        user = get_user_model().objects.create_user(email='user@example.com', password='test123')
+        client = APIClient(enforce_csrf_checks=True)
+        client.credentials(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=user).key}')
+
+        res = client.post('/api/project/project/', {'title': 'T', 'client_name': 'C', 'description': 'D'})
+
+        self.assertEqual(res.status_code, 201)
+        self.assertFalse(res.cookies)
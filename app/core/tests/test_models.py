@@ -5,10 +5,11 @@ import uuid
 
 from django.utils import timezone
 from datetime import timedelta
+from django.db import transaction
 from django.test import TestCase
 from django.contrib.auth import get_user_model
 
-from core.models import Project, Task, TaskCompletion, Token
+from core.models import Project, StaleVersionError, Task, TaskCompletion, Token
 
 
 def create_user(email='test@exmaple.com', password='test1234'):
@@ -136,3 +137,29 @@ class ModelTests(TestCase):
         self.assertEqual(completion.status, 'completed')
         self.assertEqual(completion.task, task)
         self.assertEqual(completion.user, user)
+
+    def test_update_increments_version(self):
+        """ Tests saving a task increments its version """
+        user = create_user()
+        task = Task.objects.create(title='Task', description='Description', completed_by=user)
+
+        task.title = 'Renamed'
+        task.save()
+
+        task.refresh_from_db()
+        self.assertEqual(task.version, 2)
+
+    def test_stale_update_is_rejected(self):
+        """ Tests saving a copy read before another update fails """
+        user = create_user()
+        task = Task.objects.create(title='Task', description='Description', completed_by=user)
+        stale = Task.objects.get(pk=task.pk)
+        task.title = 'First'
+        task.save()
+
+        stale.title = 'Second'
+        with self.assertRaises(StaleVersionError), transaction.atomic():
+            stale.save()
+
+        task.refresh_from_db()
+        self.assertEqual(task.title, 'First')
@@ -0,0 +1,58 @@
+"""
+Tests for on-demand request profiling.
+"""
+import tempfile
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+PROJECT_URL = reverse('project:project-list')
+
+
+class ProfilingTests(TestCase):
+    """Test profiling requests of staff users."""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        override = override_settings(PROFILING_DIR=self.directory.name, PROFILING_SAMPLE_INTERVAL=0.0005)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.staff = get_user_model().objects.create_user(email='staff@example.com', password='test123')
+        self.staff.is_staff = True
+        self.staff.save()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=self.staff).key}')
+
+    def test_staff_request_is_profiled(self):
+        """Test a staff request with the flag gets timings and a stored profile."""
+        res = self.client.get(PROJECT_URL, {'profile': 'cprofile'})
+
+        self.assertEqual(res.status_code, 200)
+        phases = [entry.split(';')[0] for entry in res['Server-Timing'].split(', ')]
+        self.assertEqual(phases, ['auth', 'queryset', 'serialize', 'render', 'sql', 'total'])
+        self.assertTrue((Path(self.directory.name) / res['X-Profile-Id']).exists())
+
+    def test_sampling_profiler_writes_folded_stacks(self):
+        """Test the sampling profiler stores folded stacks."""
+        res = self.client.get(PROJECT_URL, HTTP_X_PROFILE='sample')
+
+        self.assertTrue(res['X-Profile-Id'].endswith('.folded'))
+        self.assertIn('sql;dur=', res['Server-Timing'])
+
+    def test_other_users_are_not_profiled(self):
+        """Test the flag is ignored for users who are not staff."""
+        user = get_user_model().objects.create_user(email='user@example.com', password='test123')
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=user).key}')
+
+        res = client.get(PROJECT_URL, {'profile': 'cprofile'})
+
+        self.assertEqual(res.status_code, 200)
+        self.assertNotIn('Server-Timing', res)
+        self.assertEqual(list(Path(self.directory.name).iterdir()), [])
@@ -0,0 +1,152 @@
+"""
+Tests for the primary/replica and shard database routers.
+"""
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.utils import OperationalError
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework.test import APIClient
+
+from core import routers
+from core.models import Project, Task
+
+PROJECT_URL = reverse('project:project-list')
+
+
+@override_settings(
+    DATABASE_REPLICAS=['replica_0'],
+    DATABASE_REPLICA_MAX_LAG=2,
+    DATABASE_REPLICA_CHECK_INTERVAL=60,
+)
+class PrimaryReplicaRouterTests(SimpleTestCase):
+    """Test routing decisions."""
+
+    def setUp(self):
+        self.router = routers.PrimaryReplicaRouter()
+        routers._replica_health.clear()
+
+    def test_reads_use_primary_by_default(self):
+        """Test reads outside a replica block are not routed."""
+        self.assertIsNone(self.router.db_for_read(Project))
+
+    @patch('core.routers.replica_lag', return_value=0.1)
+    def test_reads_use_replica(self, patched_lag):
+        """Test reads in a replica block go to a healthy replica."""
+        with routers.replica_reads():
+            self.assertEqual(self.router.db_for_read(Project), 'replica_0')
+
+        patched_lag.assert_called_once_with('replica_0')
+
+    @patch('core.routers.replica_lag', return_value=30)
+    def test_lagging_replica_falls_back_to_primary(self, patched_lag):
+        """Test a replica behind the lag limit is skipped."""
+        with routers.replica_reads():
+            self.assertEqual(self.router.db_for_read(Project), 'default')
+
+    @patch('core.routers.replica_lag', side_effect=OperationalError)
+    def test_unavailable_replica_falls_back_to_primary(self, patched_lag):
+        """Test an unreachable replica is skipped."""
+        with routers.replica_reads():
+            self.assertEqual(self.router.db_for_read(Project), 'default')
+
+    @patch('core.routers.replica_lag', return_value=0)
+    def test_replica_health_is_cached(self, patched_lag):
+        """Test replica lag is not checked on every query."""
+        with routers.replica_reads():
+            self.router.db_for_read(Project)
+            self.router.db_for_read(Project)
+
+        patched_lag.assert_called_once()
+
+    def test_writes_use_primary(self):
+        """Test writes always go to the primary."""
+        with routers.replica_reads():
+            self.assertEqual(self.router.db_for_write(Project), 'default')
+
+    def test_no_migrations_on_replicas(self):
+        """Test replicas are never migrated."""
+        self.assertFalse(self.router.allow_migrate('replica_0', 'core'))
+        self.assertIsNone(self.router.allow_migrate('default', 'core'))
+
+
+class ReplicaReadMixinTests(TestCase):
+    """Test read-your-writes behaviour of the API views."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            email='user@example.com',
+            password='test123',
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    @patch('core.routers.choose_replica', return_value=None)
+    def test_safe_requests_read_from_replica(self, patched_choose):
+        """Test listing projects reads from a replica."""
+        res = self.client.get(PROJECT_URL)
+
+        self.assertEqual(res.status_code, 200)
+        patched_choose.assert_called()
+
+    @patch('core.routers.choose_replica', return_value=None)
+    def test_user_pinned_to_primary_after_write(self, patched_choose):
+        """Test a user reads from the primary right after writing."""
+        payload = {
+            'title': 'Sample project',
+            'description': 'Sample project',
+            'client_name': 'Client name',
+        }
+        res = self.client.post(PROJECT_URL, payload)
+        self.assertEqual(res.status_code, 201)
+        self.assertTrue(routers.is_pinned_to_primary(self.user))
+
+        res = self.client.get(PROJECT_URL)
+
+        self.assertEqual(len(res.data), 1)
+        patched_choose.assert_not_called()
+
+    def test_failed_write_does_not_pin(self):
+        """Test a rejected write does not pin the user."""
+        res = self.client.post(PROJECT_URL, {})
+
+        self.assertEqual(res.status_code, 400)
+        self.assertFalse(routers.is_pinned_to_primary(self.user))
+
+
+@override_settings(DATABASE_SHARDS=['default', 'shard_1'], DATABASE_REPLICAS=[])
+class ShardRouterTests(SimpleTestCase):
+    """Test routing with several shards."""
+
+    def setUp(self):
+        self.router = routers.ShardRouter()
+
+    def test_sharded_models_use_current_shard(self):
+        """Test sharded models and their through tables follow use_shard."""
+        self.assertEqual(self.router.db_for_read(Project), 'default')
+        with routers.use_shard('shard_1'):
+            self.assertEqual(self.router.db_for_read(Project), 'shard_1')
+            self.assertEqual(self.router.db_for_write(Project.tasks.through), 'shard_1')
+            self.assertEqual(self.router.db_for_write(get_user_model()), 'default')
+
+    def test_sharded_instances_stay_on_their_shard(self):
+        """Test related queries of a loaded row go to its shard."""
+        project = Project()
+        project._state.db = 'shard_1'
+
+        self.assertEqual(self.router.db_for_read(Task, instance=project), 'shard_1')
+        self.assertEqual(self.router.db_for_read(get_user_model(), instance=project), 'default')
+
+    def test_relations(self):
+        """Test rows relate within a shard and to global rows only."""
+        project, task, user = Project(), Task(), get_user_model()()
+        project._state.db, task._state.db, user._state.db = 'shard_1', 'default', 'default'
+
+        self.assertFalse(self.router.allow_relation(project, task))
+        self.assertTrue(self.router.allow_relation(project, user))
+        task._state.db = 'shard_1'
+        self.assertTrue(self.router.allow_relation(project, task))
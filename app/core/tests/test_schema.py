@@ -0,0 +1,112 @@
+"""
+Tests for the precomputed OpenAPI schema.
+"""
+import gzip
+import tempfile
+from io import StringIO
+from pathlib import Path
+from unittest import skipUnless
+
+from django.conf import settings
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse
+
+from core import schema
+
+SCHEMA_URL = reverse('api-schema')
+CONTENT = b'openapi: 3.0.3\ninfo:\n  title: ""\n'
+
+
+@skipUnless(not settings.SCHEMA_LIVE, 'schema is generated live')
+class PrecomputedSchemaTests(SimpleTestCase):
+    """Test serving the schema from disk."""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = Path(directory.name)
+        self.manifest = schema.write_schema(CONTENT, self.root)
+        schema._loaded.clear()
+        self.addCleanup(schema._loaded.clear)
+        settings_override = override_settings(SCHEMA_ROOT=self.root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def test_schema_served_with_etag(self):
+        """Test the schema is served with caching headers."""
+        res = self.client.get(SCHEMA_URL)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.content, CONTENT)
+        self.assertEqual(res['ETag'], f'"{self.manifest["version"]}"')
+        self.assertIn('max-age', res['Cache-Control'])
+        self.assertIn('Accept-Encoding', res['Vary'])
+
+    def test_schema_gzip(self):
+        """Test the schema is served gzipped when accepted."""
+        res = self.client.get(SCHEMA_URL, HTTP_ACCEPT_ENCODING='gzip, deflate')
+
+        self.assertEqual(res['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(res.content), CONTENT)
+
+    def test_schema_not_modified(self):
+        """Test a matching If-None-Match gets a 304."""
+        etag = f'"{self.manifest["version"]}"'
+
+        res = self.client.get(SCHEMA_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, 304)
+        self.assertEqual(res.content, b'')
+
+    def test_versioned_schema_is_immutable(self):
+        """Test the versioned URL is cached forever."""
+        url = reverse('api-schema-version', args=[self.manifest['version']])
+
+        res = self.client.get(url)
+
+        self.assertEqual(res.status_code, 200)
+        self.assertIn('immutable', res['Cache-Control'])
+
+    def test_unknown_version(self):
+        """Test an old schema version is not found."""
+        res = self.client.get(reverse('api-schema-version', args=['0' * 16]))
+
+        self.assertEqual(res.status_code, 404)
+
+    def test_missing_schema(self):
+        """Test a missing build is reported as not found."""
+        schema._loaded.clear()
+        with override_settings(SCHEMA_ROOT=self.root / 'missing'):
+            res = self.client.get(SCHEMA_URL)
+
+        self.assertEqual(res.status_code, 404)
+
+    def test_docs_read_the_built_schema(self):
+        """Test the docs page loads Swagger UI on the built schema."""
+        res = self.client.get(reverse('api-docs'))
+
+        self.assertEqual(res.status_code, 200)
+        self.assertContains(res, 'swagger-ui')
+        self.assertContains(res, f'url: "{SCHEMA_URL}"')
+
+    def test_build_requires_live_schema(self):
+        """Test build_schema refuses to run without the annotations."""
+        with self.assertRaises(CommandError):
+            call_command('build_schema', stdout=StringIO())
+
+
+@skipUnless(settings.SCHEMA_LIVE, 'needs SCHEMA_LIVE=1')
+class BuildSchemaTests(SimpleTestCase):
+    """Test generating the schema file."""
+
+    def test_build_schema(self):
+        """Test the built schema describes the project filters."""
+        with tempfile.TemporaryDirectory() as directory:
+            call_command('build_schema', output=directory, stdout=StringIO())
+
+            loaded = schema.load_schema(Path(directory))
+
+        self.assertIn(b'/api/project/project/', loaded[1])
+        self.assertIn(b'match', loaded[1])
@@ -0,0 +1,206 @@
+"""
+Tests for placing managers on shards, with DB_SHARD_HOSTS set or with
+--settings=app.settings_sharding.
+"""
+import time
+from unittest import skipUnless
+from unittest.mock import patch
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import sharding
+from core.deletion import pending_jobs, purge, schedule_project_deletion
+from core.models import Note, Project, ShardAssignment, Task, TaskStatusTransition
+
+PROJECT_URL = reverse('project:project-list')
+TASKS_URL = reverse('project:task-list')
+
+
+def detail_url(project_id):
+    """Create and return a project detail URL."""
+    return reverse('project:project-detail', args=[project_id])
+
+
+def create_user(email, shard):
+    """Create and return a new user placed on a shard."""
+    user = get_user_model().objects.create_user(email=email, password='test123')
+    sharding.assign(user.pk, shard)
+    return user
+
+
+def create_project(manager, **params):
+    """Create and return a sample project with a task."""
+    defaults = {
+        'title': 'Sample project title',
+        'description': 'Sample project description',
+        'client_name': 'Client name',
+    }
+    defaults.update(params)
+    project = Project.objects.create(manager=manager, **defaults)
+    project.tasks.create(title='Task', description='Description', completed_by=manager)
+    return project
+
+
+@skipUnless(len(settings.DATABASE_SHARDS) > 1, 'Needs DB_SHARD_HOSTS')
+@override_settings(SHARD_MOVE_GRACE=0)
+class ShardingTests(TestCase):
+    """Test rows follow the shard of their manager."""
+    databases = '__all__'
+
+    def setUp(self):
+        cache.clear()
+        self.first, self.second = settings.DATABASE_SHARDS[:2]
+        self.manager = create_user('manager@example.com', self.second)
+        self.member = create_user('member@example.com', self.first)
+        self.client = APIClient()
+
+    def test_rows_are_created_on_the_manager_shard(self):
+        """Test projects and tasks are saved on their manager's shard with its id range."""
+        project = create_project(self.manager)
+
+        self.assertEqual(project._state.db, self.second)
+        self.assertFalse(Project.objects.using(self.first).filter(pk=project.pk).exists())
+        self.assertGreaterEqual(project.id, settings.DATABASE_SHARD_ID_SPAN)
+        task = project.tasks.get()
+        self.assertEqual(task._state.db, self.second)
+        self.assertTrue(TaskStatusTransition.objects.using(self.second).filter(task=task).exists())
+
+    def test_tasks_follow_their_project_not_their_assignee(self):
+        """Test a task assigned to a user of another shard is stored with its project."""
+        project = create_project(self.manager)
+
+        task = project.tasks.create(title='Assigned', description='Text', completed_by=self.member)
+
+        self.assertEqual(task._state.db, self.second)
+        self.assertEqual(project.tasks.count(), 2)
+        stray = Task.objects.using(self.first).create(title='Stray', description='Text', completed_by=self.member)
+        with self.assertRaises(ValueError):
+            project.tasks.add(stray)
+
+    def test_api_create_uses_manager_shard(self):
+        """Test creating a project through the API stores it on the manager's shard."""
+        self.client.force_authenticate(self.manager)
+        payload = {'title': 'Project', 'client_name': 'Client', 'description': 'Text', 'tasks': [
+            {'title': 'Task', 'description': 'Text', 'status': 'pending'},
+        ]}
+
+        res = self.client.post(PROJECT_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        project = Project.objects.using(self.second).get(id=res.data['id'])
+        self.assertEqual(project.tasks.count(), 1)
+
+    def test_list_fans_out_to_team_shards(self):
+        """Test a team member lists projects from every shard they can access."""
+        own = create_project(self.member, title='Own')
+        shared = create_project(self.manager, title='Shared')
+        shared.team.add(self.member)
+        self.client.force_authenticate(self.member)
+
+        res = self.client.get(PROJECT_URL)
+        tasks = self.client.get(TASKS_URL)
+        detail = self.client.get(detail_url(shared.id))
+
+        self.assertEqual([row['id'] for row in res.data], [shared.id, own.id])
+        self.assertEqual(len(tasks.data), 2)
+        self.assertEqual(detail.status_code, status.HTTP_200_OK)
+        self.assertEqual(detail.data['title'], 'Shared')
+
+    def test_move_manager(self):
+        """Test moving a manager copies their rows, keeps ids and deletes the originals."""
+        project = create_project(self.manager)
+        project.team.add(self.member)
+        task = project.tasks.get()
+        Note.objects.create(task=task, created_by=self.member, content='Note')
+        self.client.force_authenticate(self.member)
+        self.client.get(PROJECT_URL)
+
+        copied = sharding.move_manager(self.manager.pk, self.first, batch_size=2)
+
+        self.assertGreater(copied, 0)
+        self.assertEqual(sharding.shard_for_manager(self.manager.pk), self.first)
+        self.assertFalse(Project.all_objects.using(self.second).exists())
+        self.assertFalse(Note.objects.using(self.second).exists())
+        moved = Project.objects.using(self.first).get(pk=project.pk)
+        self.assertEqual(list(moved.tasks.values_list('id', flat=True)), [task.id])
+        self.assertEqual(moved.team.get(), self.member)
+        res = self.client.get(detail_url(project.id))
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_clone_across_shards(self):
+        """Test a member clones a project of another shard into their own."""
+        source = create_project(self.manager)
+        source.team.add(self.member)
+        source.tasks.get().note_task.create(created_by=self.member, content='Note')
+        self.client.force_authenticate(self.member)
+
+        res = self.client.post(
+            reverse('project:project-clone', args=[source.id]), {'include_notes': True}, format='json',
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data['copied'], {'tasks': 1, 'dependencies': 0, 'team': 1, 'notes': 1})
+        clone = Project.objects.using(self.first).get(pk=res.data['id'])
+        task = clone.tasks.get()
+        self.assertEqual(task.cloned_from_id, source.tasks.get().id)
+        self.assertEqual(Note.objects.using(self.first).get().task_id, task.id)
+
+    def test_writes_refused_while_moving(self):
+        """Test a manager being moved cannot write through the API."""
+        sharding.assign(self.manager.pk, self.second, moving=True)
+        self.client.force_authenticate(self.manager)
+
+        res = self.client.post(PROJECT_URL, {'title': 'P', 'client_name': 'C', 'description': 'D'})
+
+        self.assertEqual(res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+
+    def test_writes_check_the_stored_placement(self):
+        """Test a move another process started refuses writes despite a stale cached placement."""
+        self.client.force_authenticate(self.manager)
+        self.client.get(PROJECT_URL)
+        ShardAssignment.objects.filter(manager_id=self.manager.pk).update(moving=True)
+
+        read = self.client.get(PROJECT_URL)
+        res = self.client.post(PROJECT_URL, {'title': 'P', 'client_name': 'C', 'description': 'D'})
+
+        self.assertEqual(read.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+
+    def test_writes_to_a_shard_being_moved_off_refused(self):
+        """Test team members cannot write to the projects of a manager being moved."""
+        project = create_project(self.manager)
+        project.team.add(self.member)
+        sharding.assign(self.manager.pk, self.second, moving=True)
+        self.client.force_authenticate(self.member)
+
+        res = self.client.patch(detail_url(project.id), {'title': 'New'})
+
+        self.assertEqual(res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(Project.objects.using(self.second).get(pk=project.pk).title, 'Sample project title')
+
+    def test_placement_cache_expires(self):
+        """Test reads pick up a move another process made once the cached placement expires."""
+        self.assertEqual(sharding.shard_for_manager(self.manager.pk), self.second)
+        ShardAssignment.objects.filter(manager_id=self.manager.pk).update(shard=self.first)
+
+        with override_settings(SHARD_PLACEMENT_CACHE_TIMEOUT=60):
+            self.assertEqual(sharding.shard_for_manager(self.manager.pk), self.second)
+            with patch('time.time', return_value=time.time() + 61):
+                self.assertEqual(sharding.shard_for_manager(self.manager.pk), self.first)
+
+    def test_purge_on_shard(self):
+        """Test a deleted project is purged from its shard."""
+        project = create_project(self.manager)
+        schedule_project_deletion(project)
+
+        for job in pending_jobs():
+            purge(job, batch_size=10, pause=0)
+
+        self.assertFalse(Project.all_objects.using(self.second).filter(pk=project.pk).exists())
@@ -0,0 +1,57 @@
+"""
+Tests for the startup warm-up and the compact common password validator.
+"""
+from unittest.mock import patch
+
+from django.contrib.auth.password_validation import get_default_password_validators
+from django.core.exceptions import ValidationError
+from django.test import SimpleTestCase
+
+from core import warmup
+from core.validators import CommonPasswordValidator
+
+
+class CommonPasswordValidatorTests(SimpleTestCase):
+    """Test the common password list held as digests."""
+
+    def setUp(self):
+        self.validator = CommonPasswordValidator()
+
+    def test_common_passwords_rejected(self):
+        """Test passwords from Django's list are rejected, whatever their case and padding."""
+        for password in ('password', 'Password123 ', 'qwerty'):
+            with self.assertRaises(ValidationError) as ctx:
+                self.validator.validate(password)
+            self.assertEqual(ctx.exception.code, 'password_too_common')
+
+    def test_uncommon_password_accepted(self):
+        """Test a password missing from the list passes."""
+        self.validator.validate('kestrel-orbit-57-lantern')
+
+    def test_list_held_as_digests(self):
+        """Test the validator keeps an array of digests instead of the passwords."""
+        self.assertFalse(hasattr(self.validator, 'passwords'))
+        self.assertGreater(len(self.validator.digests), 19000)
+        self.assertEqual(list(self.validator.digests), sorted(self.validator.digests))
+
+
+class WarmupTests(SimpleTestCase):
+    """Test the warm-up run when the application loads."""
+
+    def test_warm_up_runs_every_step(self):
+        """Test every step runs and the password validators are built."""
+        get_default_password_validators.cache_clear()
+
+        timings = warmup.warm_up()
+
+        self.assertEqual(list(timings), [name for name, _ in warmup.STEPS])
+        self.assertEqual(get_default_password_validators.cache_info().currsize, 1)
+
+    def test_failing_step_is_skipped(self):
+        """Test a failing step is logged and the others still run."""
+        steps = [('broken', lambda: 1 / 0), ('templates', warmup.warm_templates)]
+
+        with patch.object(warmup, 'STEPS', steps), self.assertLogs('core.warmup', 'ERROR'):
+            timings = warmup.warm_up()
+
+        self.assertEqual(list(timings), ['broken', 'templates'])
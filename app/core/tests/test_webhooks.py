@@ -0,0 +1,233 @@
+"""
+Tests for outbound webhooks.
+"""
+import json
+import socket
+import threading
+import time
+from datetime import timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core import activity
+from core.models import Project, Webhook, WebhookDelivery
+from core.webhooks import SIGNATURE_HEADER, Dispatcher, verify
+
+WEBHOOK_URL = reverse('project:webhook-list')
+
+ADDRESSES = {
+    'example.com': '93.184.216.34',
+    'localhost.example.com': '127.0.0.1',
+    'metadata.example.com': '169.254.169.254',
+    'intranet.example.com': '10.1.2.3',
+}
+real_getaddrinfo = socket.getaddrinfo
+
+
+def fake_getaddrinfo(host, port, *args, **kwargs):
+    """Resolve the example hosts without a DNS server."""
+    if host in ADDRESSES:
+        return real_getaddrinfo(ADDRESSES[host], port, *args, **kwargs)
+    return real_getaddrinfo(host, port, *args, **kwargs)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers['Content-Length']))
+        self.server.received.append((dict(self.headers), body, self.client_address[1]))
+        code = self.server.statuses.pop(0) if self.server.statuses else 200
+        self.send_response(code)
+        if code == 204:
+            # No body and no Content-Length, on a connection kept alive.
+            self.end_headers()
+            return
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'ok')
+
+    def log_message(self, *args):
+        pass
+
+
+class StubServer:
+    """A local HTTP server recording the requests it receives."""
+
+    def __enter__(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+        self.server.received, self.server.statuses = [], []
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        self.url = f'http://127.0.0.1:{self.server.server_port}/hooks?source=test'
+        return self.server
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def unused_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+@override_settings(
+    ACTIVITY_FLUSH_SIZE=100, ACTIVITY_FLUSH_INTERVAL=3600, WEBHOOK_RETRY_BASE=30,
+    WEBHOOK_ALLOW_PRIVATE_ADDRESSES=True,
+)
+class WebhookTests(TestCase):
+    """Test queueing and delivering webhook events."""
+
+    def setUp(self):
+        activity._buffer.clear()
+        patcher = mock.patch('socket.getaddrinfo', side_effect=fake_getaddrinfo)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = get_user_model().objects.create_user(email='user@example.com', password='test123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.stub = StubServer()
+        self.server = self.stub.__enter__()
+        self.addCleanup(self.stub.__exit__)
+        self.dispatcher = Dispatcher(timeout=5)
+        self.addCleanup(self.dispatcher.close)
+        self.webhook = Webhook.objects.create(manager=self.user, url=self.stub.url)
+
+    def tearDown(self):
+        activity._buffer.clear()
+
+    def make_project(self, manager=None, title='Project'):
+        with self.captureOnCommitCallbacks(execute=True):
+            project = Project.objects.create(manager=manager or self.user, title=title, description='D')
+        activity.flush()
+        return project
+
+    def test_create_webhook(self):
+        """Test a manager creates a webhook and gets its signing secret."""
+        payload = {'url': 'https://example.com/hook', 'events': ['task.created', 'note.created']}
+
+        res = self.client.post(WEBHOOK_URL, payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(res.data['secret']), 64)
+        self.assertEqual(Webhook.objects.get(id=res.data['id']).manager, self.user)
+        listed = self.client.get(WEBHOOK_URL)
+        self.assertEqual(len(listed.data), 2)
+
+    def test_invalid_webhooks_rejected(self):
+        """Test unknown events and non HTTP URLs are rejected."""
+        for payload in ({'url': 'https://example.com', 'events': ['task.exploded']}, {'url': 'ftp://example.com'}):
+            res = self.client.post(WEBHOOK_URL, payload, format='json')
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST, payload)
+
+    @override_settings(WEBHOOK_ALLOW_PRIVATE_ADDRESSES=False)
+    def test_non_public_hosts_rejected(self):
+        """Test webhooks cannot point at loopback, link-local, private or unknown hosts."""
+        for url in (
+            'http://127.0.0.1/hook', 'http://[::1]/hook', 'http://localhost.example.com/hook',
+            'http://metadata.example.com/latest/meta-data/', 'https://intranet.example.com/hook',
+            'http://does-not-exist.invalid/hook',
+        ):
+            res = self.client.post(WEBHOOK_URL, {'url': url}, format='json')
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST, url)
+            self.assertIn('url', res.data)
+
+    def test_non_public_host_refused_on_connect(self):
+        """Test the dispatcher checks the address again before connecting."""
+        self.make_project()
+
+        with override_settings(WEBHOOK_ALLOW_PRIVATE_ADDRESSES=False):
+            self.assertEqual(self.dispatcher.run_once(), {WebhookDelivery.Status.PENDING: 1})
+
+        self.assertEqual(self.server.received, [])
+        self.assertIn('non-public address 127.0.0.1', WebhookDelivery.objects.get().last_error)
+
+    @override_settings(ACTIVITY_BUFFER_SIZE=0, ACTIVITY_OVERFLOW='drop')
+    def test_events_dropped_by_the_buffer_are_delivered(self):
+        """Test deliveries are queued on commit, not from the lossy activity buffer."""
+        with self.assertLogs('core.activity', 'WARNING'), self.captureOnCommitCallbacks(execute=True):
+            project = Project.objects.create(manager=self.user, title='Project', description='D')
+
+        self.assertEqual(len(activity._buffer), 0)
+        delivery = WebhookDelivery.objects.get()
+        self.assertEqual([event['object_id'] for event in delivery.events], [project.id])
+
+    def test_flush_queues_one_delivery_per_webhook(self):
+        """Test committed events of a manager's projects are queued once per matching webhook."""
+        tasks_only = Webhook.objects.create(manager=self.user, url=self.stub.url, events=['task.created'])
+        other = get_user_model().objects.create_user(email='other@example.com', password='test123')
+
+        project = self.make_project()
+        self.make_project(manager=other)
+
+        delivery = WebhookDelivery.objects.get()
+        self.assertEqual(delivery.webhook, self.webhook)
+        self.assertEqual(
+            [(event['event'], event['object_id']) for event in delivery.events], [('project.created', project.id)],
+        )
+        self.assertFalse(tasks_only.deliveries.exists())
+
+    def test_dispatch_signs_batches_and_reuses_connections(self):
+        """Test due deliveries of a webhook go out in one signed POST over a kept-alive connection."""
+        self.make_project(title='First')
+        self.make_project(title='Second')
+
+        self.assertEqual(self.dispatcher.run_once(), {WebhookDelivery.Status.DELIVERED: 2})
+
+        (headers, body, port), = self.server.received
+        self.assertTrue(verify(self.webhook.secret, body, headers[SIGNATURE_HEADER]))
+        self.assertFalse(verify('wrong', body, headers[SIGNATURE_HEADER]))
+        payload = json.loads(body)
+        self.assertEqual([event['event'] for event in payload['events']], ['project.created'] * 2)
+        self.assertEqual(payload['webhook'], self.webhook.id)
+        self.assertFalse(WebhookDelivery.objects.exclude(status=WebhookDelivery.Status.DELIVERED).exists())
+
+        self.make_project(title='Third')
+        self.dispatcher.run_once()
+        self.assertEqual(self.server.received[-1][2], port)
+
+    def test_no_content_response_is_not_waited_on(self):
+        """Test a 204 without Content-Length is delivered at once and keeps its connection."""
+        self.make_project(title='First')
+        self.server.statuses = [204]
+        dispatcher = Dispatcher(timeout=1)
+        self.addCleanup(dispatcher.close)
+
+        started = time.monotonic()
+        self.assertEqual(dispatcher.run_once(), {WebhookDelivery.Status.DELIVERED: 1})
+        self.assertLess(time.monotonic() - started, 1)
+
+        self.make_project(title='Second')
+        self.assertEqual(dispatcher.run_once(), {WebhookDelivery.Status.DELIVERED: 1})
+        self.assertEqual(self.server.received[0][2], self.server.received[1][2])
+
+    def test_failures_back_off_then_fail(self):
+        """Test a failed POST is retried later and given up after the last attempt."""
+        self.make_project()
+        self.server.statuses = [500]
+
+        self.assertEqual(self.dispatcher.run_once(), {WebhookDelivery.Status.PENDING: 1})
+
+        delivery = WebhookDelivery.objects.get()
+        self.assertEqual((delivery.attempts, delivery.response_status, delivery.last_error), (1, 500, 'HTTP 500'))
+        self.assertGreater(delivery.next_attempt_at, timezone.now() + timedelta(seconds=10))
+        self.assertEqual(self.dispatcher.run_once(), {})
+
+        WebhookDelivery.objects.update(next_attempt_at=timezone.now())
+        with override_settings(WEBHOOK_MAX_ATTEMPTS=2):
+            self.webhook.url = f'http://127.0.0.1:{unused_port()}/'
+            self.webhook.save()
+            self.assertEqual(self.dispatcher.run_once(), {WebhookDelivery.Status.FAILED: 1})
+        delivery.refresh_from_db()
+        self.assertIsNone(delivery.response_status)
+        self.assertIn('Error', delivery.last_error)
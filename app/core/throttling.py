@@ -0,0 +1,161 @@
+"""
+Sliding window throttles for endpoints that hash passwords.
+
+Logging in and signing up run PBKDF2, which costs tens of milliseconds of
+CPU per attempt, so a burst of attempts can keep every worker busy. These
+throttles run in the view's initial(), before the serializer that hashes, and
+limit attempts per client IP and per email address.
+
+Each limit is a sliding window approximated with two fixed buckets: the
+count of the current bucket plus the previous bucket weighted by how much of
+it still overlaps the window. An attempt is counted before it is checked,
+with an atomic increment, so concurrent attempts each see the ones before
+them; a rejected attempt is then taken back out. Counters live in the
+shared cache. When the cache is unreachable they fall back to a per-process
+counter instead of letting every attempt through.
+
+Client IPs come from DRF's get_ident, which trusts X-Forwarded-For only
+for the NUM_PROXIES proxies set in REST_FRAMEWORK.
+"""
+import abc
+import threading
+import time
+
+from redis.exceptions import RedisError
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.throttling import SimpleRateThrottle
+
+CACHE_ERRORS = (RedisError, OSError)
+
+
+class LocalCounters:
+    """In-process bucket counters used while the shared cache is down."""
+
+    def __init__(self):
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            count, expires = self._counts.get(key, (0, 0))
+            return count if expires > now else 0
+
+    def incr(self, key, timeout):
+        now = time.monotonic()
+        with self._lock:
+            count, expires = self._counts.get(key, (0, 0))
+            if expires <= now:
+                count, expires = 0, now + timeout
+            self._counts[key] = (count + 1, expires)
+            if len(self._counts) > 10000:
+                self._counts = {k: v for k, v in self._counts.items() if v[1] > now}
+            return count + 1
+
+    def decr(self, key):
+        with self._lock:
+            if key in self._counts:
+                count, expires = self._counts[key]
+                self._counts[key] = (max(count - 1, 0), expires)
+
+
+local_counters = LocalCounters()
+
+
+def _cache_incr(key, timeout):
+    """Add one to a cache counter and return its new value."""
+    cache.add(key, 0, timeout)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Expired between add and incr.
+        cache.add(key, 0, timeout)
+        return cache.incr(key)
+
+
+def _cache_decr(key):
+    try:
+        cache.decr(key)
+    except ValueError:
+        pass
+
+
+class SlidingWindowThrottle(SimpleRateThrottle, metaclass=abc.ABCMeta):
+    """Throttle on a sliding window counter; subclasses pick the identity."""
+    cache_format = 'throttle:%(scope)s:%(ident)s'
+
+    def get_rate(self):
+        return settings.AUTH_THROTTLE_RATES.get(self.scope)
+
+    @abc.abstractmethod
+    def get_ident_value(self, request):
+        """Return the identity to count attempts of, or None to let the request through."""
+
+    def get_cache_key(self, request, view):
+        if not settings.AUTH_THROTTLE_ENABLED or request.method != 'POST':
+            return None
+        ident = self.get_ident_value(request)
+        if not ident:
+            return None
+        return self.cache_format % {'scope': self.scope, 'ident': ident}
+
+    def _count(self, current, previous):
+        """Count an attempt in the current bucket; return (count with it, previous count, decr)."""
+        try:
+            return _cache_incr(current, self.duration * 2), cache.get(previous, 0), _cache_decr
+        except CACHE_ERRORS:
+            return local_counters.incr(current, self.duration * 2), local_counters.get(previous), local_counters.decr
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+        key = self.get_cache_key(request, view)
+        if key is None:
+            return True
+        now = self.timer()
+        bucket, elapsed = divmod(now, self.duration)
+        current, previous = f'{key}:{int(bucket)}', f'{key}:{int(bucket) - 1}'
+        counted, previous_count, decr = self._count(current, previous)
+        current_count = counted - 1
+        overlap = 1 - elapsed / self.duration
+        if current_count + previous_count * overlap >= self.num_requests:
+            try:
+                decr(current)
+            except CACHE_ERRORS:
+                pass
+            self.retry_after = self._retry_after(current_count, previous_count, overlap, elapsed)
+            return False
+        return True
+
+    def _retry_after(self, current_count, previous_count, overlap, elapsed):
+        if current_count >= self.num_requests:
+            return self.duration - elapsed
+        # Time for the previous bucket's weight to drop enough to fit one more request.
+        return (overlap - (self.num_requests - current_count) / previous_count) * self.duration
+
+    def wait(self):
+        return max(self.retry_after, 1)
+
+
+class PasswordIPThrottle(SlidingWindowThrottle):
+    """Limit password attempts per client IP."""
+    scope = 'password_ip'
+
+    def get_ident_value(self, request):
+        return self.get_ident(request)
+
+
+class PasswordEmailThrottle(SlidingWindowThrottle):
+    """Limit password attempts per email address, whatever IP they come from."""
+    scope = 'password_email'
+
+    def get_ident_value(self, request):
+        email = request.data.get('email') if hasattr(request.data, 'get') else None
+        if not isinstance(email, str):
+            return None
+        return email.strip().lower()
+
+
+PASSWORD_THROTTLES = [PasswordIPThrottle, PasswordEmailThrottle]
@@ -1,12 +1,96 @@
 """
 Core views for app.
 """
-
-from rest_framework.decorators import api_view
+from django.conf import settings
+from django.http import Http404, HttpResponse, HttpResponseNotModified
+from django.shortcuts import render
+from django.urls import reverse
+from django.utils.cache import patch_vary_headers
+from django.views.decorators.http import require_safe
+from rest_framework import status
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.decorators import api_view, authentication_classes, permission_classes
+from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
+from core.batch import not_run, run_batch
+from core.health import readiness
+from core.schema import extend_schema, load_schema
+from core.serializers import BatchSerializer
+
+SCHEMA_CONTENT_TYPE = 'application/vnd.oai.openapi; charset=utf-8'
+
 
 @api_view(['GET'])
+@authentication_classes([])
+@permission_classes([])
 def health_check(request):
-    """Returns successful response."""
+    """Liveness: the process serves requests, without touching the database."""
     return Response({'healthy': True})
+
+
+@api_view(['GET'])
+@authentication_classes([])
+@permission_classes([])
+def readiness_check(request):
+    """Readiness: every database answers quickly enough, checked at most once per interval."""
+    ready, databases = readiness()
+    return Response(
+        {'ready': ready, 'databases': databases},
+        status=status.HTTP_200_OK if ready else status.HTTP_503_SERVICE_UNAVAILABLE,
+    )
+
+
+def _schema_response(request, version, content, compressed, cache_control):
+    etag = f'"{version}"'
+    if request.headers.get('If-None-Match') == etag:
+        response = HttpResponseNotModified()
+    elif 'gzip' in request.headers.get('Accept-Encoding', ''):
+        response = HttpResponse(compressed, content_type=SCHEMA_CONTENT_TYPE)
+        response['Content-Encoding'] = 'gzip'
+    else:
+        response = HttpResponse(content, content_type=SCHEMA_CONTENT_TYPE)
+    response['ETag'] = etag
+    response['Cache-Control'] = cache_control
+    patch_vary_headers(response, ['Accept-Encoding'])
+    return response
+
+
+@require_safe
+def openapi_schema(request):
+    """Serve the schema written by build_schema, revalidated by ETag."""
+    schema = load_schema(settings.SCHEMA_ROOT)
+    if schema is None:
+        raise Http404('Schema not built, run the build_schema command.')
+    return _schema_response(request, *schema, cache_control='public, max-age=300')
+
+
+@require_safe
+def openapi_schema_version(request, version):
+    """Serve one schema version, which never changes once built."""
+    schema = load_schema(settings.SCHEMA_ROOT)
+    if schema is None or schema[0] != version:
+        raise Http404('Unknown schema version.')
+    return _schema_response(request, *schema, cache_control='public, max-age=31536000, immutable')
+
+
+@require_safe
+def api_docs(request):
+    """Serve Swagger UI reading the schema written by build_schema."""
+    return render(request, 'api_docs.html', {'schema_url': reverse('api-schema')})
+
+
+@extend_schema(request=BatchSerializer)
+@api_view(['POST'])
+@authentication_classes([TokenAuthentication])
+@permission_classes([IsAuthenticated])
+def batch(request):
+    """Run several API requests in one round trip."""
+    serializer = BatchSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    responses = run_batch(
+        request,
+        serializer.validated_data['requests'],
+        concurrent=serializer.validated_data['concurrent'],
+    )
+    return Response({'responses': responses, 'not_run': not_run(responses)})
@@ -0,0 +1,101 @@
+"""
+Warm-up of lazily built state before a process serves requests.
+
+Django and DRF build a lot on first use: URL patterns compile their regexes,
+the password validators load the common password list, templates are parsed,
+serializers build their fields from model metadata and translation catalogs
+are read. Whichever request comes first pays for it, after every deploy and
+on every worker. warm_up() builds it all up front. app.wsgi and app.asgi
+call it when WARMUP_ON_STARTUP is set; with gunicorn's preload_app that is
+once in the master, and the forked workers share the result.
+
+A step that fails is logged and skipped: warming up never stops a worker
+from starting.
+"""
+import logging
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.contrib.auth.password_validation import get_default_password_validators
+from django.template.loader import get_template
+from django.urls import URLResolver, get_resolver
+from django.utils import translation
+from rest_framework.serializers import BaseSerializer
+
+logger = logging.getLogger(__name__)
+
+
+def _compile(resolver):
+    for pattern in resolver.url_patterns:
+        # Patterns compile their regex on first access.
+        pattern.pattern.regex
+        if isinstance(pattern, URLResolver):
+            _compile(pattern)
+
+
+def warm_urls():
+    """Compile every URL pattern and build the reverse lookup tables."""
+    resolver = get_resolver()
+    _compile(resolver)
+    resolver.reverse_dict
+    resolver.namespace_dict
+
+
+def warm_password_validators():
+    """Instantiate the password validators, loading the common password list."""
+    get_default_password_validators()
+
+
+def warm_templates():
+    """Parse the templates listed in WARMUP_TEMPLATES."""
+    for name in settings.WARMUP_TEMPLATES:
+        get_template(name)
+
+
+def _subclasses(cls):
+    for subclass in cls.__subclasses__():
+        yield subclass
+        yield from _subclasses(subclass)
+
+
+def warm_serializers():
+    """Build the fields of the serializers defined by the project's own apps."""
+    local = {config.name for config in apps.get_app_configs() if config.path.startswith(str(settings.BASE_DIR))}
+    for serializer_class in set(_subclasses(BaseSerializer)):
+        if serializer_class.__module__.split('.')[0] not in local:
+            continue
+        try:
+            serializer_class().fields
+        except Exception:
+            # Serializers that need a request or arguments to build their fields.
+            continue
+
+
+def warm_translations():
+    """Load the translation catalog of the default language."""
+    with translation.override(settings.LANGUAGE_CODE):
+        translation.gettext('This password is too common.')
+
+
+STEPS = [
+    ('urls', warm_urls),
+    ('password validators', warm_password_validators),
+    ('templates', warm_templates),
+    ('serializers', warm_serializers),
+    ('translations', warm_translations),
+]
+
+
+def warm_up():
+    """Run every step; return {step: seconds}."""
+    timings = {}
+    for name, step in STEPS:
+        start = time.perf_counter()
+        try:
+            step()
+        except Exception:
+            logger.exception('Warm-up step %s failed', name)
+        timings[name] = time.perf_counter() - start
+    logger.info('Warmed up in %.0fms', sum(timings.values()) * 1000)
+    return timings
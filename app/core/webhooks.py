@@ -0,0 +1,343 @@
+"""
+Outbound webhooks for project, task and note events.
+
+Each event queues one WebhookDelivery per subscribed webhook as soon as
+the request that made it commits, from the activity_committed signal, so
+events the activity buffer drops or loses are still delivered and requests
+never wait on a subscriber. The send_webhooks command delivers the queue
+with a Dispatcher:
+
+- Due deliveries are claimed by pushing their next attempt past a lease,
+  so several dispatchers can share the queue.
+- All claimed deliveries of a webhook go out as one signed POST.
+- Webhooks are sent concurrently on an asyncio loop that lives as long as
+  the dispatcher, keeping up to WEBHOOK_POOL_SIZE keep-alive connections
+  per host.
+- A failed POST is retried with exponential backoff and jitter until
+  WEBHOOK_MAX_ATTEMPTS, after which its deliveries are marked failed.
+
+Requests carry X-Webhook-Signature: t=<unix time>,v1=<hex HMAC-SHA256 of
+"<t>.<body>" keyed by the webhook's secret>.
+
+Webhook URLs must resolve to public addresses only, checked when a webhook
+is saved and again on every connection, which then goes to the address that
+was checked, so managers cannot reach loopback, link-local or private
+hosts through the dispatcher. WEBHOOK_ALLOW_PRIVATE_ADDRESSES lifts this
+for development.
+"""
+import asyncio
+import hashlib
+import hmac
+import ipaddress
+import json
+import logging
+import random
+import socket
+import ssl
+import time
+from collections import defaultdict
+from datetime import timedelta
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.db import DatabaseError, transaction
+from django.utils import timezone
+
+from core.models import Activity, Project, Webhook, WebhookDelivery
+from core.sharding import fan_out
+
+logger = logging.getLogger(__name__)
+
+EVENT_TYPES = ('project', 'task', 'note')
+EVENTS = [f'{object_type}.{action}' for object_type in EVENT_TYPES for action in Activity.Action.values]
+SIGNATURE_HEADER = 'X-Webhook-Signature'
+
+
+def event_payload(activity):
+    """Return the JSON payload of one activity row."""
+    return {
+        'event': f'{activity.object_type}.{activity.action}',
+        'object_type': activity.object_type,
+        'object_id': activity.object_id,
+        'project_id': activity.project_id,
+        'actor_id': activity.actor_id,
+        'created_at': activity.created_at.isoformat(),
+    }
+
+
+def queue_deliveries(activities):
+    """Queue the events of activity rows for the webhooks of the projects' managers; return the deliveries."""
+    activities = [
+        activity for activity in activities
+        if activity.object_type in EVENT_TYPES and activity.project_id is not None
+    ]
+    if not activities:
+        return []
+    project_ids = {activity.project_id for activity in activities}
+    # Deleted projects still report their deletion.
+    managers = dict(fan_out(Project.all_objects.filter(id__in=project_ids).values_list('id', 'manager_id')))
+    webhooks = defaultdict(list)
+    for webhook in Webhook.objects.filter(manager_id__in=set(managers.values()), is_active=True):
+        webhooks[webhook.manager_id].append(webhook)
+    events = defaultdict(list)
+    for activity in activities:
+        payload = event_payload(activity)
+        for webhook in webhooks.get(managers.get(activity.project_id), ()):
+            if not webhook.events or payload['event'] in webhook.events:
+                events[webhook.pk].append(payload)
+    return WebhookDelivery.objects.bulk_create([
+        WebhookDelivery(webhook_id=webhook_id, events=payloads) for webhook_id, payloads in events.items()
+    ])
+
+
+def sign(secret, body, timestamp=None):
+    """Return the signature header value of a request body."""
+    timestamp = int(time.time()) if timestamp is None else timestamp
+    digest = hmac.new(secret.encode(), f'{timestamp}.'.encode() + body, hashlib.sha256).hexdigest()
+    return f't={timestamp},v1={digest}'
+
+
+def verify(secret, body, header, tolerance=300):
+    """Return True if a signature header matches the body and is recent; for receivers and tests."""
+    try:
+        parts = dict(part.split('=', 1) for part in header.split(','))
+        timestamp = int(parts['t'])
+    except (KeyError, ValueError):
+        return False
+    if abs(time.time() - timestamp) > tolerance:
+        return False
+    return hmac.compare_digest(sign(secret, body, timestamp), header)
+
+
+def retry_delay(attempts):
+    """Return the delay before the next attempt after a number of failed ones."""
+    delay = min(settings.WEBHOOK_RETRY_BASE * 2 ** (attempts - 1), settings.WEBHOOK_RETRY_MAX)
+    return timedelta(seconds=delay * random.uniform(0.5, 1))
+
+
+class DeliveryError(Exception):
+    """A webhook POST failed before a response was read."""
+
+
+class ForbiddenAddress(DeliveryError):
+    """A webhook host cannot be resolved or resolves to a non-public address."""
+
+
+def is_public(address):
+    address = ipaddress.ip_address(address.split('%', 1)[0])
+    return address.is_global and not address.is_multicast
+
+
+def check_addresses(host, addresses):
+    """Return the addresses of a host, raising ForbiddenAddress if any of them is not public."""
+    if not addresses:
+        raise ForbiddenAddress(f'{host} has no address.')
+    if not settings.WEBHOOK_ALLOW_PRIVATE_ADDRESSES:
+        for address in addresses:
+            if not is_public(address):
+                raise ForbiddenAddress(f'{host} resolves to the non-public address {address}.')
+    return addresses
+
+
+def resolve(host, port):
+    """Return the public addresses of a webhook host; raise ForbiddenAddress otherwise."""
+    try:
+        infos = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    except (OSError, UnicodeError) as exc:
+        raise ForbiddenAddress(f'{host} cannot be resolved.') from exc
+    return check_addresses(host, [info[4][0] for info in infos])
+
+
+class HostPool:
+    """Keep-alive HTTP/1.1 connections to one host, at most size of them in use."""
+
+    def __init__(self, scheme, host, port, size):
+        self.scheme, self.host, self.port = scheme, host, port
+        self.slots = asyncio.Semaphore(size)
+        self.idle = []
+
+    async def _connect(self):
+        infos = await asyncio.get_running_loop().getaddrinfo(self.host, self.port, type=socket.SOCK_STREAM)
+        # Connect to the address that was checked, not to a fresh lookup.
+        address = check_addresses(self.host, [info[4][0] for info in infos])[0]
+        context = ssl.create_default_context() if self.scheme == 'https' else None
+        return await asyncio.open_connection(
+            address, self.port, ssl=context, server_hostname=self.host if context else None,
+        )
+
+    async def _exchange(self, connection, path, headers, body):
+        """Send one request and read its response; return (status, keep_alive)."""
+        reader, writer = connection
+        head = [f'POST {path} HTTP/1.1', f'Host: {self.host}', f'Content-Length: {len(body)}']
+        head += [f'{name}: {value}' for name, value in headers.items()]
+        writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + body)
+        await writer.drain()
+        version, status, response_headers = await self._read_head(reader)
+        while 100 <= status < 200:
+            # Interim responses have no body; the final one follows.
+            version, status, response_headers = await self._read_head(reader)
+        keep_alive = version == 'HTTP/1.1' and response_headers.get('connection') != 'close'
+        if status in (204, 304):
+            pass
+        elif 'content-length' in response_headers:
+            await reader.readexactly(int(response_headers['content-length']))
+        elif response_headers.get('transfer-encoding') == 'chunked':
+            while True:
+                size = int((await reader.readline()).split(b';')[0], 16)
+                await reader.readexactly(size + 2)
+                if size == 0:
+                    break
+        elif not keep_alive:
+            # The body runs to the end of the connection.
+            await reader.read()
+        else:
+            # No framing on a kept-alive connection: the status is all we need,
+            # so drop the connection rather than wait for a body that never ends.
+            keep_alive = False
+        return status, keep_alive
+
+    @staticmethod
+    async def _read_head(reader):
+        """Read a status line and headers; return (version, status, lowercased headers)."""
+        status_line = await reader.readline()
+        if not status_line:
+            raise DeliveryError('connection closed')
+        version, status = status_line.decode('latin-1').split(' ', 2)[:2]
+        response_headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n', b''):
+                break
+            name, _, value = line.decode('latin-1').partition(':')
+            response_headers[name.strip().lower()] = value.strip().lower()
+        return version, int(status), response_headers
+
+    async def post(self, path, headers, body, timeout):
+        """POST a body, reusing an idle connection when there is one; return the status."""
+        async with self.slots:
+            while True:
+                reused = bool(self.idle)
+                connection = self.idle.pop() if reused else await asyncio.wait_for(self._connect(), timeout)
+                try:
+                    status, keep_alive = await asyncio.wait_for(
+                        self._exchange(connection, path, headers, body), timeout,
+                    )
+                except (OSError, asyncio.IncompleteReadError, DeliveryError, ValueError):
+                    connection[1].close()
+                    # The server may have dropped an idle connection: retry on a new one.
+                    if reused:
+                        continue
+                    raise
+                except BaseException:
+                    connection[1].close()
+                    raise
+                if keep_alive:
+                    self.idle.append(connection)
+                else:
+                    connection[1].close()
+                return status
+
+    def close(self):
+        for _, writer in self.idle:
+            writer.close()
+        self.idle.clear()
+
+
+class Dispatcher:
+    """Send due webhook deliveries from an event loop kept between rounds."""
+
+    def __init__(self, pool_size=None, timeout=None):
+        self.pool_size = pool_size or settings.WEBHOOK_POOL_SIZE
+        self.timeout = timeout or settings.WEBHOOK_TIMEOUT
+        self.loop = asyncio.new_event_loop()
+        self.pools = {}
+
+    def pool(self, url):
+        parts = urlsplit(url)
+        port = parts.port or (443 if parts.scheme == 'https' else 80)
+        key = (parts.scheme, parts.hostname, port)
+        if key not in self.pools:
+            self.pools[key] = HostPool(parts.scheme, parts.hostname, port, self.pool_size)
+        return self.pools[key]
+
+    def claim(self, limit):
+        """Lease up to limit due deliveries; return them grouped by webhook."""
+        now = timezone.now()
+        with transaction.atomic():
+            deliveries = list(
+                WebhookDelivery.objects.select_for_update(skip_locked=True)
+                .filter(status=WebhookDelivery.Status.PENDING, next_attempt_at__lte=now)
+                .select_related('webhook').order_by('next_attempt_at', 'id')[:limit]
+            )
+            WebhookDelivery.objects.filter(pk__in=[delivery.pk for delivery in deliveries]).update(
+                next_attempt_at=now + timedelta(seconds=self.timeout * 3),
+            )
+        batches = defaultdict(list)
+        for delivery in deliveries:
+            batches[delivery.webhook].append(delivery)
+        return batches
+
+    async def send(self, webhook, deliveries):
+        """POST the events of a webhook's deliveries in one request; return (status, error)."""
+        parts = urlsplit(webhook.url)
+        body = json.dumps({
+            'webhook': webhook.pk,
+            'deliveries': [delivery.pk for delivery in deliveries],
+            'events': [event for delivery in deliveries for event in delivery.events],
+        }).encode()
+        headers = {
+            'Content-Type': 'application/json',
+            'User-Agent': 'UpTask-Webhooks',
+            SIGNATURE_HEADER: sign(webhook.secret, body),
+        }
+        path = (parts.path or '/') + (f'?{parts.query}' if parts.query else '')
+        try:
+            status = await self.pool(webhook.url).post(path, headers, body, self.timeout)
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, DeliveryError, ValueError) as exc:
+            return None, f'{type(exc).__name__}: {exc}'
+        return status, '' if 200 <= status < 300 else f'HTTP {status}'
+
+    async def send_all(self, batches):
+        return await asyncio.gather(*(self.send(webhook, deliveries) for webhook, deliveries in batches.items()))
+
+    def record(self, deliveries, status, error):
+        """Mark deliveries sent, or schedule their retry."""
+        now = timezone.now()
+        for delivery in deliveries:
+            delivery.response_status = status
+            delivery.last_error = error
+            delivery.attempts += 1
+            if not error:
+                delivery.status = WebhookDelivery.Status.DELIVERED
+                delivery.delivered_at = now
+            elif delivery.attempts >= settings.WEBHOOK_MAX_ATTEMPTS:
+                delivery.status = WebhookDelivery.Status.FAILED
+            else:
+                delivery.next_attempt_at = now + retry_delay(delivery.attempts)
+        WebhookDelivery.objects.bulk_update(
+            deliveries,
+            ['response_status', 'last_error', 'attempts', 'status', 'delivered_at', 'next_attempt_at'],
+        )
+
+    def run_once(self, limit=None):
+        """Send one round of due deliveries; return {status: count}."""
+        batches = self.claim(limit or settings.WEBHOOK_BATCH_SIZE)
+        if not batches:
+            return {}
+        results = self.loop.run_until_complete(self.send_all(batches))
+        counts = defaultdict(int)
+        for deliveries, (status, error) in zip(batches.values(), results):
+            try:
+                self.record(deliveries, status, error)
+            except DatabaseError:
+                logger.exception('Could not record the delivery of %d webhook batches', len(deliveries))
+                continue
+            for delivery in deliveries:
+                counts[delivery.status] += 1
+        return dict(counts)
+
+    def close(self):
+        for pool in self.pools.values():
+            pool.close()
+        self.loop.run_until_complete(asyncio.sleep(0))
+        self.loop.close()
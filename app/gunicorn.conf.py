@@ -0,0 +1,75 @@
+"""
+Gunicorn configuration for serving app.wsgi or app.asgi in production.
+
+The app is imported once in the master (preload_app) and workers are forked
+from it, so imported code is shared copy-on-write. Because of the preload a
+plain HUP would not pick up new code; reload with scripts/reload.sh, which
+starts a new master next to the old one before retiring it. In the container
+gunicorn runs under tini and scripts/run.sh, which follows the current master,
+so the old master is never PID 1.
+"""
+import multiprocessing
+import os
+import shutil
+import sys
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+# Use uvicorn.workers.UvicornWorker to serve app.asgi:application.
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'sync')
+threads = int(os.environ.get('GUNICORN_THREADS', 1))
+
+preload_app = True
+
+# Recycle workers to contain memory growth; the jitter keeps them from all
+# restarting at the same moment.
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 100))
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+
+pidfile = os.environ.get('GUNICORN_PIDFILE', '/tmp/gunicorn.pid')
+worker_tmp_dir = os.environ.get('GUNICORN_WORKER_TMP_DIR', '/dev/shm' if os.path.isdir('/dev/shm') else None)
+accesslog = '-'
+errorlog = '-'
+
+
+# Workers write their metrics to files in this directory and the metrics view
+# merges them. It is emptied when a master starts from scratch, but not by a
+# master started by scripts/reload.sh, whose workers serve alongside the old.
+prometheus_dir = os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', '/tmp/prometheus-metrics')
+if 'GUNICORN_FD' not in os.environ:
+    shutil.rmtree(prometheus_dir, ignore_errors=True)
+os.makedirs(prometheus_dir, exist_ok=True)
+
+
+def on_starting(server):
+    """Refuse to start several workers on a cache local to each of them.
+
+    Access sets, shard placement, throttles and task graphs are invalidated
+    through the default cache, so workers must share it (REDIS_URL).
+    """
+    from django.conf import settings
+
+    if server.cfg.workers > 1 and settings.CACHES['default']['BACKEND'].endswith('.LocMemCache'):
+        server.log.error('%d workers need a shared cache: set REDIS_URL or GUNICORN_WORKERS=1.', server.cfg.workers)
+        sys.exit(1)
+
+
+def child_exit(server, worker):
+    """Drop the live gauges of a worker that exited."""
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
+
+
+def post_fork(server, worker):
+    """Drop database connections inherited from the master and start the activity flusher."""
+    from django.db import connections
+
+    from core.activity import start_flusher
+
+    connections.close_all()
+    start_flusher()
@@ -0,0 +1,101 @@
+"""
+Cached per-user sets of accessible project ids.
+
+A user can access the projects they manage and the projects whose team they
+belong to, which may live on several shards, so the ids are kept per shard.
+The set is invalidated by bumping a per-user version whenever a change
+could affect it, so a set computed while a change was in flight is never
+served afterwards by this process. The version lives in the default cache;
+when that cache is not shared, as with the local memory cache, other
+processes only see the change once their copy expires, so sets are also
+cached for at most PROJECT_ACCESS_CACHE_TIMEOUT seconds.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from core.models import Project
+from core.sharding import shard_for_manager
+
+
+def _version_key(user_id):
+    return f'project-access-version:{user_id}'
+
+
+def _set_key(user_id, version):
+    return f'project-access:{user_id}:{version}'
+
+
+def _current_version(user_id):
+    key = _version_key(user_id)
+    # Seed from the clock so a version lost to eviction never matches an old set.
+    cache.add(key, time.time_ns(), None)
+    return cache.get(key)
+
+
+def compute_project_access(user_id):
+    """Query every shard for the projects a user manages or is a team member of.
+
+    Returns {shard: frozenset of project ids}, leaving out shards without any.
+    Shards have no replicas, so this always reads the primary of each.
+    """
+    access = {}
+    for alias in settings.DATABASE_SHARDS:
+        managed = Project.objects.using(alias).filter(manager_id=user_id).values_list('id', flat=True)
+        member = Project.team.through.objects.using(alias).filter(user_id=user_id).values_list('project_id', flat=True)
+        project_ids = frozenset(managed) | frozenset(member)
+        if project_ids:
+            access[alias] = project_ids
+    return access
+
+
+def project_access(user):
+    """Return the cached {shard: project ids} the user can access."""
+    version = _current_version(user.pk)
+    key = _set_key(user.pk, version)
+    access = cache.get(key)
+    if access is None:
+        access = compute_project_access(user.pk)
+        cache.set(key, access, settings.PROJECT_ACCESS_CACHE_TIMEOUT)
+    return access
+
+
+def accessible_project_ids(user):
+    """Return the cached ids of the projects the user can access."""
+    return frozenset().union(*project_access(user).values())
+
+
+def accessible_shards(user):
+    """Return the user's home shard followed by the other shards of accessible projects."""
+    home = shard_for_manager(user.pk)
+    return [home, *(alias for alias in project_access(user) if alias != home)]
+
+
+def project_shard(user, project_id):
+    """Return the shard of an accessible project, or None."""
+    for alias, project_ids in project_access(user).items():
+        if project_id in project_ids:
+            return alias
+    return None
+
+
+def _bump(user_ids):
+    for user_id in user_ids:
+        key = _version_key(user_id)
+        try:
+            version = cache.incr(key)
+        except ValueError:
+            cache.add(key, time.time_ns(), None)
+        else:
+            cache.delete(_set_key(user_id, version - 1))
+
+
+def invalidate_project_access(user_ids):
+    """Drop the cached sets of the given users now and again after commit."""
+    user_ids = set(user_ids)
+    if not user_ids:
+        return
+    _bump(user_ids)
+    transaction.on_commit(lambda: _bump(user_ids))
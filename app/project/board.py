@@ -0,0 +1,214 @@
+"""
+Kanban boards of project tasks ordered by fractional ranks.
+
+Within a status column tasks are ordered by rank, then id. A rank is a
+string of DIGITS read as a base 36 fraction, so there is always room for
+another rank between two neighbours and moving a card only updates its own
+row. Ranks get a digit longer whenever a card lands between two neighbours
+with no digit left between them; rebalance() spreads a column over short
+ranks again, and the rebalance_ranks command runs it on columns whose ranks
+grew past TASK_RANK_MAX_LENGTH or were never set.
+
+A board is read in one query: ROW_NUMBER() over each status column keeps
+the first rows of every column after its cursor.
+"""
+import re
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Max, Q, Window
+from django.db.models.functions import Length, RowNumber
+
+from core.models import Project, Task
+
+DIGITS = '0123456789abcdefghijklmnopqrstuvwxyz'
+BASE = len(DIGITS)
+RANK_FIELD_LENGTH = Task._meta.get_field('rank').max_length
+CURSOR = re.compile(r'^([0-9a-z]*)\.(\d+)$')
+
+
+def rank_between(before='', after=None):
+    """Return a short rank sorting after before and, unless it is None, before after.
+
+    Raise ValueError when there is no such rank: after is not greater than
+    before, or one of them is not a rank.
+    """
+    if after is not None and not before < after:
+        raise ValueError(f'No rank between {before!r} and {after!r}.')
+    rank = ''
+    appending, bounded = after is None, after is not None
+    for position in range(len(before) + RANK_FIELD_LENGTH):
+        low = DIGITS.index(before[position]) if position < len(before) else 0
+        if not bounded:
+            high = BASE
+        else:
+            high = DIGITS.index(after[position]) if position < len(after) else 0
+        if high - low > 1:
+            # Past the last rank, or past before once after is out of reach,
+            # stepping by one digit keeps ranks short.
+            step = appending or (not bounded and position < len(before))
+            middle = low + 1 if step else (low + high) // 2
+            return rank + DIGITS[middle]
+        rank += DIGITS[low]
+        # Once the prefix is below after, any suffix is.
+        bounded = bounded and high == low
+    raise ValueError(f'No rank between {before!r} and {after!r}.')
+
+
+def spread(count):
+    """Return count increasing ranks spaced evenly over the shortest width that fits them."""
+    width = 1
+    while BASE ** width <= count:
+        width += 1
+    step = BASE ** width // (count + 1)
+    ranks = []
+    for index in range(1, count + 1):
+        value, digits = index * step, []
+        for _ in range(width):
+            value, digit = divmod(value, BASE)
+            digits.append(DIGITS[digit])
+        ranks.append(''.join(reversed(digits)).rstrip('0'))
+    return ranks
+
+
+def append_rank(task, using):
+    """Return a rank placing a new task after its owner's other tasks in its status."""
+    # Tasks are created before they are added to a project; the owner's
+    # column is the narrowest one that is known, and it is indexed.
+    last = Task.objects.using(using).filter(
+        completed_by_id=task.completed_by_id, status=task.status,
+    ).aggregate(last=Max('rank'))['last']
+    try:
+        return rank_between(last or '', None)
+    except ValueError:
+        return ''
+
+
+def encode_cursor(task):
+    return f'{task.rank}.{task.pk}'
+
+
+def decode_cursor(value):
+    """Return the (rank, id) in a cursor; raise ValueError if it is not one."""
+    match = CURSOR.match(value)
+    if match is None:
+        raise ValueError(f'Invalid cursor {value!r}.')
+    return match[1], int(match[2])
+
+
+def column_order():
+    return [F('rank').asc(), F('id').asc()]
+
+
+def board(project, limits, cursors=None):
+    """Return the first tasks of each status column of a project after its cursor.
+
+    limits maps the statuses to show to their number of tasks and cursors
+    maps statuses to the (rank, id) of the last task already read. Each
+    column is a dict with its status, tasks and the cursor of its next page,
+    or None on the last one.
+    """
+    cursors = cursors or {}
+    columns, positions = Q(pk__in=[]), Q(pk__in=[])
+    for status, limit in limits.items():
+        column = Q(status=status)
+        if status in cursors:
+            rank, task_id = cursors[status]
+            column &= Q(rank__gt=rank) | Q(rank=rank, id__gt=task_id)
+        columns |= column
+        # One row more than the limit tells whether there is a next page.
+        positions |= Q(status=status, position__lte=limit + 1)
+    tasks = (
+        Task.objects.using(project._state.db)
+        .filter(project=project).filter(columns)
+        .annotate(position=Window(RowNumber(), partition_by=[F('status')], order_by=column_order()))
+        .filter(positions)
+        .order_by('status', 'position')
+    )
+    rows = {status: [] for status in limits}
+    for task in tasks:
+        rows[task.status].append(task)
+    return [
+        {
+            'status': status,
+            'tasks': rows[status][:limit],
+            'next': encode_cursor(rows[status][limit - 1]) if len(rows[status]) > limit else None,
+        }
+        for status, limit in limits.items()
+    ]
+
+
+def rebalance(project_id, status, using):
+    """Give the tasks of a project's status column evenly spread ranks; return how many changed."""
+    tasks = list(
+        Task.objects.using(using).filter(project=project_id, status=status)
+        .order_by(*column_order()).only('id', 'rank')
+    )
+    changed = []
+    for task, rank in zip(tasks, spread(len(tasks))):
+        if task.rank != rank:
+            task.rank = rank
+            changed.append(task)
+    Task.objects.using(using).bulk_update(changed, ['rank'], batch_size=500)
+    return len(changed)
+
+
+def _neighbour_ranks(column, after):
+    """Return the ranks a card moved below the task with id after, or to the top, goes between."""
+    if after is None:
+        following = column.first()
+        return '', following.rank if following else None
+    previous = column.get(pk=after)
+    following = column.filter(
+        Q(rank__gt=previous.rank) | Q(rank=previous.rank, id__gt=previous.pk)
+    ).first()
+    return previous.rank, following.rank if following else None
+
+
+def move(task, project, status, after=None):
+    """Move a task of a project to a status column, below the task with id after or to the top.
+
+    Only the moved row is updated, unless its neighbours leave no rank
+    between them; the column is then rebalanced first. Raise
+    Task.DoesNotExist when after is not a task of that column.
+    """
+    using = project._state.db
+    with transaction.atomic(using=using):
+        # Moves and rebalances of a project take turns.
+        Project.objects.using(using).select_for_update().get(pk=project.pk)
+        column = (
+            Task.objects.using(using).filter(project=project, status=status)
+            .exclude(pk=task.pk).order_by(*column_order())
+        )
+        try:
+            rank = rank_between(*_neighbour_ranks(column, after))
+        except ValueError:
+            rank = None
+        if rank is None or len(rank) > RANK_FIELD_LENGTH:
+            rebalance(project.pk, status, using)
+            rank = rank_between(*_neighbour_ranks(column, after))
+        task.status = status
+        task.rank = rank
+        task.save(update_fields=['status', 'rank'])
+    return task
+
+
+def columns_to_rebalance(using, max_length=None):
+    """Return the (project id, status) of columns with ranks longer than max_length or unset."""
+    max_length = max_length or settings.TASK_RANK_MAX_LENGTH
+    links = Project.tasks.through.objects.using(using).annotate(rank_length=Length('task__rank'))
+    return list(
+        links.filter(Q(rank_length__gt=max_length) | Q(task__rank=''))
+        .values_list('project_id', 'task__status').distinct().order_by('project_id', 'task__status')
+    )
+
+
+def rebalance_columns(using, max_length=None):
+    """Rebalance every column that needs it on a database; return {(project id, status): changed}."""
+    changed = {}
+    for project_id, status in columns_to_rebalance(using, max_length):
+        with transaction.atomic(using=using):
+            if Project.objects.using(using).select_for_update().filter(pk=project_id).first() is None:
+                continue
+            changed[project_id, status] = rebalance(project_id, status, using)
+    return changed
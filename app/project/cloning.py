@@ -0,0 +1,161 @@
+"""
+Server side cloning of projects and project templates.
+
+A clone copies a project's tasks and the dependencies between them, and optionally its team and the notes of
+its tasks, with INSERT ... SELECT statements in one transaction, so no
+task, note or team row leaves the database. The new project belongs to the
+user cloning it and copied tasks start over as pending. Every copied task
+remembers its source in cloned_from, which is how the following statements
+find the new tasks: clones of the source's tasks that are newer than any
+task before the copy and not linked to a project yet. Clones made by
+concurrent transactions are either invisible or already linked.
+
+When the source lives on another shard than the user cloning it, the rows
+are read from one database and bulk inserted into the other instead.
+"""
+from django.db import connections, transaction
+from django.utils import timezone
+
+from core.models import Note, Project, Task, TaskDependency, TaskStatus, TaskStatusTransition
+from core.sharding import shard_for_manager
+from project.access import invalidate_project_access
+
+TaskLink = Project.tasks.through
+TeamLink = Project.team.through
+
+
+def _tables(connection):
+    """Return the quoted table and column names used by the clone statements."""
+    quote = connection.ops.quote_name
+    names = {
+        'task': Task._meta.db_table,
+        'link': TaskLink._meta.db_table,
+        'team': TeamLink._meta.db_table,
+        'note': Note._meta.db_table,
+        'transition': TaskStatusTransition._meta.db_table,
+        'dependency': TaskDependency._meta.db_table,
+    }
+    return {key: quote(name) for key, name in names.items()}
+
+
+def _copy_in_database(using, source, project, manager, team, notes):
+    """Copy the rows of source into project with INSERT ... SELECT; return the counts."""
+    connection = connections[using]
+    tables = _tables(connection)
+    counts = {}
+    with connection.cursor() as cursor:
+        cursor.execute(f'SELECT COALESCE(MAX(id), 0) FROM {tables["task"]}')
+        floor = cursor.fetchone()[0]
+        cursor.execute(
+            f'INSERT INTO {tables["task"]} (title, description, status, completed_by_id, version, cloned_from_id, rank) '
+            f'SELECT t.title, t.description, %s, %s, 1, t.id, t.rank FROM {tables["task"]} t '
+            f'JOIN {tables["link"]} l ON l.task_id = t.id WHERE l.project_id = %s ORDER BY t.id',
+            [TaskStatus.PENDING, manager.pk, source.pk],
+        )
+        cursor.execute(
+            f'INSERT INTO {tables["link"]} (project_id, task_id) '
+            f'SELECT %s, t.id FROM {tables["task"]} t WHERE t.id > %s '
+            f'AND t.cloned_from_id IN (SELECT task_id FROM {tables["link"]} WHERE project_id = %s) '
+            f'AND NOT EXISTS (SELECT 1 FROM {tables["link"]} o WHERE o.task_id = t.id)',
+            [project.pk, floor, source.pk],
+        )
+        counts['tasks'] = cursor.rowcount
+        cursor.execute(
+            f'INSERT INTO {tables["transition"]} (task_id, completion_id, from_status, to_status, changed_at) '
+            f'SELECT task_id, NULL, NULL, %s, %s FROM {tables["link"]} WHERE project_id = %s',
+            [TaskStatus.PENDING, timezone.now(), project.pk],
+        )
+        cursor.execute(
+            f'INSERT INTO {tables["dependency"]} (project_id, task_id, blocked_by_id, created_at) '
+            f'SELECT %s, t.id, b.id, %s FROM {tables["dependency"]} d '
+            f'JOIN {tables["task"]} t ON t.cloned_from_id = d.task_id '
+            f'JOIN {tables["link"]} lt ON lt.task_id = t.id AND lt.project_id = %s '
+            f'JOIN {tables["task"]} b ON b.cloned_from_id = d.blocked_by_id '
+            f'JOIN {tables["link"]} lb ON lb.task_id = b.id AND lb.project_id = %s '
+            f'WHERE d.project_id = %s ORDER BY d.id',
+            [project.pk, timezone.now(), project.pk, project.pk, source.pk],
+        )
+        counts['dependencies'] = cursor.rowcount
+        if team:
+            cursor.execute(
+                f'INSERT INTO {tables["team"]} (project_id, user_id) '
+                f'SELECT %s, user_id FROM {tables["team"]} WHERE project_id = %s',
+                [project.pk, source.pk],
+            )
+            counts['team'] = cursor.rowcount
+        if notes:
+            cursor.execute(
+                f'INSERT INTO {tables["note"]} (content, task_id, created_by_id) '
+                f'SELECT n.content, t.id, n.created_by_id FROM {tables["note"]} n '
+                f'JOIN {tables["task"]} t ON t.cloned_from_id = n.task_id '
+                f'JOIN {tables["link"]} l ON l.task_id = t.id WHERE l.project_id = %s ORDER BY n.id',
+                [project.pk],
+            )
+            counts['notes'] = cursor.rowcount
+    return counts
+
+
+def _copy_across_databases(using, source, project, manager, team, notes):
+    """Copy the rows of source from its shard into project on another; return the counts."""
+    source_db = source._state.db
+    tasks = Task.objects.using(using).bulk_create([
+        Task(title=title, description=description, completed_by=manager, cloned_from_id=task_id, rank=rank)
+        for task_id, title, description, rank in (
+            Task.objects.using(source_db).filter(project=source).order_by('id')
+            .values_list('id', 'title', 'description', 'rank')
+        )
+    ])
+    new_ids = {task.cloned_from_id: task.pk for task in tasks}
+    TaskLink.objects.using(using).bulk_create([TaskLink(project_id=project.pk, task_id=task.pk) for task in tasks])
+    TaskStatusTransition.objects.using(using).bulk_create([
+        TaskStatusTransition(task_id=task.pk, to_status=TaskStatus.PENDING) for task in tasks
+    ])
+    edges = (
+        TaskDependency.objects.using(source_db).filter(project_id=source.pk)
+        .filter(task_id__in=new_ids, blocked_by_id__in=new_ids).order_by('id')
+        .values_list('task_id', 'blocked_by_id')
+    )
+    counts = {'tasks': len(tasks), 'dependencies': len(TaskDependency.objects.using(using).bulk_create([
+        TaskDependency(project_id=project.pk, task_id=new_ids[task_id], blocked_by_id=new_ids[blocked_by_id])
+        for task_id, blocked_by_id in edges
+    ]))}
+    if team:
+        members = TeamLink.objects.using(source_db).filter(project_id=source.pk).values_list('user_id', flat=True)
+        counts['team'] = len(TeamLink.objects.using(using).bulk_create([
+            TeamLink(project_id=project.pk, user_id=user_id) for user_id in members
+        ]))
+    if notes:
+        rows = (
+            Note.objects.using(source_db).filter(task_id__in=new_ids).order_by('id')
+            .values_list('content', 'task_id', 'created_by_id')
+        )
+        counts['notes'] = len(Note.objects.using(using).bulk_create([
+            Note(content=content, task_id=new_ids[task_id], created_by_id=created_by_id)
+            for content, task_id, created_by_id in rows
+        ]))
+    return counts
+
+
+def clone_project(source, manager, title=None, as_template=False, team=True, notes=False):
+    """Copy a project, its tasks and optionally its team and notes for manager.
+
+    Return the new project and the number of tasks, dependencies, team
+    members and notes copied.
+    """
+    using = shard_for_manager(manager.pk)
+    with transaction.atomic(using=using):
+        project = Project.objects.db_manager(using).create(
+            manager=manager,
+            title=title or source.title,
+            client_name=source.client_name,
+            description=source.description,
+            is_template=as_template,
+            cloned_from_id=source.pk,
+        )
+        copy = _copy_in_database if source._state.db == using else _copy_across_databases
+        counts = copy(using, source, project, manager, team, notes)
+        if team:
+            invalidate_project_access(
+                TeamLink.objects.using(using).filter(project_id=project.pk).values_list('user_id', flat=True)
+            )
+    return project, {'tasks': 0, 'dependencies': 0, 'team': 0, 'notes': 0, **counts}
@@ -0,0 +1,225 @@
+"""
+Notification digests.
+
+Team members hear about tasks assigned to them, task updates and new notes
+in one email per user instead of one per event. Each event turns into
+Notification rows as soon as the request that made it commits, from the
+activity_committed signal, so events the activity buffer drops still notify:
+
+- a new task completion notifies the user it assigns the task to,
+- an updated task or a new note notifies the manager and team of its
+  projects, except whoever made the change.
+
+The send_digests command mails every user whose oldest pending notification
+is older than DIGEST_DELAY, DIGEST_BATCH_SIZE users at a time. Templates
+are compiled once per run, tasks and projects are read once per batch and
+each batch is sent over a single SMTP connection, so mail volume and relay
+round trips grow with the number of users rather than of events.
+
+A batch first claims its pending notifications for DIGEST_CLAIM_TIMEOUT
+seconds, skipping rows another run has locked or claimed, so overlapping
+runs never mail the same notification twice. Notifications of a digest that
+could not be sent are released for the next run.
+"""
+import logging
+import smtplib
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db import transaction
+from django.db.models import Min, Q
+from django.template.loader import get_template
+from django.utils import timezone
+
+from core.metrics import track_email
+from core.models import Activity, Note, Notification, Project, Task, TaskCompletion, TaskStatus
+from core.sharding import fan_out
+
+logger = logging.getLogger(__name__)
+
+KINDS = {
+    ('taskcompletion', Activity.Action.CREATED): Notification.Kind.TASK_ASSIGNED,
+    ('task', Activity.Action.UPDATED): Notification.Kind.TASK_UPDATED,
+    ('note', Activity.Action.CREATED): Notification.Kind.NOTE_ADDED,
+}
+
+
+def _members(project_ids):
+    """Return the manager and team ids of some projects."""
+    members = defaultdict(set)
+    for project_id, manager_id in fan_out(Project.objects.filter(id__in=project_ids).values_list('id', 'manager_id')):
+        members[project_id].add(manager_id)
+    team = Project.team.through.objects.filter(project_id__in=project_ids).values_list('project_id', 'user_id')
+    for project_id, user_id in fan_out(team):
+        members[project_id].add(user_id)
+    return members
+
+
+def _targets(events):
+    """Yield the (activity, kind, task id, recipient ids) of events whose object still exists."""
+    ids = defaultdict(set)
+    for activity, kind in events:
+        ids[kind].add(activity.object_id)
+    completions = {
+        completion_id: (task_id, user_id)
+        for completion_id, task_id, user_id in fan_out(
+            TaskCompletion.objects.filter(id__in=ids[Notification.Kind.TASK_ASSIGNED])
+            .values_list('id', 'task_id', 'user_id')
+        )
+    }
+    notes = dict(fan_out(Note.objects.filter(id__in=ids[Notification.Kind.NOTE_ADDED]).values_list('id', 'task_id')))
+    members = _members({activity.project_id for activity, _ in events if activity.project_id is not None})
+    for activity, kind in events:
+        if kind == Notification.Kind.TASK_ASSIGNED:
+            if activity.object_id in completions:
+                task_id, user_id = completions[activity.object_id]
+                yield activity, kind, task_id, {user_id}
+        elif kind == Notification.Kind.NOTE_ADDED:
+            if activity.object_id in notes:
+                yield activity, kind, notes[activity.object_id], members[activity.project_id]
+        else:
+            yield activity, kind, activity.object_id, members[activity.project_id]
+
+
+def queue_notifications(activities):
+    """Create the notifications of activity rows; return them."""
+    events = [(activity, KINDS[activity.object_type, activity.action])
+              for activity in activities if (activity.object_type, activity.action) in KINDS]
+    if not events:
+        return []
+    notifications = {}
+    for activity, kind, task_id, recipients in _targets(events):
+        for recipient_id in recipients - {activity.actor_id}:
+            notifications.setdefault(
+                (recipient_id, kind, task_id, activity.project_id),
+                Notification(
+                    recipient_id=recipient_id, kind=kind, task_id=task_id, project_id=activity.project_id,
+                    actor_id=activity.actor_id, created_at=activity.created_at,
+                ),
+            )
+    return Notification.objects.bulk_create(notifications.values())
+
+
+def due_recipients(delay=None):
+    """Return the ids of active users whose oldest pending notification is older than delay seconds."""
+    delay = settings.DIGEST_DELAY if delay is None else delay
+    cutoff = timezone.now() - timedelta(seconds=delay)
+    return list(
+        Notification.objects.filter(sent_at__isnull=True, recipient__is_active=True)
+        .values('recipient_id').annotate(oldest=Min('created_at')).filter(oldest__lte=cutoff)
+        .order_by('recipient_id').values_list('recipient_id', flat=True)
+    )
+
+
+def digest_context(user, notifications, tasks, projects):
+    """Return the template context of a user's digest, grouped by project and task."""
+    grouped = {}
+    for notification in notifications:
+        project = grouped.setdefault(notification.project_id, {
+            'title': projects.get(notification.project_id, 'Other tasks'),
+            'tasks': {},
+        })
+        title, status = tasks.get(notification.task_id, ('Deleted task', None))
+        task = project['tasks'].setdefault(notification.task_id, {
+            'title': title,
+            'status': TaskStatus(status).label if status else 'deleted',
+            'events': Counter(),
+        })
+        task['events'][notification.get_kind_display()] += 1
+    count = len(notifications)
+    return {
+        'name': user.name,
+        'subject': f"{count} update{'s' if count > 1 else ''} on your projects",
+        'projects': [
+            {
+                'title': project['title'],
+                'tasks': [{**task, 'events': list(task['events'].items())} for task in project['tasks'].values()],
+            }
+            for project in grouped.values()
+        ],
+    }
+
+
+class DigestSender:
+    """Render and send digests, compiling the templates once."""
+
+    def __init__(self):
+        self.html = get_template('emails/digest_email.html')
+        self.text = get_template('emails/digest_email.txt')
+
+    def message(self, user, notifications, tasks, projects):
+        """Return the digest email of a user."""
+        context = digest_context(user, notifications, tasks, projects)
+        message = EmailMultiAlternatives(
+            subject=context['subject'],
+            body=self.text.render(context),
+            from_email=settings.DIGEST_FROM_EMAIL,
+            to=[user.email],
+        )
+        message.attach_alternative(self.html.render(context), 'text/html')
+        return message
+
+    def claim(self, user_ids):
+        """Claim the pending notifications of some users that no other run holds; return them."""
+        now = timezone.now()
+        with transaction.atomic():
+            notifications = list(
+                Notification.objects.select_for_update(skip_locked=True)
+                .filter(Q(claimed_until__isnull=True) | Q(claimed_until__lte=now),
+                        recipient_id__in=user_ids, sent_at__isnull=True)
+                .order_by('id')
+            )
+            Notification.objects.filter(pk__in=[notification.pk for notification in notifications]).update(
+                claimed_until=now + timedelta(seconds=settings.DIGEST_CLAIM_TIMEOUT),
+            )
+        return notifications
+
+    def send_batch(self, user_ids):
+        """Send the digests of some users over one connection; return (users mailed, notifications sent)."""
+        users = get_user_model().objects.in_bulk(user_ids)
+        pending = defaultdict(list)
+        for notification in self.claim(user_ids):
+            pending[notification.recipient_id].append(notification)
+        task_ids = {notification.task_id for notifications in pending.values() for notification in notifications}
+        project_ids = {notification.project_id for notifications in pending.values() for notification in notifications}
+        tasks = {
+            task_id: (title, status)
+            for task_id, title, status in fan_out(Task.objects.filter(id__in=task_ids).values_list('id', 'title', 'status'))
+        }
+        projects = dict(fan_out(Project.objects.filter(id__in=project_ids).values_list('id', 'title')))
+
+        sent, failed, mailed = [], [], 0
+        try:
+            with get_connection() as connection:
+                for user_id, notifications in pending.items():
+                    message = self.message(users[user_id], notifications, tasks, projects)
+                    message.connection = connection
+                    try:
+                        with track_email():
+                            message.send()
+                    except (smtplib.SMTPException, OSError):
+                        logger.exception('Could not send the digest of user %s', user_id)
+                        failed.extend(notification.pk for notification in notifications)
+                        continue
+                    mailed += 1
+                    sent.extend(notification.pk for notification in notifications)
+        finally:
+            Notification.objects.filter(pk__in=sent).update(sent_at=timezone.now(), claimed_until=None)
+            Notification.objects.filter(pk__in=failed).update(claimed_until=None)
+        return mailed, len(sent)
+
+    def send(self, delay=None, batch_size=None, progress=None):
+        """Send the digests of every due user; return (users mailed, notifications sent)."""
+        batch_size = batch_size or settings.DIGEST_BATCH_SIZE
+        recipients = due_recipients(delay)
+        totals = [0, 0]
+        for start in range(0, len(recipients), batch_size):
+            mailed, sent = self.send_batch(recipients[start:start + batch_size])
+            totals[0] += mailed
+            totals[1] += sent
+            if progress:
+                progress(mailed, sent)
+        return tuple(totals)
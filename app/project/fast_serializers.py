@@ -0,0 +1,145 @@
+"""
+Read-only fast path for serializer output.
+
+A ValuesReader is compiled once per serializer class. It maps every readable
+field to a column of a values_list() query and a converter, so list and
+retrieve responses are built from plain tuples without instantiating models
+or calling each field's to_representation. Only serializers made of simple
+model fields, primary key relations and nested many-to-many serializers can
+be compiled; anything else keeps using the regular serializer.
+"""
+from functools import lru_cache
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.db import models
+from rest_framework import serializers
+
+# Fields whose to_representation returns database values unchanged.
+IDENTITY_FIELDS = (
+    serializers.CharField,
+    serializers.IntegerField,
+    serializers.BooleanField,
+    serializers.ChoiceField,
+    serializers.ReadOnlyField,
+)
+
+COLUMN = 'column'
+RELATION = 'relation'
+
+
+class NotCompilable(Exception):
+    """The serializer uses a field the fast path cannot reproduce."""
+
+
+def _converter(field):
+    """Return None for fields passing values through, else to_representation."""
+    if isinstance(field, IDENTITY_FIELDS) and not isinstance(field, serializers.MultipleChoiceField):
+        return None
+    return field.to_representation
+
+
+def _model_field(model, field):
+    if field.source == '*' or '.' in field.source:
+        raise NotCompilable(f'{field.field_name}: source {field.source!r}')
+    try:
+        return model._meta.get_field(field.source)
+    except FieldDoesNotExist:
+        raise NotCompilable(f'{field.field_name}: not a model field')
+
+
+class ValuesReader:
+    """Build serializer output from values_list() rows."""
+
+    def __init__(self, serializer_class, nested=False):
+        model = serializer_class.Meta.model
+        self.columns = []
+        self.relations = []
+        self.plan = []
+        for name, field in serializer_class().fields.items():
+            if field.write_only:
+                continue
+            if isinstance(field, serializers.ListSerializer):
+                if nested:
+                    raise NotCompilable(f'{name}: nested more than one level')
+                self.plan.append((name, RELATION, len(self.relations), None))
+                self.relations.append(self._compile_relation(model, field))
+                continue
+            model_field = _model_field(model, field)
+            if isinstance(field, serializers.PrimaryKeyRelatedField):
+                if field.pk_field is not None or not model_field.many_to_one:
+                    raise NotCompilable(f'{name}: unsupported relation')
+                converter = None
+            elif isinstance(field, serializers.RelatedField) or model_field.is_relation:
+                raise NotCompilable(f'{name}: unsupported relation')
+            else:
+                converter = _converter(field)
+            self.plan.append((name, COLUMN, len(self.columns), converter))
+            self.columns.append(model_field.attname)
+        pk_column = model._meta.pk.attname
+        if pk_column not in self.columns:
+            self.columns.append(pk_column)
+        self.pk_index = self.columns.index(pk_column)
+
+    def _compile_relation(self, model, field):
+        """Compile a nested many=True serializer over a forward many-to-many field."""
+        model_field = _model_field(model, field)
+        if not isinstance(model_field, models.ManyToManyField):
+            raise NotCompilable(f'{field.field_name}: not a many-to-many field')
+        child = ValuesReader(type(field.child), nested=True)
+        target = model_field.m2m_reverse_field_name()
+        return (
+            child,
+            model_field.remote_field.through,
+            model_field.m2m_column_name(),
+            model_field.m2m_reverse_name(),
+            [f'{target}__{column}' for column in child.columns],
+        )
+
+    def build(self, row, nested=()):
+        """Build the output of one row."""
+        item = {}
+        for name, kind, position, converter in self.plan:
+            if kind == RELATION:
+                item[name] = nested[position].get(row[self.pk_index], [])
+                continue
+            value = row[position]
+            if value is not None and converter is not None:
+                value = converter(value)
+            item[name] = value
+        return item
+
+    def _fetch_relation(self, relation, owner_ids):
+        """Return {owner id: [child dicts]} for one nested relation."""
+        child, through, owner, target, columns = relation
+        children = {}
+        rows = through.objects.filter(
+            **{f'{owner}__in': owner_ids}
+        ).order_by(owner, target).values_list(owner, *columns)
+        for owner_id, *values in rows:
+            children.setdefault(owner_id, []).append(child.build(values))
+        return children
+
+    def read(self, queryset):
+        """Evaluate a queryset and return output equal to the serializer's."""
+        rows = list(queryset.prefetch_related(None).values_list(*self.columns))
+        if not self.relations or not rows:
+            return [self.build(row) for row in rows]
+        owner_ids = [row[self.pk_index] for row in rows]
+        nested = [self._fetch_relation(relation, owner_ids) for relation in self.relations]
+        return [self.build(row, nested) for row in rows]
+
+
+@lru_cache(maxsize=None)
+def _compile(serializer_class):
+    try:
+        return ValuesReader(serializer_class)
+    except NotCompilable:
+        return None
+
+
+def get_reader(serializer_class):
+    """Return the compiled reader of a serializer class, or None to fall back."""
+    if not settings.FAST_READ_SERIALIZERS:
+        return None
+    return _compile(serializer_class)
@@ -0,0 +1,150 @@
+"""
+Dependency graphs of project tasks.
+
+A task blocked by another cannot start before that one is completed. The
+edges of a project are loaded in one query and the tasks are put in
+dependency order with Kahn's algorithm. The critical path is the longest
+chain of tasks still to do, found by relaxing the edges once in that order,
+so the whole analysis is linear in tasks plus dependencies.
+
+Results are cached per project and invalidated by bumping a per-project
+version when its dependencies, its tasks or their statuses change, like the
+project access sets, and like them they also expire after
+TASK_GRAPH_CACHE_TIMEOUT seconds for processes that do not share the cache.
+"""
+import time
+from collections import defaultdict, deque
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from core.models import Project, Task, TaskDependency, TaskStatus
+
+
+def _version_key(project_id):
+    return f'task-graph-version:{project_id}'
+
+
+def _graph_key(project_id, version):
+    return f'task-graph:{project_id}:{version}'
+
+
+def _current_version(project_id):
+    key = _version_key(project_id)
+    cache.add(key, time.time_ns(), None)
+    return cache.get(key)
+
+
+def creates_cycle(edges, task_id, blocked_by_id):
+    """Return True if making task_id wait for blocked_by_id closes a cycle of (blocked_by, task) edges."""
+    if task_id == blocked_by_id:
+        return True
+    successors = defaultdict(list)
+    for before, after in edges:
+        successors[before].append(after)
+    # The new edge closes a cycle if blocked_by already waits, directly or not, for task.
+    seen, stack = {task_id}, [task_id]
+    while stack:
+        for after in successors[stack.pop()]:
+            if after == blocked_by_id:
+                return True
+            if after not in seen:
+                seen.add(after)
+                stack.append(after)
+    return False
+
+
+def analyse(statuses, edges):
+    """Order tasks by their dependencies and find the blocked tasks and the critical path.
+
+    statuses maps task ids to their status and edges are (blocked_by, task)
+    pairs. Tasks caught in a cycle, which only rows written around the API
+    can create, are left out of the order and listed apart.
+    """
+    successors = defaultdict(list)
+    waiting = dict.fromkeys(statuses, 0)
+    for before, after in edges:
+        successors[before].append(after)
+        waiting[after] += 1
+    ready = deque(sorted(task for task, count in waiting.items() if count == 0))
+    order = []
+    while ready:
+        task = ready.popleft()
+        order.append(task)
+        for after in successors[task]:
+            waiting[after] -= 1
+            if waiting[after] == 0:
+                ready.append(after)
+
+    remaining = {task: int(statuses[task] != TaskStatus.COMPLETED) for task in order}
+    length, previous = dict(remaining), {}
+    for task in order:
+        for after in successors[task]:
+            if after in length and length[task] + remaining[after] > length[after]:
+                length[after] = length[task] + remaining[after]
+                previous[after] = task
+    critical_path = []
+    task = max(order, key=length.__getitem__, default=None)
+    if task is not None and length[task]:
+        while task is not None:
+            critical_path.append(task)
+            task = previous.get(task)
+        critical_path.reverse()
+
+    blocked = {
+        after for before, after in edges
+        if statuses[before] != TaskStatus.COMPLETED and statuses[after] != TaskStatus.COMPLETED
+    }
+    return {
+        'order': order,
+        'critical_path': critical_path,
+        'blocked': sorted(blocked),
+        'cycle': sorted(task for task in statuses if task not in remaining),
+        'dependencies': sorted(edges),
+    }
+
+
+def load(project):
+    """Return the statuses of a project's tasks and the dependencies between them."""
+    using = project._state.db
+    statuses = dict(Task.objects.using(using).filter(project=project).values_list('id', 'status'))
+    edges = TaskDependency.objects.using(using).filter(project=project).values_list('blocked_by_id', 'task_id')
+    # Dependencies of tasks since removed from the project no longer count.
+    return statuses, [(before, after) for before, after in edges if before in statuses and after in statuses]
+
+
+def project_graph(project):
+    """Return the cached dependency analysis of a project's tasks."""
+    key = _graph_key(project.pk, _current_version(project.pk))
+    graph = cache.get(key)
+    if graph is None:
+        graph = analyse(*load(project))
+        cache.set(key, graph, settings.TASK_GRAPH_CACHE_TIMEOUT)
+    return graph
+
+
+def _bump(project_ids):
+    for project_id in project_ids:
+        key = _version_key(project_id)
+        try:
+            version = cache.incr(key)
+        except ValueError:
+            cache.add(key, time.time_ns(), None)
+        else:
+            cache.delete(_graph_key(project_id, version - 1))
+
+
+def invalidate_graphs(project_ids):
+    """Drop the cached graphs of the given projects now and again after commit."""
+    project_ids = set(project_ids)
+    if not project_ids:
+        return
+    _bump(project_ids)
+    transaction.on_commit(lambda: _bump(project_ids))
+
+
+def invalidate_task_graphs(task_ids, using):
+    """Drop the cached graphs of the projects some tasks belong to."""
+    links = Project.tasks.through.objects.using(using).filter(task_id__in=task_ids)
+    invalidate_graphs(links.values_list('project_id', flat=True))
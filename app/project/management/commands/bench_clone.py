@@ -0,0 +1,48 @@
+"""
+Django command comparing server side cloning with re-posting a downloaded project.
+"""
+from types import SimpleNamespace
+
+from django.core.management.base import BaseCommand
+
+from core.benchmarks import rolled_back, seed_projects, seed_users, timed
+from core.models import Note, Project, Task
+from project.cloning import clone_project
+from project.serializers import ProjectDetailSerializer, ProjectSerializer
+
+
+class Command(BaseCommand):
+    """ Django command to benchmark project cloning """
+
+    help = 'Seed a project in a rolled back transaction and time cloning it in SQL and through the serializers.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tasks', type=int, nargs='+', default=[100, 1000, 5000])
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def repost(self, source, manager):
+        """Download the project and create it again, as a client would."""
+        data = ProjectDetailSerializer(source).data
+        serializer = ProjectSerializer(data=data, context={'request': SimpleNamespace(user=manager)})
+        serializer.is_valid(raise_exception=True)
+        serializer.save(manager=manager)
+
+    def handle(self, *args, **options):
+        """ Entrypoint for command """
+        with rolled_back():
+            manager, = seed_users(1, prefix='bench-clone')
+            for size in options['tasks']:
+                (source,), tasks = seed_projects(manager, 1, tasks_per_project=size)
+                Note.objects.bulk_create(
+                    [Note(task=task, created_by=manager, content=f'Note {task.id}') for task in tasks],
+                    batch_size=1000,
+                )
+                # Re-posting first: its get_or_create would match the tasks copied by clones.
+                client, _ = timed(lambda: self.repost(source, manager), options['repeat'])
+                server, _ = timed(lambda: clone_project(source, manager, notes=True), options['repeat'])
+                self.stdout.write(
+                    f'{size:>6} tasks: INSERT ... SELECT {server:9.1f}ms  '
+                    f'download and re-post {client:9.1f}ms  speedup {client / server:6.1f}x'
+                )
+                Task.objects.filter(completed_by=manager).delete()
+                Project.objects.filter(manager=manager).delete()
@@ -0,0 +1,97 @@
+"""
+    Django command comparing optimistic updates with select_for_update under contention
+"""
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connection, transaction
+from django.db.utils import OperationalError
+
+from core.benchmarks import seed_projects, seed_users
+from core.models import Project, StaleVersionError
+
+
+def optimistic_update(project_id, n):
+    """Read, change and save a project, retrying on version conflicts; return the retries."""
+    retries = 0
+    while True:
+        project = Project.objects.get(pk=project_id)
+        project.description = f'Edit {n}'
+        try:
+            with transaction.atomic():
+                project.save(update_fields=['description'])
+            return retries
+        except StaleVersionError:
+            retries += 1
+
+
+def locked_update(project_id, n):
+    """Change a project while holding its row lock; never retries."""
+    with transaction.atomic():
+        project = Project.objects.select_for_update().get(pk=project_id)
+        project.description = f'Edit {n}'
+        project.save(update_fields=['description'])
+    return 0
+
+
+STRATEGIES = {'optimistic': optimistic_update, 'select_for_update': locked_update}
+
+
+def run(update, project_ids, threads, duration):
+    """Update the projects from several threads; return (updates, retries, errors)."""
+    deadline = time.monotonic() + duration
+    totals = [[0, 0, 0] for _ in range(threads)]
+
+    def worker(index):
+        counts = totals[index]
+        try:
+            while time.monotonic() < deadline:
+                try:
+                    counts[1] += update(project_ids[(index + counts[0]) % len(project_ids)], counts[0])
+                    counts[0] += 1
+                except OperationalError:
+                    counts[2] += 1
+        finally:
+            close_old_connections()
+            connection.close()
+
+    workers = [threading.Thread(target=worker, args=(index,)) for index in range(threads)]
+    for thread in workers:
+        thread.start()
+    for thread in workers:
+        thread.join()
+    return [sum(column) for column in zip(*totals)]
+
+
+class Command(BaseCommand):
+    """ Django command to benchmark concurrent project updates """
+
+    help = 'Update a few hot projects from many threads with version checks and with row locks.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--threads', type=int, nargs='+', default=[1, 4, 16])
+        parser.add_argument('--projects', type=int, default=1,
+                            help='Projects the threads share; fewer means more contention.')
+        parser.add_argument('--duration', type=float, default=5)
+
+    def handle(self, *args, **options):
+        """ Entrypoint for command """
+        if connection.vendor != 'postgresql':
+            self.stdout.write(self.style.WARNING(
+                f'{connection.vendor} has no row locks; numbers are only meaningful on PostgreSQL.'
+            ))
+        manager, = seed_users(1, prefix='bench-concurrency')
+        try:
+            projects, _ = seed_projects(manager, options['projects'])
+            project_ids = [project.pk for project in projects]
+            for threads in options['threads']:
+                for name, update in STRATEGIES.items():
+                    updates, retries, errors = run(update, project_ids, threads, options['duration'])
+                    self.stdout.write(
+                        f'{threads:>3} threads {name:>17}: {updates / options["duration"]:8.1f} updates/s  '
+                        f'{retries:6} retries  {errors:4} errors'
+                    )
+        finally:
+            Project.all_objects.filter(manager=manager).delete()
+            manager.delete()
@@ -0,0 +1,60 @@
+"""
+Django command comparing JOIN + DISTINCT and EXISTS project filtering.
+"""
+from django.core.management.base import BaseCommand
+from django.db.models import Exists, OuterRef
+
+from core.benchmarks import explain, rolled_back, seed_projects, seed_users, timed
+from core.models import Project
+
+
+def join_filter(manager, task_ids, team_ids):
+    """Project filtering as it was done with M2M joins."""
+    return Project.objects.filter(
+        tasks__id__in=task_ids,
+        team__id__in=team_ids,
+        manager=manager,
+    ).order_by('-id').distinct()
+
+
+def exists_filter(manager, task_ids, team_ids):
+    """Project filtering with correlated EXISTS subqueries."""
+    tasks = Project.tasks.through.objects.filter(project_id=OuterRef('pk'), task_id__in=task_ids)
+    team = Project.team.through.objects.filter(project_id=OuterRef('pk'), user_id__in=team_ids)
+    return Project.objects.filter(
+        Exists(tasks),
+        Exists(team),
+        manager=manager,
+    ).order_by('-id')
+
+
+class Command(BaseCommand):
+    """ Django command to benchmark project filters """
+
+    help = 'Seed data in a rolled back transaction and compare project filter plans.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--projects', type=int, default=5000)
+        parser.add_argument('--tasks-per-project', type=int, default=10)
+        parser.add_argument('--team-size', type=int, default=5)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        """ Entrypoint for command """
+        with rolled_back():
+            manager, *team = seed_users(options['team_size'] + 1, prefix='bench-filters')
+            projects, tasks = seed_projects(
+                manager,
+                options['projects'],
+                tasks_per_project=options['tasks_per_project'],
+                team=team,
+            )
+            task_ids = [task.id for task in tasks[::max(1, len(tasks) // 200)]]
+            team_ids = [member.id for member in team]
+
+            for name, build in (('join + distinct', join_filter), ('exists', exists_filter)):
+                queryset = build(manager, task_ids, team_ids)
+                median, best = timed(lambda: list(queryset.all()), options['repeat'])
+                self.stdout.write(self.style.MIGRATE_HEADING(name))
+                self.stdout.write(f'rows={queryset.count()} median={median:.2f}ms best={best:.2f}ms')
+                self.stdout.write(explain(queryset))
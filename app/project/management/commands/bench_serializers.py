@@ -0,0 +1,45 @@
+"""
+Django command comparing the project serializers with the values() fast path.
+"""
+from django.core.management.base import BaseCommand
+from django.db.models import Prefetch
+
+from core.benchmarks import rolled_back, seed_projects, seed_users, timed
+from core.models import Project, Task
+from project.fast_serializers import ValuesReader
+from project.serializers import ProjectSerializer
+
+
+class Command(BaseCommand):
+    """ Django command to benchmark list serialization """
+
+    help = 'Seed data in a rolled back transaction and time project list serialization.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 10000])
+        parser.add_argument('--tasks-per-project', type=int, default=3)
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        """ Entrypoint for command """
+        reader = ValuesReader(ProjectSerializer)
+        with rolled_back():
+            manager, = seed_users(1, prefix='bench-serializers')
+            seed_projects(manager, max(options['sizes']), options['tasks_per_project'])
+            all_ids = list(
+                Project.objects.filter(manager=manager).order_by('-id').values_list('id', flat=True)
+            )
+            for size in options['sizes']:
+                queryset = Project.objects.filter(id__in=all_ids[:size]).order_by('-id')
+                full = queryset.prefetch_related(
+                    Prefetch('tasks', queryset=Task.objects.order_by('id'))
+                )
+                if ProjectSerializer(full, many=True).data != reader.read(queryset):
+                    raise AssertionError('fast path output differs from the serializer')
+
+                slow, _ = timed(lambda: ProjectSerializer(full.all(), many=True).data, options['repeat'])
+                fast, _ = timed(lambda: reader.read(queryset.all()), options['repeat'])
+                self.stdout.write(
+                    f'{size:>6} rows: serializer {slow:9.2f}ms  values {fast:9.2f}ms  '
+                    f'speedup {slow / fast:5.1f}x'
+                )
@@ -0,0 +1,98 @@
+"""
+Django command comparing the NumPy cycle time analytics with a per-row loop.
+"""
+from datetime import datetime, timezone
+
+import numpy as np
+from django.core.management.base import BaseCommand
+
+from core.benchmarks import rolled_back, seed_projects, seed_users, timed
+from core.models import TaskStatusTransition
+from project.analytics import COMPLETED, STATUSES, cycle_time_stats, percentiles, project_stats
+
+
+def synthetic_transitions(count, seed=0):
+    """Return sorted transition arrays for about count / 5 tasks."""
+    rng = np.random.default_rng(seed)
+    tasks = np.sort(rng.integers(0, max(count // 5, 1), count))
+    statuses = rng.integers(0, len(STATUSES), count).astype(np.int8)
+    times = np.cumsum(rng.exponential(3600, count))
+    return tasks, statuses, times
+
+
+def loop_stats(tasks, statuses, times):
+    """Reference implementation walking the transitions one row at a time."""
+    in_state = {code: [] for code in range(len(STATUSES))}
+    started, completed = {}, {}
+    previous = None
+    for task, status, changed_at in zip(tasks.tolist(), statuses.tolist(), times.tolist()):
+        if previous is not None and previous[0] == task:
+            in_state[previous[1]].append(changed_at - previous[2])
+        started.setdefault(task, changed_at)
+        if status == COMPLETED:
+            completed.setdefault(task, changed_at)
+        previous = (task, status, changed_at)
+    lead_times = [changed_at - started[task] for task, changed_at in completed.items()]
+    return {
+        'tasks': len(started),
+        'completed': len(completed),
+        'lead_time': percentiles(np.array(lead_times)),
+        'time_in_state': {
+            status: percentiles(np.array(in_state[code]))
+            for code, status in enumerate(STATUSES)
+            if code != COMPLETED
+        },
+    }
+
+
+class Command(BaseCommand):
+    """ Django command to benchmark the transition analytics """
+
+    help = 'Time cycle time analytics over synthetic transitions and over seeded database rows.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[100_000, 1_000_000, 5_000_000])
+        parser.add_argument('--loop-limit', type=int, default=1_000_000,
+                            help='Skip the per-row loop above this many transitions.')
+        parser.add_argument('--db-rows', type=int, default=100_000,
+                            help='Transitions to seed for the end to end timing (0 to skip).')
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        """ Entrypoint for command """
+        for size in options['sizes']:
+            arrays = synthetic_transitions(size)
+            vectorized, _ = timed(lambda: cycle_time_stats(*arrays), options['repeat'])
+            line = f'{size:>9} transitions: numpy {vectorized:9.1f}ms'
+            if size <= options['loop_limit']:
+                if loop_stats(*arrays) != cycle_time_stats(*arrays):
+                    raise AssertionError('numpy analytics differ from the per-row loop')
+                loop, _ = timed(lambda: loop_stats(*arrays), options['repeat'])
+                line += f'  loop {loop:9.1f}ms  speedup {loop / vectorized:5.1f}x'
+            self.stdout.write(line)
+
+        if options['db_rows']:
+            self.bench_database(options['db_rows'], options['repeat'])
+
+    def bench_database(self, rows, repeat):
+        """Time loading seeded transitions from the database plus the analytics."""
+        tasks, statuses, times = synthetic_transitions(rows)
+        with rolled_back():
+            manager, = seed_users(1, prefix='bench-transitions')
+            project_count = max(int(tasks.max()) // 100 + 1, 1)
+            projects, task_rows = seed_projects(manager, project_count, tasks_per_project=100)
+            task_pks = [task.pk for task in task_rows]
+            TaskStatusTransition.objects.bulk_create(
+                (
+                    TaskStatusTransition(
+                        task_id=task_pks[task],
+                        to_status=STATUSES[status],
+                        changed_at=datetime.fromtimestamp(changed_at, timezone.utc),
+                    )
+                    for task, status, changed_at in zip(tasks.tolist(), statuses.tolist(), times.tolist())
+                ),
+                batch_size=5000,
+            )
+            project_ids = [project.pk for project in projects]
+            total, _ = timed(lambda: project_stats(project_ids), repeat)
+            self.stdout.write(f'{rows:>9} rows from the database: load and analyze {total:9.1f}ms')
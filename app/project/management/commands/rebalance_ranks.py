@@ -0,0 +1,41 @@
+"""
+    Django command respreading task ranks that grew too long
+"""
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from project.board import rebalance_columns
+
+
+class Command(BaseCommand):
+    """ Django command to rebalance board columns """
+
+    help = 'Give evenly spread ranks to board columns with ranks longer than TASK_RANK_MAX_LENGTH or unset.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--max-length', type=int, default=None,
+            help='Rebalance columns with ranks longer than this, TASK_RANK_MAX_LENGTH by default.',
+        )
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Keep checking for columns to rebalance.',
+        )
+        parser.add_argument(
+            '--interval', type=float, default=300,
+            help='Seconds between checks with --loop.',
+        )
+
+    def handle(self, *args, **options):
+        """ Entrypoint for command """
+        while True:
+            for alias in settings.DATABASE_SHARDS:
+                changed = rebalance_columns(alias, options['max_length'])
+                for (project_id, status), count in changed.items():
+                    self.stdout.write(f'Project {project_id} {status}: {count} tasks re-ranked')
+                self.stdout.write(self.style.SUCCESS(f'{alias}: rebalanced {len(changed)} columns'))
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,46 @@
+"""
+    Django command sending notification digests
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from project.digests import DigestSender
+
+
+class Command(BaseCommand):
+    """ Django command to send notification digests """
+
+    help = 'Email every user with notifications older than DIGEST_DELAY one digest, a batch per SMTP connection.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--delay', type=int, default=None,
+            help='Seconds the oldest notification of a user waits, DIGEST_DELAY by default.',
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=None,
+            help='Users mailed per SMTP connection, DIGEST_BATCH_SIZE by default.',
+        )
+        parser.add_argument(
+            '--loop', action='store_true',
+            help='Keep sending digests as they become due.',
+        )
+        parser.add_argument(
+            '--interval', type=float, default=60,
+            help='Seconds between rounds with --loop.',
+        )
+
+    def report(self, mailed, sent):
+        """Write the progress of a batch."""
+        self.stdout.write(f'Mailed {mailed} digests with {sent} notifications')
+
+    def handle(self, *args, **options):
+        """ Entrypoint for command """
+        sender = DigestSender()
+        while True:
+            mailed, sent = sender.send(options['delay'], options['batch_size'], progress=self.report)
+            self.stdout.write(self.style.SUCCESS(f'Sent {mailed} digests covering {sent} notifications'))
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -1,10 +1,15 @@
 """
 Serializer modules API
 """
+from urllib.parse import urlsplit
+
+from django.db import transaction
 from django.db.models import Manager
 from rest_framework import serializers
 
-from core.models import Project, Task, TaskCompletion
+from core.models import Activity, Project, Task, TaskCompletion, TaskDependency, TaskStatus, Webhook, WebhookDelivery
+from core.webhooks import EVENTS, ForbiddenAddress, resolve
+from project.graph import creates_cycle
 
 
 class TaskSerializer(serializers.ModelSerializer):
@@ -12,8 +17,8 @@ class TaskSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Task
-        fields = ['id', 'title', 'description', 'status']
-        read_only_fields = ['id']
+        fields = ['id', 'title', 'description', 'status', 'rank', 'version']
+        read_only_fields = ['id', 'rank', 'version']
 
 
 class ProjectSerializer(serializers.ModelSerializer):
@@ -22,14 +27,14 @@ class ProjectSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Project
-        fields = ['id', 'title', 'client_name', 'description', 'manager', 'tasks']
-        read_only_fields = ['id', 'manager']
+        fields = ['id', 'title', 'client_name', 'description', 'manager', 'tasks', 'is_template', 'cloned_from', 'version']
+        read_only_fields = ['id', 'manager', 'cloned_from', 'version']
 
     def get_or_create_tasks(self, tasks, project):
         """Handle getting or creating task as needed."""
         auth_user = self.context['request'].user
         for task_data in tasks:
-            task_obj, created = Task.objects.get_or_create(
+            task_obj, created = Task.objects.db_manager(project._state.db).get_or_create(
                 completed_by=auth_user,
                 **task_data,
             )
@@ -53,14 +58,15 @@ class ProjectSerializer(serializers.ModelSerializer):
         return project
 
     def update(self, instance, validated_data):
-        """Update project ."""
+        """Update project, failing before the tasks change if its version is stale."""
         tasks = validated_data.pop('tasks', None)
-        if tasks is not None:
-            instance.tasks.clear()
-            self.get_or_create_tasks(tasks, instance)
-        for attr, value in validated_data.items():
-            setattr(instance, attr, value)
-        instance.save()
+        with transaction.atomic(using=instance._state.db):
+            for attr, value in validated_data.items():
+                setattr(instance, attr, value)
+            instance.save()
+            if tasks is not None:
+                instance.tasks.clear()
+                self.get_or_create_tasks(tasks, instance)
         return instance
 
 
@@ -71,6 +77,80 @@ class ProjectDetailSerializer(ProjectSerializer):
         fields = ProjectSerializer.Meta.fields + ['description']
 
 
+class ProjectCloneSerializer(serializers.Serializer):
+    """Serializer for the options of a project clone."""
+    title = serializers.CharField(max_length=255, required=False)
+    as_template = serializers.BooleanField(default=False)
+    include_team = serializers.BooleanField(default=True)
+    include_notes = serializers.BooleanField(default=False)
+
+
+class TaskMoveSerializer(serializers.Serializer):
+    """Serializer for moving a task on the board of a project"""
+    project = serializers.PrimaryKeyRelatedField(queryset=Project.objects.all())
+    status = serializers.ChoiceField(choices=TaskStatus.choices, required=False)
+    after = serializers.IntegerField(
+        required=False, allow_null=True, default=None,
+        help_text='Task the card goes below, or null for the top of the column.',
+    )
+
+    def validate_project(self, project):
+        """Only the manager of a project may reorder its board."""
+        if project.manager_id != self.context['request'].user.pk:
+            raise serializers.ValidationError('Project not found.')
+        return project
+
+    def validate(self, attrs):
+        """Validate that the task is on the project's board."""
+        task = self.context['task']
+        links = Project.tasks.through.objects.using(attrs['project']._state.db)
+        if not links.filter(project_id=attrs['project'].pk, task_id=task.pk).exists():
+            raise serializers.ValidationError('The task does not belong to the project.')
+        if attrs['after'] == task.pk:
+            raise serializers.ValidationError({'after': 'A task cannot move below itself.'})
+        attrs.setdefault('status', task.status)
+        return attrs
+
+
+class TaskDependencySerializer(serializers.ModelSerializer):
+    """Serializer for a task blocked by another task of the same project"""
+
+    class Meta:
+        model = TaskDependency
+        fields = ['id', 'project', 'task', 'blocked_by', 'created_at']
+        read_only_fields = ['id', 'created_at']
+
+    def validate_project(self, project):
+        """Only the manager of a project may change its dependencies."""
+        if project.manager_id != self.context['request'].user.pk:
+            raise serializers.ValidationError('Project not found.')
+        return project
+
+    def validate(self, attrs):
+        """Validate that both tasks are distinct tasks of the project."""
+        project, task, blocked_by = attrs['project'], attrs['task'], attrs['blocked_by']
+        if task.pk == blocked_by.pk:
+            raise serializers.ValidationError('A task cannot be blocked by itself.')
+        links = Project.tasks.through.objects.using(project._state.db)
+        if links.filter(project_id=project.pk, task_id__in=[task.pk, blocked_by.pk]).count() != 2:
+            raise serializers.ValidationError('Both tasks must belong to the project.')
+        return attrs
+
+    def create(self, validated_data):
+        """Add a dependency unless it closes a cycle."""
+        project = validated_data['project']
+        using = project._state.db
+        with transaction.atomic(using=using):
+            # Lock the project so concurrent inserts cannot close a cycle together.
+            Project.objects.using(using).select_for_update().get(pk=project.pk)
+            edges = TaskDependency.objects.using(using).filter(project_id=project.pk).values_list(
+                'blocked_by_id', 'task_id',
+            )
+            if creates_cycle(edges, validated_data['task'].pk, validated_data['blocked_by'].pk):
+                raise serializers.ValidationError({'blocked_by': 'This dependency would create a cycle.'})
+            return TaskDependency.objects.db_manager(using).create(**validated_data)
+
+
 class TaskCompletionSerializer(serializers.ModelSerializer):
     """Task completion serializer"""
     task = TaskSerializer(read_only=True)
@@ -91,3 +171,48 @@ class TaskCompletionSerializer(serializers.ModelSerializer):
             setattr(instance, attr, value)
         instance.save()
         return instance
+
+
+class ActivitySerializer(serializers.ModelSerializer):
+    """Activity log entry serializer"""
+
+    class Meta:
+        model = Activity
+        fields = ['id', 'actor_id', 'action', 'object_type', 'object_id', 'project_id', 'created_at']
+        read_only_fields = fields
+
+
+class WebhookSerializer(serializers.ModelSerializer):
+    """Serializer for the webhooks of a manager"""
+    events = serializers.ListField(
+        child=serializers.ChoiceField(choices=EVENTS), required=False, allow_empty=True,
+        help_text='Events to send, all of them when empty.',
+    )
+
+    class Meta:
+        model = Webhook
+        fields = ['id', 'url', 'events', 'secret', 'is_active', 'created_at']
+        read_only_fields = ['id', 'secret', 'created_at']
+
+    def validate_url(self, url):
+        """Only deliver over HTTP and HTTPS, to hosts with public addresses."""
+        if not url.startswith(('http://', 'https://')):
+            raise serializers.ValidationError('Use an http or https URL.')
+        parts = urlsplit(url)
+        try:
+            resolve(parts.hostname, parts.port or (443 if parts.scheme == 'https' else 80))
+        except (ForbiddenAddress, ValueError) as exc:
+            raise serializers.ValidationError(str(exc))
+        return url
+
+
+class WebhookDeliverySerializer(serializers.ModelSerializer):
+    """Serializer for the deliveries of a webhook"""
+
+    class Meta:
+        model = WebhookDelivery
+        fields = [
+            'id', 'status', 'attempts', 'next_attempt_at', 'response_status', 'last_error',
+            'events', 'created_at', 'delivered_at',
+        ]
+        read_only_fields = fields
@@ -0,0 +1,171 @@
+"""
+Signal handlers for the project app.
+"""
+import logging
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from core.activity import record
+from core.models import Activity, Note, Project, Task, TaskCompletion, TaskDependency, TaskStatusTransition
+from core.signals import activity_committed, manager_moved, projects_soft_deleted, task_statuses_changed, users_onboarded
+from core.webhooks import queue_deliveries
+from project.digests import queue_notifications
+from project.access import invalidate_project_access
+from project.board import append_rank
+from project.graph import invalidate_graphs, invalidate_task_graphs
+
+logger = logging.getLogger(__name__)
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def reset_access_for_new_user(sender, instance, created, **kwargs):
+    """Make sure a new user never sees a set cached for a reused id."""
+    if created:
+        invalidate_project_access([instance.pk])
+
+
+@receiver(post_save, sender=Project)
+def project_saved(sender, instance, created, **kwargs):
+    """Invalidate the managers of a new project or one that changed hands."""
+    if created or instance.manager_id != instance._original_manager_id:
+        invalidate_project_access({instance.manager_id, instance._original_manager_id} - {None})
+        instance._original_manager_id = instance.manager_id
+
+
+@receiver(pre_delete, sender=Project)
+def collect_project_members(sender, instance, **kwargs):
+    """Remember who could access a project before its team links are deleted."""
+    instance.access_user_ids = {instance.manager_id, *instance.team.values_list('id', flat=True)}
+
+
+@receiver(post_delete, sender=Project)
+def project_deleted(sender, instance, **kwargs):
+    """Invalidate everyone who could access a deleted project."""
+    invalidate_project_access(getattr(instance, 'access_user_ids', {instance.manager_id}))
+
+
+@receiver(m2m_changed, sender=Project.team.through)
+def team_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """Invalidate the users added to or removed from a project team."""
+    if reverse:
+        # user.team_projects.add(...) and friends: only that user is affected.
+        if action in ('post_add', 'post_remove', 'post_clear'):
+            invalidate_project_access([instance.pk])
+        return
+    if action == 'pre_clear':
+        instance.cleared_team_ids = set(instance.team.values_list('id', flat=True))
+    elif action == 'post_clear':
+        invalidate_project_access(getattr(instance, 'cleared_team_ids', set()))
+    elif action in ('post_add', 'post_remove'):
+        invalidate_project_access(pk_set or ())
+
+
+@receiver(projects_soft_deleted)
+def projects_hidden(sender, project_ids, **kwargs):
+    """Invalidate everyone who could access projects hidden by a soft delete."""
+    if not project_ids:
+        return
+    managers = Project.all_objects.filter(id__in=project_ids).values_list('manager_id', flat=True)
+    members = Project.team.through.objects.filter(project_id__in=project_ids).values_list('user_id', flat=True)
+    invalidate_project_access({*managers, *members})
+
+
+@receiver(manager_moved)
+def manager_moved_shard(sender, manager_id, project_ids, shard, **kwargs):
+    """Invalidate everyone who can access the projects of a manager moved to another shard."""
+    members = Project.team.through.objects.using(shard).filter(project_id__in=project_ids).values_list('user_id', flat=True)
+    invalidate_project_access({manager_id, *members})
+
+
+@receiver(users_onboarded)
+def users_added(sender, user_ids, project, **kwargs):
+    """Invalidate users created in bulk, who may also have joined a team."""
+    invalidate_project_access(user_ids)
+
+
+@receiver(pre_save, sender=Task)
+def rank_new_task(sender, instance, raw=False, using=None, **kwargs):
+    """Put a new task without a rank at the bottom of its column."""
+    if not raw and instance._state.adding and not instance.rank:
+        instance.rank = append_rank(instance, using)
+
+
+@receiver(post_save, sender=Task)
+@receiver(post_save, sender=TaskCompletion)
+def status_changed(sender, instance, created, raw=False, **kwargs):
+    """Append a transition when a task or completion is created or changes status.
+
+    A task changing status also drops the dependency graphs of its projects.
+    """
+    if raw or (not created and instance.status == instance._original_status):
+        return
+    if sender is Task and not created:
+        invalidate_task_graphs([instance.pk], instance._state.db)
+    TaskStatusTransition.objects.db_manager(instance._state.db).create(
+        task_id=instance.pk if sender is Task else instance.task_id,
+        completion=instance if sender is TaskCompletion else None,
+        from_status=None if created else instance._original_status,
+        to_status=instance.status,
+    )
+    instance._original_status = instance.status
+
+
+@receiver(task_statuses_changed)
+def statuses_changed(sender, task_ids, using, **kwargs):
+    """Drop the dependency graphs of tasks whose status changed in bulk."""
+    invalidate_task_graphs(task_ids, using)
+
+
+@receiver(post_save, sender=TaskDependency)
+@receiver(post_delete, sender=TaskDependency)
+def dependency_changed(sender, instance, **kwargs):
+    """Drop the dependency graph of a project whose dependencies changed."""
+    invalidate_graphs([instance.project_id])
+
+
+@receiver(m2m_changed, sender=Project.tasks.through)
+def project_tasks_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    """Drop the dependency graphs of projects gaining or losing tasks."""
+    if reverse and action == 'pre_clear':
+        # task.project_set.clear(): find the projects while the links still exist.
+        invalidate_task_graphs([instance.pk], instance._state.db)
+    elif action in ('post_add', 'post_remove', 'post_clear'):
+        invalidate_graphs((pk_set or ()) if reverse else [instance.pk])
+
+
+@receiver(pre_delete, sender=Task)
+def task_deleted(sender, instance, **kwargs):
+    """Drop the dependency graphs of the projects of a task about to be deleted."""
+    invalidate_task_graphs([instance.pk], instance._state.db)
+
+
+def log_saved(sender, instance, created, raw=False, **kwargs):
+    """Log the creation or update of a project, task, note or task completion."""
+    if raw:
+        return
+    record(Activity.Action.CREATED if created else Activity.Action.UPDATED, instance)
+
+
+for model in (Project, Task, Note, TaskCompletion):
+    post_save.connect(log_saved, sender=model, dispatch_uid=f'activity-{model._meta.model_name}')
+
+
+@receiver(activity_committed)
+def queue_webhooks(sender, activities, **kwargs):
+    """Queue committed events for the managers' webhooks; a failure never fails the request."""
+    try:
+        queue_deliveries(activities)
+    except DatabaseError:
+        logger.exception('Could not queue webhooks for %d activity rows', len(activities))
+
+
+@receiver(activity_committed)
+def queue_digest_notifications(sender, activities, **kwargs):
+    """Queue notifications of committed events for the next digests; a failure never fails the request."""
+    try:
+        queue_notifications(activities)
+    except DatabaseError:
+        logger.exception('Could not queue notifications for %d activity rows', len(activities))
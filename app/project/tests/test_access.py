@@ -0,0 +1,176 @@
+"""
+Tests for cached project access sets.
+"""
+import time
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Project, Task
+from project.access import accessible_project_ids
+
+PROJECT_URL = reverse('project:project-list')
+TASKS_URL = reverse('project:task-list')
+
+
+def detail_url(project_id):
+    """Create and return a project detail URL."""
+    return reverse('project:project-detail', args=[project_id])
+
+
+def create_user(email):
+    """Create and return a new user."""
+    return get_user_model().objects.create_user(email=email, password='test123')
+
+
+def create_project(manager, **params):
+    """Create and return a sample project."""
+    defaults = {
+        'title': 'Sample project title',
+        'description': 'Sample project description',
+        'client_name': 'Client name',
+    }
+    defaults.update(params)
+    return Project.objects.create(manager=manager, **defaults)
+
+
+class AccessSetTests(TestCase):
+    """Test computing and invalidating access sets."""
+
+    def setUp(self):
+        cache.clear()
+        self.manager = create_user('manager@example.com')
+        self.member = create_user('member@example.com')
+        self.project = create_project(self.manager)
+
+    def test_manager_and_team_member_have_access(self):
+        """Test managers and team members can access a project."""
+        self.project.team.add(self.member)
+
+        self.assertEqual(accessible_project_ids(self.manager), {self.project.id})
+        self.assertEqual(accessible_project_ids(self.member), {self.project.id})
+
+    def test_access_set_is_cached(self):
+        """Test a cached access set needs no queries."""
+        accessible_project_ids(self.member)
+
+        with self.assertNumQueries(0):
+            accessible_project_ids(self.member)
+
+    def test_adding_to_team_invalidates(self):
+        """Test adding a member invalidates only that member."""
+        other = create_user('other@example.com')
+        accessible_project_ids(self.member)
+        accessible_project_ids(other)
+
+        self.project.team.add(self.member)
+
+        self.assertEqual(accessible_project_ids(self.member), {self.project.id})
+        with self.assertNumQueries(0):
+            accessible_project_ids(other)
+
+    def test_removing_from_team_invalidates(self):
+        """Test removing a member revokes access."""
+        self.project.team.add(self.member)
+        accessible_project_ids(self.member)
+
+        self.project.team.remove(self.member)
+
+        self.assertEqual(accessible_project_ids(self.member), set())
+
+    def test_clearing_team_invalidates(self):
+        """Test clearing a team revokes access for every member."""
+        self.project.team.add(self.member)
+        accessible_project_ids(self.member)
+
+        self.project.team.clear()
+
+        self.assertEqual(accessible_project_ids(self.member), set())
+
+    def test_reverse_team_change_invalidates(self):
+        """Test joining a team from the user side invalidates."""
+        accessible_project_ids(self.member)
+
+        self.member.team_projects.add(self.project)
+
+        self.assertEqual(accessible_project_ids(self.member), {self.project.id})
+
+    def test_deleting_project_invalidates(self):
+        """Test deleting a project revokes access for its team."""
+        self.project.team.add(self.member)
+        accessible_project_ids(self.member)
+        accessible_project_ids(self.manager)
+
+        self.project.delete()
+
+        self.assertEqual(accessible_project_ids(self.member), set())
+        self.assertEqual(accessible_project_ids(self.manager), set())
+
+    def test_changing_manager_invalidates(self):
+        """Test moving a project to another manager updates both sets."""
+        accessible_project_ids(self.manager)
+        accessible_project_ids(self.member)
+
+        self.project.manager = self.member
+        self.project.save()
+
+        self.assertEqual(accessible_project_ids(self.manager), set())
+        self.assertEqual(accessible_project_ids(self.member), {self.project.id})
+
+    @override_settings(PROJECT_ACCESS_CACHE_TIMEOUT=60)
+    def test_missed_invalidation_expires(self):
+        """Test a set whose invalidation another process never saw expires after the timeout."""
+        self.project.team.add(self.member)
+        accessible_project_ids(self.member)
+
+        # A queryset delete sends no m2m_changed, like a change made elsewhere.
+        Project.team.through.objects.filter(user=self.member).delete()
+
+        self.assertEqual(accessible_project_ids(self.member), {self.project.id})
+        with patch('time.time', return_value=time.time() + 61):
+            self.assertEqual(accessible_project_ids(self.member), set())
+
+
+class TeamMemberApiTests(TestCase):
+    """Test team members through the API."""
+
+    def setUp(self):
+        cache.clear()
+        self.manager = create_user('manager@example.com')
+        self.member = create_user('member@example.com')
+        self.project = create_project(self.manager)
+        self.project.team.add(self.member)
+        self.client = APIClient()
+        self.client.force_authenticate(self.member)
+
+    def test_team_member_lists_project(self):
+        """Test team members see the projects they belong to."""
+        create_project(self.manager, title='Not shared')
+
+        res = self.client.get(PROJECT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([p['id'] for p in res.data], [self.project.id])
+
+    def test_team_member_cannot_delete_project(self):
+        """Test only the manager can delete a project."""
+        res = self.client.delete(detail_url(self.project.id))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertTrue(Project.objects.filter(id=self.project.id).exists())
+
+    def test_team_member_lists_project_tasks(self):
+        """Test team members see the tasks of their projects."""
+        task = Task.objects.create(title='Shared', description='Shared', completed_by=self.manager)
+        Task.objects.create(title='Private', description='Private', completed_by=self.manager)
+        self.project.tasks.add(task)
+
+        res = self.client.get(TASKS_URL)
+
+        self.assertEqual([t['id'] for t in res.data], [task.id])
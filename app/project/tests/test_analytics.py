@@ -0,0 +1,184 @@
+"""
+Tests for task status transitions and cycle time analytics.
+"""
+from datetime import timedelta
+
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Project, Task, TaskCompletion, TaskStatus, TaskStatusTransition
+from project.analytics import STATUSES, cycle_time_stats, load_transitions
+
+MANAGER_ANALYTICS_URL = reverse('project:project-manager-analytics')
+
+
+def analytics_url(project_id):
+    """Return the analytics URL of a project."""
+    return reverse('project:project-analytics', args=[project_id])
+
+
+def create_user(email='user@example.com', password='test1234'):
+    """Create and return a test user."""
+    return get_user_model().objects.create_user(email, password)
+
+
+def create_project(manager, **params):
+    """Create and return a sample project."""
+    defaults = {
+        'title': 'Sample project',
+        'description': 'Sample description',
+        'client_name': 'Client name',
+    }
+    defaults.update(params)
+    return Project.objects.create(manager=manager, **defaults)
+
+
+def create_task(user, title='Task'):
+    """Create and return a sample task."""
+    return Task.objects.create(title=title, description=title, completed_by=user)
+
+
+class TransitionTests(TestCase):
+    """Test status changes are recorded."""
+
+    def setUp(self):
+        self.user = create_user()
+
+    def test_task_status_changes_recorded(self):
+        """Test creating a task and changing its status append transitions."""
+        task = create_task(self.user)
+        task.title = 'Renamed'
+        task.save()
+        task.status = TaskStatus.UNDER_REVIEW
+        task.save()
+
+        transitions = task.transitions.order_by('id').values_list('from_status', 'to_status')
+        self.assertEqual(list(transitions), [
+            (None, TaskStatus.PENDING),
+            (TaskStatus.PENDING, TaskStatus.UNDER_REVIEW),
+        ])
+
+    def test_completion_status_changes_recorded(self):
+        """Test task completion transitions are kept apart from the task's."""
+        task = create_task(self.user)
+        completion = TaskCompletion.objects.create(task=task, user=self.user)
+        completion.status = TaskStatus.COMPLETED
+        completion.save()
+
+        rows = TaskStatusTransition.objects.filter(completion=completion).order_by('id')
+        self.assertEqual(
+            list(rows.values_list('from_status', 'to_status')),
+            [(None, TaskStatus.PENDING), (TaskStatus.PENDING, TaskStatus.COMPLETED)],
+        )
+        self.assertEqual(task.transitions.filter(completion__isnull=True).count(), 1)
+
+
+class CycleTimeStatsTests(TestCase):
+    """Test the vectorized analytics."""
+
+    def test_lead_time_and_time_in_state(self):
+        """Test durations are split per state and per task."""
+        code = STATUSES.index
+        tasks = np.array([1, 1, 1, 2, 2])
+        statuses = np.array([
+            code(TaskStatus.PENDING), code(TaskStatus.UNDER_REVIEW), code(TaskStatus.COMPLETED),
+            code(TaskStatus.PENDING), code(TaskStatus.UNDER_REVIEW),
+        ], dtype=np.int8)
+        times = np.array([0.0, 10.0, 40.0, 100.0, 120.0])
+
+        stats = cycle_time_stats(tasks, statuses, times)
+
+        self.assertEqual(stats['tasks'], 2)
+        self.assertEqual(stats['completed'], 1)
+        self.assertEqual(stats['lead_time']['p50'], 40.0)
+        self.assertEqual(stats['time_in_state'][TaskStatus.PENDING]['p50'], 15.0)
+        self.assertEqual(stats['time_in_state'][TaskStatus.UNDER_REVIEW]['p50'], 30.0)
+        self.assertIsNone(stats['time_in_state'][TaskStatus.ON_HOLD]['p50'])
+
+    def test_no_transitions(self):
+        """Test empty arrays give empty statistics."""
+        empty = np.empty(0)
+
+        stats = cycle_time_stats(empty.astype(np.int64), empty.astype(np.int8), empty)
+
+        self.assertEqual(stats['tasks'], 0)
+        self.assertIsNone(stats['lead_time']['p90'])
+
+
+class AnalyticsApiTests(TestCase):
+    """Test the analytics endpoints."""
+
+    def setUp(self):
+        self.user = create_user()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def add_task(self, project, minutes_in_review):
+        """Attach a task that spent some minutes under review before completion."""
+        task = create_task(self.user)
+        project.tasks.add(task)
+        start = timezone.now() - timedelta(days=1)
+        task.transitions.all().delete()
+        TaskStatusTransition.objects.bulk_create([
+            TaskStatusTransition(task=task, to_status=TaskStatus.PENDING, changed_at=start),
+            TaskStatusTransition(
+                task=task, to_status=TaskStatus.UNDER_REVIEW, changed_at=start + timedelta(minutes=1),
+            ),
+            TaskStatusTransition(
+                task=task, to_status=TaskStatus.COMPLETED,
+                changed_at=start + timedelta(minutes=1 + minutes_in_review),
+            ),
+        ])
+
+    def test_transitions_loaded_as_codes_and_epoch_seconds(self):
+        """Test the database hands back status codes and epoch seconds sorted by task and time."""
+        project = create_project(self.user)
+        self.add_task(project, 10)
+        self.add_task(project, 30)
+        expected = TaskStatusTransition.objects.filter(task__project=project).order_by('task_id', 'changed_at')
+
+        tasks, statuses, times = load_transitions([project.id])
+
+        self.assertEqual((tasks.dtype, statuses.dtype, times.dtype), (np.int64, np.int8, np.float64))
+        self.assertEqual(tasks.tolist(), [row.task_id for row in expected])
+        self.assertEqual(statuses.tolist(), [STATUSES.index(row.to_status) for row in expected])
+        np.testing.assert_allclose(times, [row.changed_at.timestamp() for row in expected], rtol=0, atol=1e-3)
+        self.assertEqual(load_transitions([0])[0].size, 0)
+
+    def test_project_analytics(self):
+        """Test percentiles are computed over a project's tasks."""
+        project = create_project(self.user)
+        self.add_task(project, 10)
+        self.add_task(project, 30)
+
+        res = self.client.get(analytics_url(project.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['completed'], 2)
+        self.assertEqual(res.data['time_in_state'][TaskStatus.UNDER_REVIEW]['p50'], 1200.0)
+        self.assertEqual(res.data['lead_time']['p50'], 1260.0)
+
+    def test_manager_analytics_covers_managed_projects(self):
+        """Test the manager endpoint only includes the user's own projects."""
+        self.add_task(create_project(self.user), 10)
+        self.add_task(create_project(self.user), 10)
+        self.add_task(create_project(create_user(email='other@example.com')), 10)
+
+        res = self.client.get(MANAGER_ANALYTICS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['tasks'], 2)
+
+    def test_analytics_of_other_users_project_not_found(self):
+        """Test analytics are only available for accessible projects."""
+        project = create_project(create_user(email='other@example.com'))
+
+        res = self.client.get(analytics_url(project.id))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,195 @@
+"""
+Tests for project boards and task ranks.
+"""
+import random
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import SimpleTestCase, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Project, Task, TaskStatus
+from project.board import rank_between, spread
+
+
+def board_url(project_id):
+    """Create and return a project board URL."""
+    return reverse('project:project-board', args=[project_id])
+
+
+def move_url(task_id):
+    """Create and return a task move URL."""
+    return reverse('project:task-move', args=[task_id])
+
+
+class RankTests(SimpleTestCase):
+    """Test generating ranks."""
+
+    def test_rank_between_neighbours(self):
+        """Test ranks fall strictly between their neighbours."""
+        cases = [('', None), ('a', None), ('z', None), ('', 'a'), ('a', 'b'), ('a', 'a1'), ('az', 'b'), ('0001', '0002')]
+        for before, after in cases:
+            rank = rank_between(before, after)
+            self.assertGreater(rank, before)
+            if after is not None:
+                self.assertLess(rank, after)
+            self.assertFalse(rank.endswith('0'))
+
+    def test_rank_between_invalid(self):
+        """Test neighbours out of order or equal have no rank between them."""
+        for before, after in [('b', 'a'), ('a', 'a'), ('', '')]:
+            with self.assertRaises(ValueError):
+                rank_between(before, after)
+
+    def test_repeated_inserts_stay_ordered(self):
+        """Test inserting at random places keeps every rank distinct and ordered."""
+        random.seed(7)
+        ranks = []
+        for _ in range(500):
+            index = random.randint(0, len(ranks))
+            before = ranks[index - 1] if index else ''
+            after = ranks[index] if index < len(ranks) else None
+            ranks.insert(index, rank_between(before, after))
+        self.assertEqual(ranks, sorted(set(ranks)))
+
+    def test_appends_stay_short(self):
+        """Test appending after the last rank grows ranks slowly."""
+        rank = ''
+        for _ in range(200):
+            rank = rank_between(rank, None)
+        self.assertLessEqual(len(rank), 7)
+
+    def test_spread(self):
+        """Test spread ranks are ordered, distinct and short."""
+        for count in (0, 1, 35, 36, 1000):
+            ranks = spread(count)
+            self.assertEqual(len(ranks), count)
+            self.assertEqual(ranks, sorted(set(ranks)))
+            self.assertTrue(all(ranks) and all(len(rank) <= 2 for rank in ranks))
+
+
+class BoardApiTests(TestCase):
+    """Test reading boards and moving cards through the API."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(email='user@example.com', password='test123')
+        self.client.force_authenticate(self.user)
+        self.project = Project.objects.create(manager=self.user, title='Project', description='Description')
+        self.tasks = [
+            Task.objects.create(title=f'Task {i}', description='Description', completed_by=self.user)
+            for i in range(5)
+        ]
+        self.done = Task.objects.create(
+            title='Done', description='Description', completed_by=self.user, status=TaskStatus.COMPLETED,
+        )
+        self.project.tasks.add(*self.tasks, self.done)
+
+    def column(self, res, status):
+        return next(column for column in res.data['columns'] if column['status'] == status)
+
+    def test_new_tasks_go_to_the_bottom(self):
+        """Test new tasks get increasing ranks in creation order."""
+        ranks = [task.rank for task in self.tasks]
+
+        self.assertTrue(all(ranks))
+        self.assertEqual(ranks, sorted(ranks))
+
+    def test_board_groups_by_status_in_one_query(self):
+        """Test the board returns every column in rank order with one task query."""
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(board_url(self.project.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual([column['status'] for column in res.data['columns']], TaskStatus.values)
+        pending = self.column(res, TaskStatus.PENDING)
+        self.assertEqual([task['id'] for task in pending['tasks']], [task.id for task in self.tasks])
+        self.assertIsNone(pending['next'])
+        self.assertEqual([task['id'] for task in self.column(res, TaskStatus.COMPLETED)['tasks']], [self.done.id])
+        self.assertEqual(sum('core_task' in query['sql'] for query in queries.captured_queries), 1)
+
+    def test_board_column_limits_and_cursors(self):
+        """Test columns are paged with their own limits and cursors."""
+        params = {'status': 'pending,completed', 'limit': 1, 'limit_pending': 2}
+
+        res = self.client.get(board_url(self.project.id), params)
+
+        pending = self.column(res, TaskStatus.PENDING)
+        self.assertEqual(len(res.data['columns']), 2)
+        self.assertEqual([task['id'] for task in pending['tasks']], [self.tasks[0].id, self.tasks[1].id])
+        self.assertIsNone(self.column(res, TaskStatus.COMPLETED)['next'])
+        res = self.client.get(board_url(self.project.id), {**params, 'cursor_pending': pending['next']})
+        pending = self.column(res, TaskStatus.PENDING)
+        self.assertEqual([task['id'] for task in pending['tasks']], [self.tasks[2].id, self.tasks[3].id])
+        self.assertIsNotNone(pending['next'])
+
+    def test_board_invalid_params(self):
+        """Test unknown statuses, bad limits and bad cursors are rejected."""
+        for params in ({'status': 'nope'}, {'limit': 0}, {'limit': 'x'}, {'cursor_pending': 'bad'}):
+            res = self.client.get(board_url(self.project.id), params)
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST, params)
+
+    def test_move_updates_one_row(self):
+        """Test moving a card between two others only changes its own rank and status."""
+        others = {task.id: task.rank for task in Task.objects.exclude(id=self.tasks[4].id)}
+        payload = {'project': self.project.id, 'after': self.tasks[0].id}
+
+        res = self.client.post(move_url(self.tasks[4].id), payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual({task.id: task.rank for task in Task.objects.exclude(id=self.tasks[4].id)}, others)
+        res = self.client.get(board_url(self.project.id), {'status': 'pending'})
+        order = [self.tasks[i].id for i in (0, 4, 1, 2, 3)]
+        self.assertEqual([task['id'] for task in self.column(res, TaskStatus.PENDING)['tasks']], order)
+
+    def test_move_to_another_column(self):
+        """Test moving a card to the top of another column changes its status."""
+        payload = {'project': self.project.id, 'status': TaskStatus.COMPLETED, 'after': None}
+
+        res = self.client.post(move_url(self.tasks[1].id), payload, format='json')
+
+        self.assertEqual(res.data['status'], TaskStatus.COMPLETED)
+        res = self.client.get(board_url(self.project.id), {'status': 'completed'})
+        ids = [task['id'] for task in self.column(res, TaskStatus.COMPLETED)['tasks']]
+        self.assertEqual(ids, [self.tasks[1].id, self.done.id])
+
+    def test_move_between_unranked_tasks_rebalances(self):
+        """Test a move between tasks without ranks ranks the column first."""
+        Task.objects.filter(id__in=[task.id for task in self.tasks]).update(rank='')
+
+        res = self.client.post(
+            move_url(self.tasks[4].id), {'project': self.project.id, 'after': self.tasks[1].id}, format='json',
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        ranked = list(Task.objects.filter(status=TaskStatus.PENDING).order_by('rank', 'id'))
+        self.assertEqual([task.id for task in ranked], [self.tasks[i].id for i in (0, 1, 4, 2, 3)])
+        self.assertTrue(all(task.rank for task in ranked))
+
+    def test_move_rejects_foreign_neighbour(self):
+        """Test a card cannot move below a task outside the column."""
+        payload = {'project': self.project.id, 'after': self.done.id}
+
+        res = self.client.post(move_url(self.tasks[0].id), payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_rebalance_command(self):
+        """Test the command respreads columns with long or missing ranks and leaves others alone."""
+        Task.objects.filter(id=self.tasks[2].id).update(rank=self.tasks[2].rank + 'i' * 30)
+        done_rank = self.done.rank
+        out = StringIO()
+
+        call_command('rebalance_ranks', stdout=out)
+
+        ranks = [Task.objects.get(id=task.id).rank for task in self.tasks]
+        self.assertEqual(ranks, sorted(ranks))
+        self.assertTrue(all(len(rank) <= 2 for rank in ranks))
+        self.assertEqual(Task.objects.get(id=self.done.id).rank, done_rank)
+        self.assertIn('rebalanced 1 columns', out.getvalue())
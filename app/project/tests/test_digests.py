@@ -0,0 +1,168 @@
+"""
+Tests for notification digests.
+"""
+import smtplib
+from datetime import timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.mail.backends.locmem import EmailBackend
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from core import activity
+from core.models import Note, Notification, Project, Task, TaskCompletion
+from project.digests import DigestSender, due_recipients
+
+
+class CountingBackend(EmailBackend):
+    """Locmem backend counting the connections opened."""
+
+    opened = 0
+
+    def open(self):
+        CountingBackend.opened += 1
+        return super().open()
+
+
+@override_settings(
+    ACTIVITY_FLUSH_SIZE=100, ACTIVITY_FLUSH_INTERVAL=3600, DIGEST_DELAY=0,
+    EMAIL_BACKEND='project.tests.test_digests.CountingBackend',
+)
+class DigestTests(TestCase):
+    """Test queueing and sending notification digests."""
+
+    def setUp(self):
+        activity._buffer.clear()
+        CountingBackend.opened = 0
+        User = get_user_model()
+        self.manager = User.objects.create_user(email='manager@example.com', password='test123', name='Manager')
+        self.member = User.objects.create_user(email='member@example.com', password='test123', name='Member')
+        self.project = Project.objects.create(manager=self.manager, title='Project', description='D')
+        self.project.team.add(self.member)
+        self.task = Task.objects.create(title='Task', description='D', completed_by=self.manager)
+        self.project.tasks.add(self.task)
+        activity._buffer.clear()
+
+    def tearDown(self):
+        activity._buffer.clear()
+
+    def as_actor(self, user, change):
+        """Run change as user, commit and flush the activity it records."""
+        token = activity.set_actor(user)
+        try:
+            with self.captureOnCommitCallbacks(execute=True):
+                change()
+        finally:
+            activity.reset_actor(token)
+        activity.flush()
+
+    def update_task(self, user, title):
+        def change():
+            self.task.title = title
+            self.task.save()
+        self.as_actor(user, change)
+
+    def test_events_notify_team_but_not_actor(self):
+        """Test updates and notes notify the project team except whoever made them."""
+        self.update_task(self.manager, 'Renamed')
+        self.as_actor(self.member, lambda: Note.objects.create(content='Hi', task=self.task, created_by=self.member))
+        self.as_actor(self.manager, lambda: TaskCompletion.objects.create(task=self.task, user=self.member))
+
+        self.assertEqual(
+            sorted(Notification.objects.values_list('recipient__email', 'kind')),
+            [
+                ('manager@example.com', Notification.Kind.NOTE_ADDED),
+                ('member@example.com', Notification.Kind.TASK_ASSIGNED),
+                ('member@example.com', Notification.Kind.TASK_UPDATED),
+            ],
+        )
+
+    def test_one_digest_per_user(self):
+        """Test many events reach a user as a single email, sent over one connection."""
+        for index in range(5):
+            self.update_task(self.manager, f'Title {index}')
+        self.as_actor(self.manager, lambda: Note.objects.create(content='Hi', task=self.task, created_by=self.manager))
+
+        self.assertEqual(DigestSender().send(), (1, 6))
+
+        message, = mail.outbox
+        self.assertEqual(message.to, ['member@example.com'])
+        self.assertEqual(message.subject, '6 updates on your projects')
+        self.assertIn('Title 4 (Pending): Updated x5, New note', message.body)
+        self.assertIn('New note', message.alternatives[0][0])
+        self.assertEqual(CountingBackend.opened, 1)
+        self.assertFalse(Notification.objects.filter(sent_at__isnull=True).exists())
+        self.assertEqual(DigestSender().send(), (0, 0))
+
+    def test_batches_share_a_connection(self):
+        """Test each batch of users is sent over its own single connection."""
+        users = [
+            get_user_model().objects.create_user(email=f'user{index}@example.com', password='test123')
+            for index in range(5)
+        ]
+        self.project.team.add(*users)
+        self.update_task(self.manager, 'Renamed')
+
+        self.assertEqual(DigestSender().send(batch_size=2), (6, 6))
+
+        self.assertEqual(len(mail.outbox), 6)
+        self.assertEqual(CountingBackend.opened, 3)
+
+    def test_recent_notifications_wait(self):
+        """Test users are only mailed once their oldest notification is older than the delay."""
+        self.update_task(self.manager, 'Renamed')
+
+        self.assertEqual(due_recipients(delay=60), [])
+        Notification.objects.update(created_at=timezone.now() - timedelta(minutes=2))
+        self.assertEqual(due_recipients(delay=60), [self.member.id])
+
+    def test_failed_digest_stays_pending(self):
+        """Test a digest that could not be sent is retried on the next run."""
+        self.update_task(self.manager, 'Renamed')
+
+        with mock.patch.object(CountingBackend, 'send_messages', side_effect=smtplib.SMTPServerDisconnected):
+            with self.assertLogs('project.digests', 'ERROR'):
+                self.assertEqual(DigestSender().send(), (0, 0))
+
+        self.assertTrue(Notification.objects.filter(sent_at__isnull=True).exists())
+        self.assertEqual(DigestSender().send(), (1, 1))
+
+    @override_settings(ACTIVITY_BUFFER_SIZE=0, ACTIVITY_OVERFLOW='drop')
+    def test_events_dropped_by_the_buffer_notify(self):
+        """Test notifications are queued on commit, not from the lossy activity buffer."""
+        with self.assertLogs('core.activity', 'WARNING'):
+            self.update_task(self.manager, 'Renamed')
+
+        self.assertEqual(len(activity._buffer), 0)
+        self.assertEqual(
+            list(Notification.objects.values_list('recipient__email', 'kind')),
+            [('member@example.com', Notification.Kind.TASK_UPDATED)],
+        )
+
+    def test_overlapping_runs_send_once(self):
+        """Test a run started while another is sending skips the notifications it claimed."""
+        self.update_task(self.manager, 'Renamed')
+        overlapping = []
+        send_messages = CountingBackend.send_messages
+
+        def send_during_other_run(backend, messages):
+            overlapping.append(DigestSender().send())
+            return send_messages(backend, messages)
+
+        with mock.patch.object(CountingBackend, 'send_messages', send_during_other_run):
+            self.assertEqual(DigestSender().send(), (1, 1))
+
+        self.assertEqual(overlapping, [(0, 0)])
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertFalse(Notification.objects.filter(claimed_until__isnull=False).exists())
+
+    def test_claims_of_a_dead_run_expire(self):
+        """Test notifications claimed by a run that never finished are sent once the claim expires."""
+        self.update_task(self.manager, 'Renamed')
+        DigestSender().claim([self.member.id])
+
+        self.assertEqual(DigestSender().send(), (0, 0))
+        Notification.objects.update(claimed_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(DigestSender().send(), (1, 1))
@@ -0,0 +1,165 @@
+"""
+Tests for the read-only serialization fast path.
+"""
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import serializers, status
+from rest_framework.test import APIClient
+
+from core.models import Project, Task
+from project.fast_serializers import ValuesReader, get_reader
+from project.serializers import (
+    ProjectDetailSerializer,
+    ProjectSerializer,
+    TaskSerializer,
+)
+
+PROJECT_URL = reverse('project:project-list')
+TASKS_URL = reverse('project:task-list')
+
+
+class TaskWithLengthSerializer(TaskSerializer):
+    """Task serializer with a computed field."""
+    length = serializers.SerializerMethodField()
+
+    class Meta(TaskSerializer.Meta):
+        fields = TaskSerializer.Meta.fields + ['length']
+
+    def get_length(self, obj):
+        return len(obj.title)
+
+
+def detail_url(project_id):
+    """Create and return a project detail URL."""
+    return reverse('project:project-detail', args=[project_id])
+
+
+class ValuesReaderTests(TestCase):
+    """Test compiling and reading with values readers."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(email='user@example.com', password='test123')
+        self.project = Project.objects.create(
+            manager=self.user,
+            title='Project',
+            client_name='Client',
+            description='Description',
+        )
+        self.tasks = [
+            Task.objects.create(title=f'Task {i}', description='Task', status=s, completed_by=self.user)
+            for i, s in enumerate(['completed', 'pending', 'onHold'])
+        ]
+        self.project.tasks.add(*reversed(self.tasks))
+
+    def test_read_matches_serializer(self):
+        """Test reader output equals the serializer's."""
+        queryset = Project.objects.order_by('id')
+        expected = ProjectSerializer(
+            queryset.prefetch_related('tasks'), many=True
+        ).data
+
+        data = ValuesReader(ProjectSerializer).read(queryset)
+
+        self.assertEqual(data, expected)
+
+    def test_read_uses_two_queries(self):
+        """Test nested tasks are loaded with one extra query."""
+        reader = ValuesReader(ProjectSerializer)
+
+        with self.assertNumQueries(2):
+            reader.read(Project.objects.all())
+
+    def test_unsupported_serializer_falls_back(self):
+        """Test serializers with unsupported fields are not compiled."""
+        with override_settings(FAST_READ_SERIALIZERS=True):
+            self.assertIsNone(get_reader(TaskWithLengthSerializer))
+            self.assertIsNotNone(get_reader(TaskSerializer))
+
+    def test_disabled_by_setting(self):
+        """Test the fast path is off unless enabled."""
+        with override_settings(FAST_READ_SERIALIZERS=False):
+            self.assertIsNone(get_reader(ProjectSerializer))
+
+
+class FastReadApiTests(TestCase):
+    """Test the fast path returns the same bytes as the serializers."""
+
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(email='user@example.com', password='test123')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        for i in range(3):
+            project = Project.objects.create(
+                manager=self.user,
+                title=f'Project {i}',
+                client_name=f'Client {i}',
+                description=f'Descripción {i}',
+            )
+            for j in range(i):
+                task = Task.objects.create(
+                    title=f'Task {i}.{j}',
+                    description='Task',
+                    status='inProgress',
+                    completed_by=self.user,
+                )
+                project.tasks.add(task)
+        self.project = project
+
+    def assertSameResponse(self, url, params=None):
+        """Fetch a URL with and without the fast path and compare bytes."""
+        with override_settings(FAST_READ_SERIALIZERS=False):
+            slow = self.client.get(url, params)
+        with override_settings(FAST_READ_SERIALIZERS=True):
+            fast = self.client.get(url, params)
+
+        self.assertEqual(fast.status_code, slow.status_code)
+        self.assertEqual(fast.content, slow.content)
+        return fast
+
+    def test_project_list(self):
+        """Test project list output is identical."""
+        res = self.assertSameResponse(PROJECT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data), 3)
+
+    def test_filtered_project_list(self):
+        """Test filtered project list output is identical."""
+        task_id = self.project.tasks.first().id
+        self.assertSameResponse(PROJECT_URL, {'tasks': str(task_id)})
+
+    def test_project_detail(self):
+        """Test project detail output is identical."""
+        self.assertSameResponse(detail_url(self.project.id))
+
+    def test_missing_project_detail(self):
+        """Test a missing project is a 404 on both paths."""
+        res = self.assertSameResponse(detail_url(self.project.id + 100))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_task_list(self):
+        """Test task list output is identical."""
+        self.assertSameResponse(TASKS_URL)
+
+    def test_task_detail_not_routed(self):
+        """Test tasks, which have no retrieve, answer a detail GET with 405 on both paths."""
+        task = self.project.tasks.first()
+
+        res = self.assertSameResponse(reverse('project:task-detail', args=[task.id]))
+
+        self.assertEqual(res.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
+
+    @override_settings(FAST_READ_SERIALIZERS=True)
+    def test_writes_use_serializer(self):
+        """Test writes still go through the full serializer."""
+        payload = {'title': 'New title'}
+
+        res = self.client.patch(detail_url(self.project.id), payload)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, ProjectDetailSerializer(Project.objects.get(id=self.project.id)).data)
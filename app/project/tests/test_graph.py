@@ -0,0 +1,165 @@
+"""
+Tests for task dependencies and project graphs.
+"""
+import time
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import Project, Task, TaskDependency, TaskStatus
+from project.graph import analyse, creates_cycle
+
+
+DEPENDENCY_URL = reverse('project:taskdependency-list')
+
+
+def graph_url(project_id):
+    """Create and return a project graph URL."""
+    return reverse('project:project-graph', args=[project_id])
+
+
+def dependency_url(dependency_id):
+    """Create and return a dependency detail URL."""
+    return reverse('project:taskdependency-detail', args=[dependency_id])
+
+
+class GraphTests(SimpleTestCase):
+    """Test the dependency analysis."""
+
+    def test_creates_cycle(self):
+        """Test an edge closing a cycle, directly or not, is detected."""
+        edges = [(1, 2), (2, 3)]
+
+        self.assertTrue(creates_cycle(edges, 1, 3))
+        self.assertTrue(creates_cycle(edges, 2, 3))
+        self.assertTrue(creates_cycle(edges, 4, 4))
+        self.assertFalse(creates_cycle(edges, 3, 1))
+        self.assertFalse(creates_cycle(edges, 4, 1))
+
+    def test_analyse_orders_and_finds_critical_path(self):
+        """Test the order respects dependencies and the critical path skips completed work."""
+        statuses = {
+            1: TaskStatus.COMPLETED, 2: TaskStatus.PENDING, 3: TaskStatus.PENDING,
+            4: TaskStatus.IN_PROGRESS, 5: TaskStatus.PENDING,
+        }
+        edges = [(1, 2), (2, 3), (1, 4), (3, 5), (4, 5)]
+
+        graph = analyse(statuses, edges)
+
+        position = {task: index for index, task in enumerate(graph['order'])}
+        self.assertTrue(all(position[before] < position[after] for before, after in edges))
+        self.assertEqual(graph['critical_path'], [2, 3, 5])
+        self.assertEqual(graph['blocked'], [3, 5])
+        self.assertEqual(graph['cycle'], [])
+
+    def test_analyse_reports_cycles(self):
+        """Test tasks caught in a cycle are listed apart from the order."""
+        statuses = dict.fromkeys([1, 2, 3], TaskStatus.PENDING)
+
+        graph = analyse(statuses, [(1, 2), (2, 3), (3, 2)])
+
+        self.assertEqual(graph['order'], [1])
+        self.assertEqual(graph['cycle'], [2, 3])
+
+    def test_analyse_nothing_left(self):
+        """Test a project with all tasks completed has no critical path."""
+        graph = analyse({1: TaskStatus.COMPLETED, 2: TaskStatus.COMPLETED}, [(1, 2)])
+
+        self.assertEqual(graph['critical_path'], [])
+        self.assertEqual(graph['blocked'], [])
+
+
+class DependencyApiTests(TestCase):
+    """Test managing dependencies through the API."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(email='user@example.com', password='test123')
+        self.client.force_authenticate(self.user)
+        self.project = Project.objects.create(manager=self.user, title='Project', description='Description')
+        self.tasks = [
+            Task.objects.create(title=f'Task {i}', description='Description', completed_by=self.user)
+            for i in range(3)
+        ]
+        self.project.tasks.add(*self.tasks)
+
+    def depend(self, task, blocked_by, project=None):
+        payload = {'project': (project or self.project).id, 'task': task.id, 'blocked_by': blocked_by.id}
+        return self.client.post(DEPENDENCY_URL, payload, format='json')
+
+    def test_create_and_list_dependency(self):
+        """Test adding a dependency and listing it by project."""
+        res = self.depend(self.tasks[1], self.tasks[0])
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        listed = self.client.get(DEPENDENCY_URL, {'project': self.project.id})
+        self.assertEqual([row['id'] for row in listed.data], [res.data['id']])
+
+    def test_cycle_rejected(self):
+        """Test a dependency closing a cycle is refused."""
+        self.depend(self.tasks[1], self.tasks[0])
+        self.depend(self.tasks[2], self.tasks[1])
+
+        res = self.depend(self.tasks[0], self.tasks[2])
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('blocked_by', res.data)
+        self.assertEqual(TaskDependency.objects.count(), 2)
+
+    def test_self_and_foreign_tasks_rejected(self):
+        """Test a task cannot wait for itself or for a task outside the project."""
+        outside = Task.objects.create(title='Outside', description='Description', completed_by=self.user)
+
+        self.assertEqual(self.depend(self.tasks[0], self.tasks[0]).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.depend(self.tasks[0], outside).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_other_managers_project_rejected(self):
+        """Test only the manager of a project may add dependencies to it."""
+        other = get_user_model().objects.create_user(email='other@example.com', password='test123')
+        self.project.team.add(other)
+        self.client.force_authenticate(other)
+
+        res = self.depend(self.tasks[1], self.tasks[0])
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(TaskDependency.objects.exists())
+
+    def test_graph_follows_changes(self):
+        """Test the cached graph is refreshed when dependencies and statuses change."""
+        dependency = self.depend(self.tasks[1], self.tasks[0]).data
+
+        res = self.client.get(graph_url(self.project.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data['critical_path'], [self.tasks[0].id, self.tasks[1].id])
+        self.assertEqual(res.data['blocked'], [self.tasks[1].id])
+
+        self.tasks[0].status = TaskStatus.COMPLETED
+        self.tasks[0].save()
+        res = self.client.get(graph_url(self.project.id))
+        self.assertEqual(res.data['blocked'], [])
+
+        self.client.delete(dependency_url(dependency['id']))
+        res = self.client.get(graph_url(self.project.id))
+        self.assertEqual(res.data['dependencies'], [])
+
+    @override_settings(TASK_GRAPH_CACHE_TIMEOUT=60)
+    def test_missed_invalidation_expires(self):
+        """Test a graph whose invalidation another process never saw expires after the timeout."""
+        cache.clear()
+        self.depend(self.tasks[1], self.tasks[0])
+        self.client.get(graph_url(self.project.id))
+
+        # As if another process, with its own cache, made the change.
+        with patch('project.graph._bump'):
+            TaskDependency.objects.all().delete()
+
+        self.assertEqual(len(self.client.get(graph_url(self.project.id)).data['dependencies']), 1)
+        with patch('time.time', return_value=time.time() + 61):
+            self.assertEqual(self.client.get(graph_url(self.project.id)).data['dependencies'], [])
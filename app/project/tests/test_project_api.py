@@ -9,7 +9,7 @@ from django.urls import reverse
 from rest_framework import status
 from rest_framework.test import APIClient
 
-from core.models import Project, Task
+from core.models import Note, Project, Task, TaskDependency, TaskStatus, TaskStatusTransition
 
 from project.serializers import ProjectSerializer, ProjectDetailSerializer
 
@@ -22,6 +22,11 @@ def detail_url(project_id):
     return reverse('project:project-detail', args=[project_id])
 
 
+def clone_url(project_id):
+    """Create and return a project clone URL."""
+    return reverse('project:project-clone', args=[project_id])
+
+
 def create_project(manager, **params):
     """Create and return a sample user."""
     defaults = {
@@ -267,3 +272,196 @@ class PrivateRecipeApiTests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertIn(task_lunch, project.tasks.all())
         self.assertNotIn(task_breakfast, project.tasks.all())
+
+    def test_filter_by_tasks(self):
+        """Test filtering projects by tasks."""
+        p1 = create_project(manager=self.user, title='Thai Vegetable Curry')
+        p2 = create_project(manager=self.user, title='Aubergine with Tahini')
+        t1 = Task.objects.create(title='Vegan', description='Vegan', completed_by=self.user)
+        t2 = Task.objects.create(title='Vegetarian', description='Vegetarian', completed_by=self.user)
+        p1.tasks.add(t1)
+        p2.tasks.add(t2)
+        p3 = create_project(manager=self.user, title='Fish and chips')
+
+        params = {'tasks': f'{t1.id},{t2.id}'}
+        res = self.client.get(PROJECT_URL, params)
+
+        s1 = ProjectSerializer(p1)
+        s2 = ProjectSerializer(p2)
+        s3 = ProjectSerializer(p3)
+        self.assertIn(s1.data, res.data)
+        self.assertIn(s2.data, res.data)
+        self.assertNotIn(s3.data, res.data)
+
+    def test_filter_by_tasks_returns_unique_projects(self):
+        """Test a project matching several tasks is listed once."""
+        project = create_project(manager=self.user)
+        t1 = Task.objects.create(title='Vegan', description='Vegan', completed_by=self.user)
+        t2 = Task.objects.create(title='Vegetarian', description='Vegetarian', completed_by=self.user)
+        project.tasks.add(t1, t2)
+
+        res = self.client.get(PROJECT_URL, {'tasks': f'{t1.id},{t2.id}'})
+
+        self.assertEqual(len(res.data), 1)
+
+    def test_filter_by_tasks_match_all(self):
+        """Test match=all only returns projects with every task."""
+        t1 = Task.objects.create(title='Vegan', description='Vegan', completed_by=self.user)
+        t2 = Task.objects.create(title='Vegetarian', description='Vegetarian', completed_by=self.user)
+        p1 = create_project(manager=self.user, title='Both')
+        p1.tasks.add(t1, t2)
+        p2 = create_project(manager=self.user, title='One')
+        p2.tasks.add(t1)
+
+        params = {'tasks': f'{t1.id},{t2.id}', 'match': 'all'}
+        res = self.client.get(PROJECT_URL, params)
+
+        self.assertEqual([p['id'] for p in res.data], [p1.id])
+
+    def test_filter_by_tasks_and_team(self):
+        """Test combining task and team filters."""
+        member = create_user(email='member@example.com', password='test123')
+        task = Task.objects.create(title='Vegan', description='Vegan', completed_by=self.user)
+        p1 = create_project(manager=self.user, title='Task and team')
+        p1.tasks.add(task)
+        p1.team.add(member)
+        p2 = create_project(manager=self.user, title='Task only')
+        p2.tasks.add(task)
+
+        params = {'tasks': str(task.id), 'team': str(member.id)}
+        res = self.client.get(PROJECT_URL, params)
+
+        self.assertEqual([p['id'] for p in res.data], [p1.id])
+
+
+class ConditionalUpdateApiTests(TestCase):
+    """Test optimistic concurrency on project updates."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(email='user@example.com', password='test123')
+        self.client.force_authenticate(self.user)
+        self.project = create_project(manager=self.user)
+
+    def test_etag_is_the_version(self):
+        """Test project responses carry their version as ETag."""
+        res = self.client.get(detail_url(self.project.id))
+
+        self.assertEqual(res['ETag'], '"1"')
+        self.assertEqual(res.data['version'], 1)
+
+    def test_update_with_current_etag(self):
+        """Test an update with a matching If-Match header succeeds."""
+        res = self.client.patch(detail_url(self.project.id), {'title': 'New'}, HTTP_IF_MATCH='"1"')
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res['ETag'], '"2"')
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.title, 'New')
+
+    def test_update_with_stale_etag(self):
+        """Test an update with an outdated If-Match header returns 412."""
+        self.client.patch(detail_url(self.project.id), {'title': 'First'}, HTTP_IF_MATCH='"1"')
+
+        res = self.client.patch(detail_url(self.project.id), {'title': 'Second'}, HTTP_IF_MATCH='"1"')
+
+        self.assertEqual(res.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        self.project.refresh_from_db()
+        self.assertEqual(self.project.title, 'First')
+
+    def test_stale_version_field_keeps_tasks(self):
+        """Test a stale version in the body leaves the project and its tasks untouched."""
+        task = Task.objects.create(title='Task', description='Description', completed_by=self.user)
+        self.project.tasks.add(task)
+        self.project.save()
+
+        payload = {'title': 'Second', 'version': 1, 'tasks': []}
+        res = self.client.patch(detail_url(self.project.id), payload, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        self.assertEqual(list(self.project.tasks.all()), [task])
+
+
+class CloneProjectApiTests(TestCase):
+    """Test cloning projects and templates on the server."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = create_user(email='user@example.com', password='test123')
+        self.member = create_user(email='member@example.com', password='test123')
+        self.client.force_authenticate(self.user)
+        self.source = create_project(manager=self.user, title='Template', is_template=True)
+        self.source.team.add(self.member)
+        self.tasks = [
+            Task.objects.create(title=f'Task {i}', description='Description', completed_by=self.member,
+                                status=TaskStatus.COMPLETED)
+            for i in range(3)
+        ]
+        self.source.tasks.add(*self.tasks)
+        Note.objects.create(content='Remember', task=self.tasks[0], created_by=self.member)
+
+    def test_clone_copies_tasks_and_team(self):
+        """Test a clone gets pending copies of the tasks and the same team, but no notes by default."""
+        res = self.client.post(clone_url(self.source.id), {'title': 'Copy'}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data['copied'], {'tasks': 3, 'dependencies': 0, 'team': 1, 'notes': 0})
+        clone = Project.objects.get(id=res.data['id'])
+        self.assertEqual((clone.title, clone.manager, clone.cloned_from_id), ('Copy', self.user, self.source.id))
+        self.assertFalse(clone.is_template)
+        self.assertEqual(list(clone.team.all()), [self.member])
+        tasks = list(clone.tasks.order_by('id'))
+        self.assertEqual([task.title for task in tasks], ['Task 0', 'Task 1', 'Task 2'])
+        self.assertEqual([task.cloned_from_id for task in tasks], [task.id for task in self.tasks])
+        self.assertTrue(all(task.status == TaskStatus.PENDING and task.completed_by == self.user for task in tasks))
+        self.assertTrue(all(task.id not in {t.id for t in self.tasks} for task in tasks))
+        self.assertEqual(
+            TaskStatusTransition.objects.filter(task__in=tasks, from_status__isnull=True).count(), 3,
+        )
+        self.assertEqual(self.source.tasks.count(), 3)
+
+    def test_clone_with_notes_as_template(self):
+        """Test notes follow the copies of their tasks and the clone can be a template."""
+        payload = {'include_notes': True, 'include_team': False, 'as_template': True}
+
+        res = self.client.post(clone_url(self.source.id), payload, format='json')
+
+        clone = Project.objects.get(id=res.data['id'])
+        self.assertTrue(clone.is_template)
+        self.assertEqual(clone.title, 'Template')
+        self.assertFalse(clone.team.exists())
+        note = Note.objects.get(task__project=clone)
+        self.assertEqual((note.content, note.task.cloned_from_id), ('Remember', self.tasks[0].id))
+
+    def test_clone_copies_dependencies(self):
+        """Test dependencies are copied between the copies of their tasks."""
+        TaskDependency.objects.create(project=self.source, task=self.tasks[2], blocked_by=self.tasks[0])
+
+        res = self.client.post(clone_url(self.source.id), {}, format='json')
+
+        self.assertEqual(res.data['copied']['dependencies'], 1)
+        dependency = TaskDependency.objects.get(project_id=res.data['id'])
+        self.assertEqual(
+            (dependency.task.cloned_from_id, dependency.blocked_by.cloned_from_id),
+            (self.tasks[2].id, self.tasks[0].id),
+        )
+
+    def test_team_member_can_clone(self):
+        """Test a team member may clone a project they do not manage, and owns the clone."""
+        self.client.force_authenticate(self.member)
+
+        res = self.client.post(clone_url(self.source.id), {}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Project.objects.get(id=res.data['id']).manager, self.member)
+        listed = self.client.get(PROJECT_URL, {'template': 0})
+        self.assertEqual([project['id'] for project in listed.data], [res.data['id']])
+
+    def test_clone_other_users_project_not_found(self):
+        """Test projects the user cannot see cannot be cloned."""
+        other = create_user(email='other@example.com', password='test123')
+        self.client.force_authenticate(other)
+
+        res = self.client.post(clone_url(self.source.id), {}, format='json')
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
@@ -82,6 +82,19 @@ class PrivateTasksApiTests(TestCase):
         task.refresh_from_db()
         self.assertEqual(task.title, payload['title'])
 
+    def test_update_task_with_stale_version(self):
+        """Test updating a task changed since it was read returns 412."""
+        task = Task.objects.create(completed_by=self.user, title='After Dinner')
+        url = detail_url(task.id)
+        self.client.patch(url, {'title': 'Dessert', 'version': 1})
+
+        res = self.client.patch(url, {'title': 'Coffee', 'version': 1})
+
+        self.assertEqual(res.status_code, status.HTTP_412_PRECONDITION_FAILED)
+        task.refresh_from_db()
+        self.assertEqual(task.title, 'Dessert')
+        self.assertEqual(task.version, 2)
+
     def test_delete_task(self):
         """Test deleting a task"""
         task = Task.objects.create(completed_by=self.user, title='Breakfast', description='Breakfast')
@@ -14,6 +14,8 @@ from project import views
 router = DefaultRouter()
 router.register('project', views.ProjectViewSet)
 router.register('tasks', views.TaskViewSet)
+router.register('dependencies', views.TaskDependencyViewSet)
+router.register('webhooks', views.WebhookViewSet)
 # router.register('ingredients', views.IngredientViewSet)
 
 app_name = 'project'
@@ -1,7 +1,7 @@
 """
 Views for the recipe APIs
 """
-from drf_spectacular.utils import (
+from core.schema import (
     extend_schema_view,
     extend_schema,
     OpenApiParameter,
@@ -11,15 +11,95 @@ from drf_spectacular.utils import (
 from rest_framework import (
     viewsets,
     mixins,
+    status,
 )
 from rest_framework.authentication import TokenAuthentication
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import CursorPagination
+from rest_framework.permissions import IsAuthenticated, SAFE_METHODS
+from rest_framework.response import Response
+from django.conf import settings
 from django.db import models
+from django.http import Http404
+from django.db.models import Exists, OuterRef, Prefetch
+from core.activity import record
+from core.deletion import schedule_project_deletion
+from core.mixins import ActivityActorMixin, ConditionalUpdateMixin, IdempotencyMixin, ReplicaReadMixin, ShardMixin
 from core.models import (
+    Activity,
     Project,
     Task,
+    TaskDependency,
+    TaskStatus,
+    Webhook,
 )
-from project.serializers import ProjectSerializer, ProjectDetailSerializer, TaskSerializer
+from project.access import accessible_project_ids, accessible_shards, project_shard
+from project.analytics import project_stats
+from project.board import board, decode_cursor, move
+from project.cloning import clone_project
+from project.fast_serializers import get_reader
+from project.graph import project_graph
+from project.serializers import (
+    ActivitySerializer,
+    ProjectCloneSerializer,
+    ProjectSerializer,
+    ProjectDetailSerializer,
+    TaskDependencySerializer,
+    TaskMoveSerializer,
+    TaskSerializer,
+    WebhookDeliverySerializer,
+    WebhookSerializer,
+)
+
+
+class FastListMixin:
+    """Serve list from values() rows when the serializer allows it.
+
+    The fast path skips object level permission checks, so only use it on
+    views whose permissions are decided per request.
+    """
+
+    def list(self, request, *args, **kwargs):
+        reader = get_reader(self.get_serializer_class())
+        if reader is None or self.paginator is not None:
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        return Response(reader.read(queryset))
+
+
+class FastReadMixin(FastListMixin):
+    """Serve list and retrieve from values() rows when the serializer allows it.
+
+    Only for views with RetrieveModelMixin: defining retrieve routes detail
+    GETs to the view.
+    """
+
+    def retrieve(self, request, *args, **kwargs):
+        reader = get_reader(self.get_serializer_class())
+        if reader is None:
+            return super().retrieve(request, *args, **kwargs)
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        queryset = self.filter_queryset(self.get_queryset()).filter(
+            **{self.lookup_field: self.kwargs[lookup_url_kwarg]}
+        )
+        data = reader.read(queryset)
+        if not data:
+            raise Http404
+        return Response(data[0])
+
+
+class ProjectShardMixin(ShardMixin):
+    """Look for projects and tasks on the shards of the user's accessible projects."""
+
+    def request_shards(self):
+        return accessible_shards(self.request.user)
+
+
+class ActivityPagination(CursorPagination):
+    """Page through activity newest first, using the (project, created_at) index."""
+    page_size = 50
+    ordering = '-created_at'
 
 
 @extend_schema_view(
@@ -35,20 +115,42 @@ from project.serializers import ProjectSerializer, ProjectDetailSerializer, Task
                 OpenApiTypes.STR,
                 description='Comma separated list of team IDs to filter',
             ),
+            OpenApiParameter(
+                'match',
+                OpenApiTypes.STR, enum=['any', 'all'],
+                description='Match projects with any (default) or all of the given IDs',
+            ),
+            OpenApiParameter(
+                'template',
+                OpenApiTypes.INT, enum=[0, 1],
+                description='Only templates (1) or only regular projects (0)',
+            ),
         ]
     )
 )
-class ProjectViewSet(viewsets.ModelViewSet):
+class ProjectViewSet(IdempotencyMixin, ConditionalUpdateMixin, ActivityActorMixin, ReplicaReadMixin, ProjectShardMixin, FastReadMixin, viewsets.ModelViewSet):
     """View for manage recipe APIs."""
     serializer_class = ProjectDetailSerializer
     queryset = Project.objects.all()
     authentication_classes = [TokenAuthentication]
     permission_classes = [IsAuthenticated]
 
+    def object_shard(self, pk):
+        return project_shard(self.request.user, pk)
+
     def _params_to_ints(self, qs):
         """Convert a list of strings to integers."""
         return [int(str_id) for str_id in qs.split(',')]
 
+    def _filter_related(self, queryset, through, column, ids):
+        """Filter projects with correlated EXISTS over an M2M through table."""
+        rows = through.objects.filter(project_id=OuterRef('pk'))
+        if self.request.query_params.get('match') == 'all':
+            for related_id in set(ids):
+                queryset = queryset.filter(Exists(rows.filter(**{column: related_id})))
+            return queryset
+        return queryset.filter(Exists(rows.filter(**{f'{column}__in': ids})))
+
     def get_queryset(self):
         """Retrieve recipes for authenticated user."""
         tasks = self.request.query_params.get('tasks')
@@ -56,14 +158,27 @@ class ProjectViewSet(viewsets.ModelViewSet):
         queryset = self.queryset
         if tasks:
             task_ids = self._params_to_ints(tasks)
-            queryset = queryset.filter(tasks__id__in=task_ids)
+            queryset = self._filter_related(queryset, Project.tasks.through, 'task_id', task_ids)
         if team:
             team_ids = self._params_to_ints(team)
-            queryset = queryset.filter(team__id__in=team_ids)
+            queryset = self._filter_related(queryset, Project.team.through, 'user_id', team_ids)
 
-        return queryset.filter(
-            manager=self.request.user
-        ).order_by('-id').distinct()
+        template = self.request.query_params.get('template')
+        if template in ('0', '1'):
+            queryset = queryset.filter(is_template=template == '1')
+
+        queryset = queryset.filter(id__in=accessible_project_ids(self.request.user))
+        if self.action == 'clone':
+            # Anyone who can see a project may clone it, and only its row is needed.
+            return queryset
+        if self.action in ('board', 'graph'):
+            return queryset
+        if self.request.method not in SAFE_METHODS:
+            queryset = queryset.filter(manager=self.request.user)
+
+        return queryset.prefetch_related(
+            Prefetch('tasks', queryset=Task.objects.order_by('id'))
+        ).order_by('-id')
 
     def get_serializer_class(self):
         """Return the serializer class for request."""
@@ -78,6 +193,121 @@ class ProjectViewSet(viewsets.ModelViewSet):
         """Create a new project."""
         serializer.save(manager=self.request.user)
 
+    def perform_destroy(self, instance):
+        """Hide the project and purge its rows in the background."""
+        schedule_project_deletion(instance)
+
+    @extend_schema(responses=OpenApiTypes.OBJECT)
+    @action(detail=True, methods=['get'])
+    def analytics(self, request, pk=None):
+        """Return lead time and time in state percentiles of a project's tasks."""
+        project = self.get_object()
+        return Response(project_stats([project.pk]))
+
+    @extend_schema(responses=OpenApiTypes.OBJECT)
+    @action(detail=False, methods=['get'], url_path='analytics')
+    def manager_analytics(self, request):
+        """Return lead time and time in state percentiles over the projects the user manages."""
+        return Response(project_stats(Project.objects.filter(manager=request.user).values('id')))
+
+    @extend_schema(responses=OpenApiTypes.OBJECT)
+    @action(detail=True, methods=['get'])
+    def graph(self, request, pk=None):
+        """Return the dependency order, blocked tasks and critical path of a project's tasks."""
+        project = self.get_object()
+        return Response(project_graph(project))
+
+    def _column_limit(self, status):
+        """Return the page size of a board column from limit_<status> or limit."""
+        params = self.request.query_params
+        value = params.get(f'limit_{status}') or params.get('limit') or '20'
+        if not value.isdigit() or not 0 < int(value) <= settings.BOARD_MAX_COLUMN_SIZE:
+            raise ValidationError({f'limit_{status}': f'Must be between 1 and {settings.BOARD_MAX_COLUMN_SIZE}.'})
+        return int(value)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter(
+                'status',
+                OpenApiTypes.STR,
+                description='Comma separated list of the status columns to return, all by default',
+            ),
+            OpenApiParameter(
+                'limit',
+                OpenApiTypes.INT,
+                description='Tasks per column; limit_<status> sets it for one column',
+            ),
+            OpenApiParameter(
+                'cursor_<status>',
+                OpenApiTypes.STR,
+                description='The next cursor of a column, to read its following tasks',
+            ),
+        ],
+        responses=OpenApiTypes.OBJECT,
+    )
+    @action(detail=True, methods=['get'])
+    def board(self, request, pk=None):
+        """Return the tasks of a project grouped by status column in rank order."""
+        project = self.get_object()
+        statuses = request.query_params.get('status')
+        statuses = statuses.split(',') if statuses else TaskStatus.values
+        if not set(statuses) <= set(TaskStatus.values):
+            raise ValidationError({'status': 'Unknown status.'})
+        limits, cursors = {}, {}
+        for column in statuses:
+            limits[column] = self._column_limit(column)
+            cursor = self.request.query_params.get(f'cursor_{column}')
+            if cursor:
+                try:
+                    cursors[column] = decode_cursor(cursor)
+                except ValueError:
+                    raise ValidationError({f'cursor_{column}': 'Invalid cursor.'})
+        columns = board(project, limits, cursors)
+        for column in columns:
+            column['tasks'] = TaskSerializer(column['tasks'], many=True).data
+        return Response({'columns': columns})
+
+    @extend_schema(responses=OpenApiTypes.OBJECT)
+    @action(detail=True, methods=['post'], serializer_class=ProjectCloneSerializer)
+    def clone(self, request, pk=None):
+        """Copy a project with its tasks, and optionally its team and notes, into a new project of the user."""
+        source = self.get_object()
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        options = serializer.validated_data
+        project, copied = clone_project(
+            source,
+            request.user,
+            title=options.get('title'),
+            as_template=options['as_template'],
+            team=options['include_team'],
+            notes=options['include_notes'],
+        )
+        return Response(
+            {
+                'id': project.id,
+                'title': project.title,
+                'is_template': project.is_template,
+                'cloned_from': source.id,
+                'version': project.version,
+                'copied': copied,
+            },
+            status=status.HTTP_201_CREATED,
+        )
+
+    @action(
+        detail=True,
+        methods=['get'],
+        serializer_class=ActivitySerializer,
+        pagination_class=ActivityPagination,
+    )
+    def activity(self, request, pk=None):
+        """List the activity of a project, newest first."""
+        project = self.get_object()
+        page = self.paginate_queryset(Activity.objects.filter(project_id=project.pk))
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
 
 @extend_schema_view(
     list=extend_schema(
@@ -90,26 +320,107 @@ class ProjectViewSet(viewsets.ModelViewSet):
         ]
     )
 )
-class BaseProjectAttrViewSet(mixins.DestroyModelMixin, mixins.UpdateModelMixin, mixins.ListModelMixin, viewsets.GenericViewSet):
+class BaseProjectAttrViewSet(IdempotencyMixin, ConditionalUpdateMixin, ActivityActorMixin, ReplicaReadMixin, ProjectShardMixin, FastListMixin, mixins.DestroyModelMixin, mixins.UpdateModelMixin, mixins.ListModelMixin, viewsets.GenericViewSet):
     """Base view_set for project attributes."""
     authentication_classes = [TokenAuthentication]
     permission_classes = [IsAuthenticated]
+    fan_out_ordering = '-title'
 
     def get_queryset(self):
         """Filtra el queryset al usuario autenticado o sus tareas."""
         assigned_only = bool(
             int(self.request.query_params.get('assigned_only', 0))
         )
+        links = Project.tasks.through.objects
         queryset = self.queryset
         if assigned_only:
-            queryset = queryset.filter(project__isnull=False)
+            queryset = queryset.filter(Exists(links.filter(task_id=OuterRef('pk'))))
+        if self.request.method in SAFE_METHODS:
+            visible = links.filter(project_id__in=accessible_project_ids(self.request.user))
+        else:
+            visible = links.filter(project__manager=self.request.user)
 
         return queryset.filter(
-            models.Q(project__manager=self.request.user) | models.Q(completed_by=self.request.user)
-        ).order_by('-title').distinct()
+            models.Q(id__in=visible.values('task_id')) | models.Q(completed_by=self.request.user)
+        ).order_by('-title')
+
+    def perform_destroy(self, instance):
+        """Delete a task, logging it against the projects it belonged to."""
+        project_ids = Project.tasks.through.objects.filter(task_id=instance.pk).values_list('project_id', flat=True)
+        record(Activity.Action.DELETED, instance, project_ids=list(project_ids))
+        instance.delete()
 
 
 class TaskViewSet(BaseProjectAttrViewSet):
     """Manage task in the database."""
     serializer_class = TaskSerializer
     queryset = Task.objects.all()
+
+    @extend_schema(request=TaskMoveSerializer, responses=TaskSerializer)
+    @action(detail=True, methods=['post'], serializer_class=TaskMoveSerializer)
+    def move(self, request, pk=None):
+        """Move a task to a place on its project's board, updating only its own row."""
+        task = self.get_object()
+        serializer = self.get_serializer(data=request.data, context={**self.get_serializer_context(), 'task': task})
+        serializer.is_valid(raise_exception=True)
+        options = serializer.validated_data
+        try:
+            move(task, options['project'], options['status'], options['after'])
+        except Task.DoesNotExist:
+            raise ValidationError({'after': 'Not a task of that column.'})
+        return Response(TaskSerializer(task).data)
+
+
+class TaskDependencyViewSet(IdempotencyMixin, ActivityActorMixin, ReplicaReadMixin, ProjectShardMixin, mixins.CreateModelMixin, mixins.ListModelMixin, mixins.DestroyModelMixin, viewsets.GenericViewSet):
+    """Manage the dependencies between tasks of a project."""
+    serializer_class = TaskDependencySerializer
+    queryset = TaskDependency.objects.all()
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        """Filter dependencies to the projects the user can see, or manages for writes."""
+        queryset = self.queryset
+        project = self.request.query_params.get('project')
+        if project and project.isdigit():
+            queryset = queryset.filter(project_id=int(project))
+        if self.request.method in SAFE_METHODS:
+            queryset = queryset.filter(project_id__in=accessible_project_ids(self.request.user))
+        else:
+            queryset = queryset.filter(project__manager=self.request.user)
+        return queryset.order_by('-id')
+
+
+class DeliveryPagination(CursorPagination):
+    """Page through webhook deliveries newest first."""
+    page_size = 50
+    ordering = '-id'
+
+
+class WebhookViewSet(IdempotencyMixin, viewsets.ModelViewSet):
+    """Manage the webhooks receiving the events of the user's projects."""
+    serializer_class = WebhookSerializer
+    queryset = Webhook.objects.all()
+    authentication_classes = [TokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        """Retrieve the webhooks of the authenticated user."""
+        return self.queryset.filter(manager=self.request.user).order_by('-id')
+
+    def perform_create(self, serializer):
+        """Create a webhook for the authenticated user."""
+        serializer.save(manager=self.request.user)
+
+    @action(
+        detail=True,
+        methods=['get'],
+        serializer_class=WebhookDeliverySerializer,
+        pagination_class=DeliveryPagination,
+    )
+    def deliveries(self, request, pk=None):
+        """List the deliveries of a webhook, newest first."""
+        webhook = self.get_object()
+        page = self.paginate_queryset(webhook.deliveries.all())
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
@@ -4,13 +4,18 @@ Serializers for Users API Views
 
 from rest_framework import serializers
 
+from django.conf import settings
 from django.core.mail import EmailMultiAlternatives
 from django.template.loader import render_to_string
 from django.contrib.auth import get_user_model, authenticate
 from django.contrib.auth.password_validation import validate_password
 from django.utils.translation import gettext as _
 from rest_framework.exceptions import NotFound
-from core.models import Token
+
+from core.metrics import track_email
+from core.models import Project, Token
+from core.onboarding import OnboardingError, read_rows
+from core.sharding import locate
 import uuid
 
 from rest_framework.fields import empty
@@ -73,7 +78,8 @@ class UserSerializer(serializers.ModelSerializer):
             to=[email]
         )
         message.attach_alternative(html_content, "text/html")
-        message.send()
+        with track_email():
+            message.send()
 
     def update(self, instance, validated_data):
         """Update and return an user with encrypted password."""
@@ -139,3 +145,30 @@ class AuthTokenSerializer(serializers.Serializer):
 
         attrs['user'] = user
         return attrs
+
+
+class OnboardUsersSerializer(serializers.Serializer):
+    """Serializer for a CSV file of users to create in bulk."""
+    file = serializers.FileField()
+    project = serializers.IntegerField(required=False)
+
+    def validate_file(self, file):
+        """Parse the CSV into valid rows and per line errors."""
+        try:
+            text = file.read().decode('utf-8-sig')
+        except UnicodeDecodeError:
+            raise serializers.ValidationError('The file must be UTF-8 encoded CSV.')
+        try:
+            rows, errors = read_rows(text)
+        except OnboardingError as exc:
+            raise serializers.ValidationError(str(exc))
+        if len(rows) + len(errors) > settings.ONBOARDING_MAX_ROWS:
+            raise serializers.ValidationError(f'At most {settings.ONBOARDING_MAX_ROWS} users per file.')
+        return {'rows': rows, 'errors': errors}
+
+    def validate_project(self, project_id):
+        """Return the project the users join."""
+        project = locate(Project.objects.all(), pk=project_id)
+        if project is None:
+            raise serializers.ValidationError('Project not found.')
+        return project
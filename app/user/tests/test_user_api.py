@@ -1,23 +1,31 @@
 """
 Test User API endpoints
 """
+import threading
 import uuid
 
-from django.test import TestCase
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 from django.utils import timezone
 from datetime import timedelta
 
 from rest_framework import status
-from rest_framework.test import APIClient
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
 
-from core.models import Token
+from core import onboarding, throttling
+from core.models import Project, Token
 
 CREATE_USER_URL = reverse('user:create-account')
 CONFIRM_USER_URL = reverse('user:confirm-account')
 CREATE_TOKEN_URL = reverse('user:create-token')
 PROFILE_URL = reverse('user:profile')
+ONBOARD_URL = reverse('user:onboard')
 
 
 def create_user(**params):
@@ -28,6 +36,7 @@ def create_user(**params):
 class PublicUserApiTests(TestCase):
     """Test the users API (public)"""
     def setUp(self):
+        cache.clear()
         self.client = APIClient()
 
     def test_create_valid_user_success(self):
@@ -203,3 +212,182 @@ class PrivateUserApiTests(TestCase):
         self.assertEqual(self.user.name, payload['name'])
         self.assertTrue(self.user.check_password(payload['password']))
         self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+
+@override_settings(AUTH_THROTTLE_RATES={'password_ip': '3/min', 'password_email': '2/min'})
+class PasswordThrottleApiTests(TestCase):
+    """Test throttling the endpoints that hash passwords"""
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        # Mid-window, so attempts never straddle two buckets.
+        timer = patch('core.throttling.SlidingWindowThrottle.timer', return_value=30)
+        timer.start()
+        self.addCleanup(timer.stop)
+
+    def login(self, email, ip='10.0.0.1'):
+        return self.client.post(CREATE_TOKEN_URL, {'email': email, 'password': 'wrong'}, REMOTE_ADDR=ip)
+
+    @patch('user.serializers.authenticate', return_value=None)
+    def test_throttled_per_email_before_hashing(self, patched_authenticate):
+        """Test attempts on one email are limited across IPs without checking the password."""
+        self.login('victim@example.com', ip='10.0.0.1')
+        self.login('Victim@example.com', ip='10.0.0.2')
+
+        res = self.login('victim@example.com', ip='10.0.0.3')
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertIn('Retry-After', res)
+        self.assertEqual(patched_authenticate.call_count, 2)
+
+    def test_throttled_per_ip(self):
+        """Test attempts from one IP are limited across emails and sign ups."""
+        self.login('a@example.com')
+        self.login('b@example.com')
+        self.client.post(CREATE_USER_URL, {'email': 'c@example.com'}, REMOTE_ADDR='10.0.0.1')
+
+        res = self.login('d@example.com')
+        other = self.login('d@example.com', ip='10.0.0.9')
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(other.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_forwarded_for_is_not_trusted(self):
+        """Test a client cannot dodge the IP limit by rotating X-Forwarded-For."""
+        responses = [
+            self.client.post(
+                CREATE_TOKEN_URL, {'email': f'{index}@example.com', 'password': 'wrong'},
+                REMOTE_ADDR='10.0.0.1', HTTP_X_FORWARDED_FOR=f'192.0.2.{index}',
+            )
+            for index in range(4)
+        ]
+
+        self.assertEqual(responses[-1].status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_concurrent_attempts_counted_once_each(self):
+        """Test attempts checked at the same time cannot all pass the limit."""
+        factory = APIRequestFactory()
+        barrier = threading.Barrier(8)
+        allowed = []
+
+        def attempt():
+            request = Request(factory.post(CREATE_TOKEN_URL, REMOTE_ADDR='10.0.0.1'))
+            barrier.wait()
+            allowed.append(throttling.PasswordIPThrottle().allow_request(request, None))
+
+        threads = [threading.Thread(target=attempt) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(allowed.count(True), 3)
+        self.assertEqual(cache.get('throttle:password_ip:10.0.0.1:0'), 3)
+
+    @patch('core.throttling.cache.add', side_effect=ConnectionError)
+    def test_local_fallback_when_cache_down(self, patched_add):
+        """Test attempts are still limited per process while the cache is unreachable."""
+        with patch.object(throttling, 'local_counters', throttling.LocalCounters()):
+            self.login('victim@example.com')
+            self.login('victim@example.com')
+
+            res = self.login('victim@example.com')
+
+        self.assertEqual(res.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+
+    def test_previous_window_is_weighted(self):
+        """Test attempts from the previous window count for the part still overlapping."""
+        def login_at(now, email):
+            with patch('core.throttling.SlidingWindowThrottle.timer', return_value=now):
+                return self.login(email)
+
+        login_at(50, 'a@example.com')
+        login_at(50, 'b@example.com')
+        login_at(75, 'c@example.com')
+        login_at(75, 'd@example.com')
+
+        # 2 attempts in this window plus 2/3 of the previous window's 2.
+        throttled = login_at(80, 'e@example.com')
+        # By now only 1/6 of the previous window overlaps.
+        allowed = login_at(110, 'f@example.com')
+
+        self.assertEqual(throttled.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(allowed.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+def csv_file(text):
+    return SimpleUploadedFile('users.csv', text.encode(), content_type='text/csv')
+
+
+@override_settings(ONBOARDING_HASH_WORKERS=2)
+class OnboardUsersApiTests(TestCase):
+    """Test creating users in bulk from a CSV file."""
+
+    def setUp(self):
+        self.admin = create_user(email='admin@example.com', password='admin-pass123')
+        self.admin.is_staff = True
+        self.admin.save()
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def test_onboard_users_with_tokens_and_team(self):
+        """Test valid rows become users with a confirmation token and join the team."""
+        existing = create_user(email='old@example.com', password='old-pass1234')
+        project = Project.objects.create(manager=self.admin, title='P', client_name='C', description='D')
+        text = (
+            'email,name,password\n'
+            'one@example.com,One,first-pass123\n'
+            'two@example.com,Two,second-pass123\n'
+            'old@example.com,Old,old-pass1234\n'
+            'bad-email,Bad,third-pass123\n'
+            'weak@example.com,Weak,123\n'
+        )
+
+        res = self.client.post(ONBOARD_URL, {'file': csv_file(text), 'project': project.id}, format='multipart')
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data['created'], 2)
+        self.assertEqual(res.data['skipped'], ['old@example.com'])
+        self.assertEqual([error['line'] for error in res.data['errors']], [5, 6])
+        one = get_user_model().objects.get(email='one@example.com')
+        self.assertEqual(one.name, 'One')
+        self.assertTrue(one.check_password('first-pass123'))
+        self.assertFalse(one.confirmed)
+        token = Token.objects.get(user=one)
+        self.assertEqual(token.token, str(uuid.uuid5(uuid.NAMESPACE_DNS, str(one.id))))
+        self.assertFalse(token.is_expired())
+        self.assertCountEqual(
+            project.team.values_list('email', flat=True),
+            ['one@example.com', 'two@example.com', existing.email],
+        )
+
+    def test_missing_columns_rejected(self):
+        """Test a file without the required columns creates nobody."""
+        res = self.client.post(ONBOARD_URL, {'file': csv_file('email,name\na@example.com,A\n')}, format='multipart')
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(get_user_model().objects.filter(email='a@example.com').exists())
+
+    def test_hashing_pool_is_spawned_on_first_use_and_kept(self):
+        """Test the hashing pool is created by the first onboarding, sized by the setting and kept."""
+        if onboarding._pool is not None:
+            onboarding._pool.shutdown()
+            onboarding._drop_pool(onboarding._pool)
+
+        self.assertEqual(len(onboarding.hash_passwords(['first-pass123', 'second-pass123'])), 2)
+        pool = onboarding._pool
+
+        self.assertEqual(pool._mp_context.get_start_method(), 'spawn')
+        self.assertEqual(pool._max_workers, 2)
+        self.assertEqual(len(onboarding.hash_passwords(['third-pass123', 'fourth-pass123'])), 2)
+        self.assertIs(onboarding.hash_pool(), pool)
+
+    def test_onboarding_requires_staff(self):
+        """Test users who are not staff cannot onboard users."""
+        self.admin.is_staff = False
+        self.admin.save()
+        text = 'email,password\na@example.com,first-pass123\n'
+
+        res = self.client.post(ONBOARD_URL, {'file': csv_file(text)}, format='multipart')
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
@@ -12,5 +12,6 @@ urlpatterns = [
     path('create-account/', views.CreateUserView.as_view(), name='create-account'),
     path('confirm-account/', views.ConfirmAccountView.as_view(), name='confirm-account'),
     path('create-token/', views.CreateTokenView.as_view(), name='create-token'),
+    path('onboard/', views.OnboardUsersView.as_view(), name='onboard'),
     path('profile/', views.ManageUserView.as_view(), name='profile'),
 ]
@@ -5,16 +5,22 @@ Views for User API
 from rest_framework import generics, authentication, permissions, status
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.authtoken.models import Token as AuthToken
+from rest_framework.parsers import FormParser, MultiPartParser
 from rest_framework.permissions import AllowAny
 from rest_framework.settings import api_settings
 from rest_framework.response import Response
 
-from user.serializers import UserSerializer, AuthTokenSerializer, ConfirmAccountSerializer
+from core.deletion import schedule_user_deletion
+from core.mixins import IdempotencyMixin, ReplicaReadMixin
+from core.onboarding import onboard
+from core.throttling import PASSWORD_THROTTLES
+from user.serializers import UserSerializer, AuthTokenSerializer, ConfirmAccountSerializer, OnboardUsersSerializer
 
 
-class CreateUserView(generics.CreateAPIView):
+class CreateUserView(IdempotencyMixin, generics.CreateAPIView):
     """Create a new user in the system"""
     serializer_class = UserSerializer
+    throttle_classes = PASSWORD_THROTTLES
 
     def post(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -42,9 +48,25 @@ class CreateTokenView(ObtainAuthToken):
     """Create a new auth token for user."""
     serializer_class = AuthTokenSerializer
     renderer_classes = api_settings.DEFAULT_RENDERER_CLASSES
+    throttle_classes = PASSWORD_THROTTLES
 
 
-class ManageUserView(generics.RetrieveUpdateAPIView):
+class OnboardUsersView(generics.GenericAPIView):
+    """Create the users of an uploaded CSV file, optionally adding them to a project team."""
+    serializer_class = OnboardUsersSerializer
+    authentication_classes = [authentication.TokenAuthentication]
+    permission_classes = [permissions.IsAdminUser]
+    parser_classes = [MultiPartParser, FormParser]
+
+    def post(self, request, *args, **kwargs):
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        parsed = serializer.validated_data['file']
+        report = onboard(parsed['rows'], project=serializer.validated_data.get('project'))
+        return Response({**report, 'errors': parsed['errors']}, status=status.HTTP_201_CREATED)
+
+
+class ManageUserView(IdempotencyMixin, ReplicaReadMixin, generics.RetrieveUpdateDestroyAPIView):
     """Manage the authenticated user."""
     serializer_class = UserSerializer
     authentication_classes = [authentication.TokenAuthentication]
@@ -53,3 +75,7 @@ class ManageUserView(generics.RetrieveUpdateAPIView):
     def get_object(self):
         """Retrieve and return the authenticated user."""
         return self.request.user
+
+    def perform_destroy(self, instance):
+        """Hide the user and purge their rows in the background."""
+        schedule_user_deletion(instance)
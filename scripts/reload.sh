@@ -0,0 +1,38 @@
+#!/bin/sh
+#
+# Zero-downtime reload of a preloaded gunicorn master.
+#
+# USR2 starts a new master with the new code next to the old one, both
+# accepting on the same socket. Once the new master is up, WINCH stops the old
+# workers after their current requests and QUIT retires the old master.
+#
+# In the container the old master is not PID 1: scripts/run.sh runs under tini
+# and follows the pidfile to the new master, so retiring the old one does not
+# stop the container.
+
+set -e
+
+PIDFILE=${GUNICORN_PIDFILE:-/tmp/gunicorn.pid}
+OLD_PID=$(cat "$PIDFILE")
+
+kill -USR2 "$OLD_PID"
+
+# The new master writes $PIDFILE.2 once the new code is loaded, and renames it
+# to $PIDFILE when the old master is gone.
+for _ in $(seq 1 60); do
+    if [ -f "$PIDFILE.2" ]; then
+        break
+    fi
+    sleep 1
+done
+sleep 2
+
+if [ ! -f "$PIDFILE.2" ] || ! kill -0 "$(cat "$PIDFILE.2")" 2>/dev/null; then
+    echo "New master did not start, keeping $OLD_PID" >&2
+    exit 1
+fi
+NEW_PID=$(cat "$PIDFILE.2")
+
+kill -WINCH "$OLD_PID"
+kill -QUIT "$OLD_PID"
+echo "Reloaded: $OLD_PID -> $NEW_PID"
@@ -0,0 +1,43 @@
+#!/bin/sh
+
+set -e
+
+python manage.py wait_for_db
+python manage.py migrate
+for shard in $(python manage.py shell -c "from django.conf import settings; print(' '.join(settings.DATABASE_SHARDS[1:]))"); do
+    python manage.py migrate --database "$shard"
+done
+
+PIDFILE=${GUNICORN_PIDFILE:-/tmp/gunicorn.pid}
+rm -f "$PIDFILE" "$PIDFILE.2"
+
+if [ "$SERVER_INTERFACE" = "asgi" ]; then
+    gunicorn -c gunicorn.conf.py -k uvicorn.workers.UvicornWorker app.asgi:application &
+else
+    gunicorn -c gunicorn.conf.py app.wsgi:application &
+fi
+
+# scripts/reload.sh replaces the master with one forked from it, so this
+# script stays up and follows whichever master the pidfile names, rather than
+# exec'ing gunicorn as the container's main process: retiring the old master
+# would then stop the container. tini (the image's entrypoint) reaps the old
+# master and adopts the new one. Stop signals go to the current master.
+master() {
+    cat "$PIDFILE" 2>/dev/null || cat "$PIDFILE.2" 2>/dev/null
+}
+running() {
+    PID=$(master) && kill -0 "$PID" 2>/dev/null
+}
+trap 'kill -TERM "$(master)" 2>/dev/null || true' TERM INT
+
+for _ in $(seq 1 60); do
+    [ -f "$PIDFILE" ] && break
+    kill -0 $! 2>/dev/null || break
+    sleep 1
+done
+
+# Look twice before giving up: the pidfile briefly moves while a new master
+# takes over.
+while running || { sleep 1; running; }; do
+    sleep 1
+done